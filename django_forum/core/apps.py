@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        connection_created.connect(install_query_wrappers)
+
+
+def install_query_wrappers(sender, connection, **kwargs):
+    from core.instrumentation import time_queries
+    from core.slow_queries import record_slow_queries
+
+    # Installed per connection rather than per request, so queries the async ORM runs in
+    # worker threads are timed too. The wrapper object outlives reconnects, so only add them once
+    for wrapper in (record_slow_queries, time_queries):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
@@ -0,0 +1,236 @@
+"""Per-view latency and query-count benchmarks driven through the Django test client.
+
+``run_benchmarks()`` measures every scenario against whatever data is in the
+current database and returns a JSON-serializable report. ``compare_reports()``
+diffs such a report against a stored baseline. ``run_connection_benchmarks()``
+measures what each database connection strategy adds to a request.
+"""
+
+import math
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.signals import request_finished, request_started
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from forum.models import Answer, Question
+from reviews.models import CourseReview
+from votes.models import Vote
+
+User = get_user_model()
+
+# Latency regressions below this many milliseconds are treated as noise
+LATENCY_SLACK_MS = 2.0
+
+
+def build_scenarios():
+    """Return ``[(name, method, url)]``, picking the heaviest objects in the dataset as targets"""
+    question = _busiest_question()
+    reviewer = User.objects.annotate(num_reviews=Count("reviews")).order_by("-num_reviews", "pk").first()
+    profile_user = User.objects.order_by("-profile__reputation_points", "pk").first()
+    if question is None or reviewer is None:
+        raise ValueError("Benchmarks need at least one question and one user, seed the database first")
+
+    search_term = question.title.split()[0]
+    question_type = ContentType.objects.get_for_model(Question)
+
+    return [
+        ("home", "get", reverse("home:home")),
+        ("question_list", "get", reverse("forum:question_list")),
+        ("question_search", "get", f"{reverse('forum:question_list')}?q={search_term}"),
+        ("question_detail", "get", reverse("forum:question_detail", kwargs={"pk": question.pk})),
+        ("review_list", "get", reverse("reviews:review_list")),
+        ("user_reviews", "get", reverse("reviews:user_reviews", kwargs={"username": reviewer.username})),
+        ("public_profile", "get", reverse("users:profile", kwargs={"username": profile_user.username})),
+        ("leaderboard", "get", reverse("leaderboards:leaderboard")),
+        (
+            "vote",
+            "post",
+            reverse(
+                "votes:vote", kwargs={"content_type_id": question_type.pk, "object_id": question.pk, "vote_type": "up"}
+            ),
+        ),
+    ]
+
+
+def run_benchmarks(iterations=50, scenarios=None, user=None):
+    """Request every scenario ``iterations`` times as ``user`` and report latency percentiles and query counts.
+
+    The first request of each scenario is a warm-up; its queries are counted
+    and it is left out of the timings. Votes toggle on and off between
+    iterations, so the vote scenario alternates between adding and removing.
+    """
+    scenarios = build_scenarios() if scenarios is None else scenarios
+    user = user or _benchmark_user()
+    client = Client()
+    client.force_login(user)
+
+    views = {}
+    for name, method, url in scenarios:
+        request = getattr(client, method)
+        with CaptureQueriesContext(connection) as queries:
+            status = request(url).status_code
+        # Read the count now, every request resets the connection's query log
+        query_count = len(queries)
+
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            request(url)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        views[name] = {
+            "url": url,
+            "status": status,
+            "queries": query_count,
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+            "mean_ms": round(statistics.fmean(timings), 3) if timings else 0.0,
+        }
+
+    return {
+        "created_at": timezone.now().isoformat(),
+        "iterations": iterations,
+        "dataset": _dataset_size(),
+        "views": views,
+    }
+
+
+def compare_reports(report, baseline, latency_tolerance=0.25):
+    """Return human-readable regressions of ``report`` against ``baseline``.
+
+    A view regresses when it runs more queries than before, or when its p95
+    latency grows by more than ``latency_tolerance`` (a fraction) and by more
+    than ``LATENCY_SLACK_MS``.
+    """
+    regressions = []
+    for name, current in report["views"].items():
+        previous = baseline["views"].get(name)
+        if previous is None:
+            continue
+
+        if current["queries"] > previous["queries"]:
+            regressions.append(f"{name}: {previous['queries']} -> {current['queries']} queries")
+
+        limit = max(previous["p95_ms"] * (1 + latency_tolerance), previous["p95_ms"] + LATENCY_SLACK_MS)
+        if current["p95_ms"] > limit:
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.1f}ms -> {current['p95_ms']:.1f}ms")
+
+    return regressions
+
+
+# Overrides of the connection's settings per strategy; the pool is only available with psycopg 3
+CONNECTION_MODES = {
+    "reconnect": {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False},
+    "persistent": {"CONN_MAX_AGE": 600, "CONN_HEALTH_CHECKS": False},
+    "health_checks": {"CONN_MAX_AGE": 600, "CONN_HEALTH_CHECKS": True},
+    "pool": {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False, "OPTIONS": {"pool": {"min_size": 1, "max_size": 1}}},
+}
+
+
+def run_connection_benchmarks(iterations=200, modes=None, alias="default"):
+    """Time ``iterations`` simulated requests with one query each under every connection strategy in ``modes``.
+
+    Each request fires ``request_started`` and ``request_finished`` around the
+    query like the request handler does, so Django closes, keeps or checks the
+    connection exactly as it would in a server. ``backends`` counts the
+    distinct server processes that answered, i.e. the connections opened.
+    """
+    modes = list(CONNECTION_MODES) if modes is None else modes
+    db = connections[alias]
+    results = {}
+    for mode in modes:
+        if mode == "pool" and not _pool_supported(db):
+            results[mode] = {"skipped": "needs PostgreSQL with psycopg 3 and psycopg_pool"}
+            continue
+
+        original = db.settings_dict.copy()
+        db.close()
+        db.settings_dict.update(CONNECTION_MODES[mode])
+        try:
+            _request_cycle(db)  # Warm-up: the first request always connects
+            timings = []
+            backends = set()
+            for _ in range(iterations):
+                start = time.perf_counter()
+                backends.add(_request_cycle(db))
+                timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            db.close()
+            if mode == "pool":
+                db.close_pool()
+            db.settings_dict.clear()
+            db.settings_dict.update(original)
+
+        results[mode] = {
+            "backends": len(backends),
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+            "mean_ms": round(statistics.fmean(timings), 3) if timings else 0.0,
+        }
+
+    baseline = results.get("reconnect", {}).get("mean_ms")
+    for result in results.values():
+        if baseline is not None and "mean_ms" in result:
+            result["saved_ms"] = round(baseline - result["mean_ms"], 3)
+
+    return {
+        "created_at": timezone.now().isoformat(),
+        "iterations": iterations,
+        "vendor": db.vendor,
+        "modes": results,
+    }
+
+
+def _request_cycle(db):
+    request_started.send(sender=__name__)
+    try:
+        with db.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()" if db.vendor == "postgresql" else "SELECT 1")
+            return cursor.fetchone()[0]
+    finally:
+        request_finished.send(sender=__name__)
+
+
+def _pool_supported(db):
+    if db.vendor != "postgresql":
+        return False
+    from django.db.backends.postgresql.base import is_psycopg3
+
+    return is_psycopg3
+
+
+def _benchmark_user():
+    # An active user who did not write the voted question, so the vote scenario is accepted
+    user = User.objects.exclude(pk=_busiest_question().author_id).order_by("pk").first()
+    if user is None:
+        user = User.objects.create_user(username="benchmark", email="benchmark@example.com", password=None)
+    return user
+
+
+def _busiest_question():
+    return Question.objects.annotate(num_answers=Count("answers")).order_by("-num_answers", "pk").first()
+
+
+def percentile(values, percent):
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def _dataset_size():
+    return {
+        "users": User.objects.count(),
+        "questions": Question.objects.count(),
+        "answers": Answer.objects.count(),
+        "reviews": CourseReview.objects.count(),
+        "votes": Vote.objects.count(),
+    }
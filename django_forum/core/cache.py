@@ -0,0 +1,92 @@
+import contextlib
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+from core.instrumentation import record_cache
+
+LOCK_SUFFIX = ":lock"
+LOCK_TIMEOUT = 30
+STALE_GRACE = 300
+COLD_MISS_WAIT = 1.0
+COLD_MISS_POLL = 0.05
+
+
+def get_or_compute(key, compute, timeout, *, beta=1.0, lock_timeout=LOCK_TIMEOUT, stale_grace=STALE_GRACE):
+    """Return the cached value for ``key``, computing it with ``compute()`` when needed.
+
+    Protects expensive values against cache stampedes:
+
+    * entries are refreshed probabilistically *before* they expire (XFetch),
+      with the probability growing as expiry approaches and with the time
+      the last computation took;
+    * only the worker that wins ``cache.add()`` on the lock key recomputes,
+      the others keep serving the stale value in the meantime;
+    * entries outlive their logical ``timeout`` by ``stale_grace`` seconds so a
+      stale value is still around while the refresh is running.
+    """
+    entry = cache.get(key)
+    record_cache(entry is not None)
+
+    if entry is not None:
+        value, delta, expires_at = entry
+        if not _should_refresh(delta, expires_at, beta):
+            return value
+        if not _acquire(key, lock_timeout):
+            return value
+        return _refresh(key, compute, timeout, stale_grace)
+
+    if _acquire(key, lock_timeout):
+        return _refresh(key, compute, timeout, stale_grace)
+
+    # Someone else is filling a cold entry - give them a moment before piling on.
+    deadline = time.monotonic() + COLD_MISS_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(COLD_MISS_POLL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+
+    return compute()
+
+
+def refresh(key, compute, timeout, *, stale_grace=STALE_GRACE):
+    """Compute ``key`` now and store it for ``get_or_compute()``, e.g. to warm the cache ahead of traffic"""
+    start = time.time()
+    value = compute()
+    delta = time.time() - start
+    cache.set(key, (value, delta, time.time() + timeout), timeout + stale_grace)
+    return value
+
+
+@contextlib.contextmanager
+def single_flight(key, lock_timeout=LOCK_TIMEOUT):
+    """Yield whether this worker won the ``cache.add()`` lock on ``key``, releasing it afterwards if it did"""
+    acquired = _acquire(key, lock_timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(key + LOCK_SUFFIX)
+
+
+def invalidate(key):
+    cache.delete_many([key, key + LOCK_SUFFIX])
+
+
+def _should_refresh(delta, expires_at, beta):
+    # random() can return 0.0, log() of which is undefined
+    return time.time() - delta * beta * math.log(random.random() or 1e-12) >= expires_at
+
+
+def _acquire(key, lock_timeout):
+    return cache.add(key + LOCK_SUFFIX, 1, lock_timeout)
+
+
+def _refresh(key, compute, timeout, stale_grace):
+    try:
+        return refresh(key, compute, timeout, stale_grace=stale_grace)
+    finally:
+        cache.delete(key + LOCK_SUFFIX)
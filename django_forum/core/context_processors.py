@@ -1,3 +1,4 @@
+import django.conf
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import Avg
 from forum.models import Answer, Question
@@ -5,8 +6,20 @@ from reviews.models import CourseReview
 from users.models import UserProfile
 from votes.models import Vote
 
+from core.cache import get_or_compute
+
+COMMUNITY_STATS_KEY = "core:community_stats"
+
 
 def community_stats(request):
+    return get_or_compute(
+        COMMUNITY_STATS_KEY,
+        compute_community_stats,
+        django.conf.settings.STATS_CACHE_TIMEOUT,
+    )
+
+
+def compute_community_stats():
     context = {}
 
     context["total_questions"] = Question.objects.count()
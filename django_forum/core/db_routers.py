@@ -0,0 +1,70 @@
+"""Primary/replica routing for ``DATABASE_ROUTERS``.
+
+Inside a request, reads go to one of ``DATABASE_REPLICAS`` (the same one for
+the whole request) and writes go to the primary. A write pins the rest of
+the request to the primary, and ``ReplicaPinningMiddleware`` keeps the
+client there for ``REPLICA_PIN_SECONDS`` afterwards, so the response to a
+vote and the page a form redirects to never read from a lagging replica.
+
+Outside a request (management commands, shells, tasks) everything stays on
+the primary, as does anything inside a transaction.
+"""
+
+import contextlib
+import contextvars
+import random
+
+import django.conf
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY = DEFAULT_DB_ALIAS
+
+_state = contextvars.ContextVar("replica_routing", default=None)
+
+
+class RoutingState:
+    def __init__(self, *, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+@contextlib.contextmanager
+def routing(*, pinned=False):
+    """Route the queries of the block as one request; ``pinned`` keeps its reads on the primary"""
+    state = RoutingState(pinned=pinned)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = django.conf.settings.DATABASE_REPLICAS
+        state = _state.get()
+        if not replicas or state is None or state.pinned or connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+
+        # Follow-up queries of an object (related managers, refresh_from_db) stay on its database
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db in replicas:
+            return instance._state.db
+        if state.replica is None:
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema through replication
+        return db == PRIMARY
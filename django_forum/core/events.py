@@ -0,0 +1,196 @@
+"""Live updates over server-sent events, fanned out from PostgreSQL ``LISTEN/NOTIFY``.
+
+With ``LIVE_UPDATES`` on, writers call ``publish()``, which sends one
+``NOTIFY`` on ``EVENTS_CHANNEL``; PostgreSQL delivers it when the writing
+transaction commits, to every process listening. Each ASGI worker process
+runs one ``Broker`` holding a
+single listening connection, opened with the first subscriber and closed
+with the last, and hands every notification to the open streams of its
+topic. One notification therefore serves every open tab, whatever the
+number of workers and tabs, and an open stream holds no database
+connection of its own.
+
+Delivery is best effort: events sent while a worker was reconnecting are
+lost, and a stream that falls ``EVENTS_QUEUE_SIZE`` events behind gets a
+``reset`` event, after which the client should reload.
+"""
+
+import asyncio
+import collections
+import contextlib
+import json
+import logging
+
+import django.conf
+import psycopg2
+from django.db import connections
+from psycopg2 import sql
+
+from core.db_routers import PRIMARY
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL rejects NOTIFY payloads from 8000 bytes on
+MAX_PAYLOAD_BYTES = 7999
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+
+def publish(topic, event, data):
+    """Send ``event`` with the JSON-serializable ``data`` to the streams of ``topic`` once the transaction commits.
+
+    Returns ``False``, sending nothing, when the encoded event is too large
+    for ``NOTIFY``; callers can retry with less data. Without
+    ``LIVE_UPDATES`` nobody is listening and nothing is sent either.
+    """
+    if not django.conf.settings.LIVE_UPDATES:
+        return True
+    payload = json.dumps({"topic": topic, "event": event, "data": data}, separators=(",", ":"))
+    if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+        return False
+    with connections[PRIMARY].cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [django.conf.settings.EVENTS_CHANNEL, payload])
+    return True
+
+
+class Broker:
+    def __init__(self):
+        self.subscribers = collections.defaultdict(set)
+        self.listener = None
+        self.ready = None
+
+    async def subscribe(self, topic):
+        """Return a queue receiving the ``(event, data)`` pairs of ``topic``, once the broker is listening"""
+        queue = asyncio.Queue(maxsize=django.conf.settings.EVENTS_QUEUE_SIZE)
+        self.subscribers[topic].add(queue)
+        if self.listener is None:
+            self.ready = asyncio.get_running_loop().create_future()
+            self.listener = asyncio.create_task(self.listen(self.ready))
+        try:
+            await asyncio.shield(self.ready)
+        except BaseException:
+            self.unsubscribe(topic, queue)
+            raise
+        return queue
+
+    def unsubscribe(self, topic, queue):
+        self.subscribers[topic].discard(queue)
+        if not self.subscribers[topic]:
+            del self.subscribers[topic]
+        if not self.subscribers and self.listener is not None:
+            # Nobody left to serve in this process, give the connection back
+            self.listener.cancel()
+            self.listener = None
+
+    def dispatch(self, payload):
+        try:
+            message = json.loads(payload)
+            topic, event = message["topic"], (message["event"], message["data"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed event %r", payload)
+            return
+        for queue in self.subscribers.get(topic, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A client this far behind is better off reloading than replaying
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("reset", {}))
+
+    async def listen(self, ready):
+        loop = asyncio.get_running_loop()
+        delay = RECONNECT_DELAY
+        try:
+            while True:
+                try:
+                    connection = await _connect()
+                except psycopg2.Error:
+                    logger.exception("Could not listen for events, retrying in %.0fs", delay)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                    continue
+
+                delay = RECONNECT_DELAY
+                lost = loop.create_future()
+                loop.add_reader(connection.fileno(), self.receive, connection, lost)
+                if not ready.done():
+                    ready.set_result(None)
+                try:
+                    await lost
+                finally:
+                    loop.remove_reader(connection.fileno())
+                    _close(connection)
+                logger.warning("Lost the events connection, reconnecting")
+        finally:
+            # Subscribers still waiting for the first connection go ahead and simply receive nothing
+            if not ready.done():
+                ready.set_result(None)
+
+    def receive(self, connection, lost):
+        try:
+            connection.poll()
+        except psycopg2.Error:
+            if not lost.done():
+                lost.set_result(None)
+            return
+        while connection.notifies:
+            self.dispatch(connection.notifies.pop(0).payload)
+
+
+async def _connect():
+    # Connecting blocks, so it runs in a thread; one finishing after the listener was cancelled is closed
+    connecting = asyncio.ensure_future(asyncio.to_thread(_listening_connection))
+    try:
+        return await asyncio.shield(connecting)
+    except asyncio.CancelledError:
+        connecting.add_done_callback(lambda task: task.exception() or _close(task.result()))
+        raise
+
+
+def _listening_connection():
+    settings = connections[PRIMARY].settings_dict
+    params = {
+        "dbname": settings["NAME"],
+        "user": settings["USER"],
+        "password": settings["PASSWORD"],
+        "host": settings["HOST"],
+        "port": settings["PORT"],
+        # Notices a server that vanished without closing the socket
+        "keepalives": 1,
+        "keepalives_idle": 30,
+    }
+    connection = psycopg2.connect(**{key: value for key, value in params.items() if value})
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(django.conf.settings.EVENTS_CHANNEL)))
+    return connection
+
+
+def _close(connection):
+    with contextlib.suppress(psycopg2.Error):
+        connection.close()
+
+
+broker = Broker()
+
+
+async def stream(topic):
+    """Encode the events of ``topic`` as a ``text/event-stream``, with keep-alive comments while it is quiet"""
+    heartbeat = django.conf.settings.EVENTS_HEARTBEAT_SECONDS
+    queue = await broker.subscribe(topic)
+    # A plain try/finally rather than a context manager: the server never closes the stream itself, and when it
+    # is finalized during shutdown a nested async generator may already be gone
+    try:
+        # EventSource reconnects on its own after a dropped connection, this sets how soon
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), heartbeat)
+            except TimeoutError:
+                # Keeps proxies from closing an idle stream
+                yield b": keep-alive\n\n"
+                continue
+            yield f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+    finally:
+        broker.unsubscribe(topic, queue)
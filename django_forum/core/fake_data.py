@@ -0,0 +1,124 @@
+"""Row generators for the populate_fake_data command.
+
+These run in worker processes, so they only build plain dicts and tuples and
+never touch the database. Every chunk seeds its own Faker and Random from
+``(seed, kind, chunk index)``, which keeps the output identical for a given
+seed no matter how many workers produced it.
+"""
+
+import random
+
+from faker import Faker
+
+COURSE_NAMES = [
+    "Python Bootcamp",
+    "Django Mastery",
+    "React Fundamentals",
+    "JavaScript Pro",
+    "Data Science",
+    "Web Development",
+    "Mobile App Development",
+    "Cloud Engineering",
+    "DevOps Course",
+]
+
+
+def _generators(seed, kind, index):
+    key = f"{seed}:{kind}:{index}"
+    fake = Faker()
+    fake.seed_instance(key)
+    return fake, random.Random(key)
+
+
+def user_chunk(seed, index, start, count):
+    """Users ``start`` to ``start + count`` with their profile fields and 2-5 course reviews each.
+
+    Reviews reference their author by position in the returned user list.
+    """
+    fake, rng = _generators(seed, "users", index)
+    users = []
+    reviews = []
+
+    for number in range(start, start + count):
+        # The running number keeps usernames unique across chunks
+        username = f"{fake.user_name()}{number}"
+        users.append(
+            {
+                "username": username,
+                "email": f"{username}@{fake.free_email_domain()}",
+                "first_name": fake.first_name(),
+                "last_name": fake.last_name(),
+                "bio": fake.paragraph() if rng.random() > 0.3 else "",
+                "birthday": fake.date_of_birth(minimum_age=18, maximum_age=70) if rng.random() > 0.4 else None,
+            },
+        )
+
+        for course in rng.sample(COURSE_NAMES, rng.randint(2, 5)):
+            reviews.append(
+                (
+                    len(users) - 1,
+                    {
+                        "title": fake.sentence(),
+                        "content": "\n".join(fake.paragraphs(nb=rng.randint(2, 4))),
+                        "rating": rng.randint(1, 5),
+                        "course_name": course,
+                    },
+                ),
+            )
+
+    return users, reviews
+
+
+def question_chunk(seed, index, count, user_count):
+    """``count`` questions with 1-8 answers each; 30% of them are solved by one accepted answer.
+
+    Authors are indexes into the created users, answers reference their
+    question by position in the returned question list.
+    """
+    fake, rng = _generators(seed, "questions", index)
+    questions = []
+    answers = []
+
+    for position in range(count):
+        is_solved = rng.random() > 0.7
+        questions.append(
+            {
+                "title": fake.sentence()[:199],
+                "content": "\n".join(fake.paragraphs(nb=rng.randint(2, 5))),
+                "author": rng.randrange(user_count),
+                "is_solved": is_solved,
+            },
+        )
+
+        num_answers = rng.randint(1, 8)
+        accepted = rng.randrange(num_answers) if is_solved else None
+        for answer_number in range(num_answers):
+            answers.append(
+                (
+                    position,
+                    {
+                        "content": "\n".join(fake.paragraphs(nb=rng.randint(1, 4))),
+                        "author": rng.randrange(user_count),
+                        "is_accepted": answer_number == accepted,
+                    },
+                ),
+            )
+
+    return questions, answers
+
+
+def vote_chunk(seed, index, start, count, pool_size, votes_per_user):
+    """``(user index, pool index, vote type)`` for users ``start`` to ``start + count``.
+
+    Each user votes on a distinct sample of the voteable pool, about
+    ``votes_per_user`` items give or take a third; 70% of votes are upvotes.
+    """
+    rng = random.Random(f"{seed}:votes:{index}")
+    low, high = votes_per_user * 2 // 3, votes_per_user * 4 // 3
+    votes = []
+
+    for user in range(start, start + count):
+        for target in rng.sample(range(pool_size), min(rng.randint(low, high), pool_size)):
+            votes.append((user, target, "up" if rng.random() < 0.7 else "down"))
+
+    return votes
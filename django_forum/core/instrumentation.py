@@ -0,0 +1,75 @@
+"""Per-request timing counters shared by the timing middleware, template backend and cache helpers.
+
+The middleware stores a ``RequestMetrics`` in a context variable for the
+duration of a request; everything else records into ``current_metrics()``
+and does nothing when it returns ``None`` (management commands, shells).
+"""
+
+import contextvars
+import time
+
+from core.metrics import CACHE_REQUESTS
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Counters for a single request, times in seconds"""
+
+    def __init__(self, request=None):
+        self.request = request
+        self.start = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.template_time = 0.0
+        self.context_processors = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Templates rendered from inside another render are already covered by the outer one
+        self.template_depth = 0
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.start
+
+    @property
+    def context_time(self):
+        return sum(self.context_processors.values())
+
+
+def current_metrics():
+    return _current.get()
+
+
+def start_request(request=None):
+    metrics = RequestMetrics(request)
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def record_cache(hit):
+    CACHE_REQUESTS.inc("hit" if hit else "miss")
+    metrics = _current.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
+
+
+def time_queries(execute, sql, params, many, context):
+    """``connection.execute_wrapper()`` hook adding each query's time to the current request"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries += 1
@@ -0,0 +1,217 @@
+"""Load generator for a running server, driven by the ``load_test`` command.
+
+Every virtual user gets its own aiohttp session, logs in through the login
+form and then loops over weighted actions - browsing, searching, voting and
+answering - until its stage ends. Nothing here touches the ORM: the command
+collects the users and questions to use beforehand and passes them in as
+``targets``, so the event loop only does HTTP.
+"""
+
+import asyncio
+import collections
+import random
+import re
+import statistics
+import time
+
+import aiohttp
+
+from core.benchmarks import percentile
+
+CSRF_COOKIE = "csrftoken"
+MAX_SEARCH_WORDS = 2
+
+
+class LoadTestError(Exception):
+    pass
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+
+    def record(self, latency, *, ok):
+        self.latencies.append(latency)
+        if not ok:
+            self.errors += 1
+
+    def summary(self, duration):
+        count = len(self.latencies)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "error_rate": round(self.errors / count, 4) if count else 0.0,
+            "throughput_rps": round(count / duration, 2) if duration else 0.0,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 2),
+            "mean_ms": round(statistics.fmean(self.latencies) * 1000, 2) if count else 0.0,
+        }
+
+
+class VirtualUser:
+    def __init__(self, session, base_url, targets, stats, rng):
+        self.session = session
+        self.base_url = base_url.rstrip("/")
+        self.targets = targets
+        self.stats = stats
+        self.rng = rng
+        self.username = None
+
+    async def login(self, username, password):
+        self.username = username
+        await self.request("login_form", "get", "/users/login/")
+        data = {"username": username, "password": password, "csrfmiddlewaretoken": self.csrf_token()}
+        status = await self.request("login", "post", "/users/login/", data=data, expect=(302,))
+        if status != 302:
+            raise LoadTestError(f"Could not log in as {username}: HTTP {status}")
+
+    async def home(self):
+        await self.request("home", "get", "/")
+
+    async def question_list(self):
+        page = self.rng.randint(1, self.targets["pages"])
+        await self.request("question_list", "get", "/forum/", params={"page": page})
+
+    async def question_detail(self):
+        question_id, _ = self.rng.choice(self.targets["questions"])
+        await self.request("question_detail", "get", f"/forum/question/{question_id}/")
+
+    async def search(self):
+        words = self.rng.sample(
+            self.targets["search_words"], k=min(MAX_SEARCH_WORDS, len(self.targets["search_words"]))
+        )
+        await self.request("search", "get", "/forum/", params={"q": " ".join(words)})
+
+    async def review_list(self):
+        await self.request("review_list", "get", "/reviews/")
+
+    async def leaderboard(self):
+        await self.request("leaderboard", "get", "/leaderboards/")
+
+    async def vote(self):
+        question_id = self.foreign_question()
+        vote_type = self.rng.choice(["up", "down"])
+        path = f"/votes/{self.targets['question_type']}/{question_id}/{vote_type}/"
+        await self.request("vote", "post", path, headers={"X-CSRFToken": self.csrf_token()})
+
+    async def answer(self):
+        question_id, _ = self.rng.choice(self.targets["questions"])
+        data = {"content": f"Load test answer {self.rng.random()}", "csrfmiddlewaretoken": self.csrf_token()}
+        await self.request("answer", "post", f"/forum/question/{question_id}/answer/", data=data, expect=(302,))
+
+    def foreign_question(self):
+        # Votes on your own content are rejected, so pick someone else's question
+        for _ in range(10):
+            question_id, author = self.rng.choice(self.targets["questions"])
+            if author != self.username:
+                return question_id
+        return question_id
+
+    def csrf_token(self):
+        cookie = self.session.cookie_jar.filter_cookies(self.base_url).get(CSRF_COOKIE)
+        return cookie.value if cookie else ""
+
+    async def request(self, name, method, path, *, expect=(200,), **kwargs):
+        url = self.base_url + path
+        start = time.perf_counter()
+        try:
+            async with self.session.request(method, url, allow_redirects=False, **kwargs) as response:
+                await response.read()
+                status = response.status
+        except (TimeoutError, aiohttp.ClientError):
+            status = None
+        self.stats.setdefault(name, EndpointStats()).record(time.perf_counter() - start, ok=status in expect)
+        return status
+
+
+# (action, weight): roughly a read-heavy forum, one write in ten requests
+ACTIONS = [
+    ("question_list", 25),
+    ("question_detail", 30),
+    ("search", 12),
+    ("home", 10),
+    ("review_list", 5),
+    ("leaderboard", 8),
+    ("vote", 7),
+    ("answer", 3),
+]
+
+SCENARIOS = {
+    "browse": ACTIONS,
+    # Every user votes back to back: short JSON requests that mostly wait on the database
+    "votes": [("vote", 1)],
+}
+
+
+async def run_stage(
+    base_url,
+    targets,
+    concurrency,
+    duration,
+    *,
+    password,
+    actions=ACTIONS,
+    think_time=0.0,
+    seed=None,
+    timeout=30,
+):
+    """Run ``concurrency`` virtual users for ``duration`` seconds each after logging in and return per-endpoint statistics"""
+    stats = {}
+    names, weights = zip(*actions, strict=True)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    connector = aiohttp.TCPConnector(limit=0)
+
+    async def user_loop(index):
+        rng = random.Random(None if seed is None else seed + index)
+        username = targets["usernames"][index % len(targets["usernames"])]
+        async with aiohttp.ClientSession(
+            connector=connector,
+            connector_owner=False,
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+            timeout=client_timeout,
+        ) as session:
+            user = VirtualUser(session, base_url, targets, stats, rng)
+            await user.login(username, password)
+            # Logging in can take a while under load, so it does not count against the stage
+            deadline = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                await getattr(user, rng.choices(names, weights)[0])()
+                if think_time:
+                    await asyncio.sleep(rng.expovariate(1 / think_time))
+
+    started = time.monotonic()
+    try:
+        results = await asyncio.gather(*(user_loop(index) for index in range(concurrency)), return_exceptions=True)
+    finally:
+        await connector.close()
+    elapsed = time.monotonic() - started
+
+    failures = [result for result in results if isinstance(result, Exception)]
+    if len(failures) == len(results):
+        raise LoadTestError(f"Every virtual user failed, e.g. {failures[0]!r}")
+
+    endpoints = {name: endpoint.summary(elapsed) for name, endpoint in sorted(stats.items())}
+    total = EndpointStats()
+    for endpoint in stats.values():
+        total.latencies.extend(endpoint.latencies)
+        total.errors += endpoint.errors
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "failed_users": len(failures),
+        "total": total.summary(elapsed),
+        "endpoints": endpoints,
+    }
+
+
+async def run_load_test(base_url, targets, stages, duration, **kwargs):
+    """Run one stage per concurrency level in ``stages``, in order"""
+    return [await run_stage(base_url, targets, concurrency, duration, **kwargs) for concurrency in stages]
+
+
+def search_words(titles, limit=50):
+    """Pick the most common longer words of question titles, the kind of terms people search for"""
+    words = collections.Counter(word.lower() for title in titles for word in re.findall(r"[^\W\d_]{5,}", title))
+    return [word for word, _ in words.most_common(limit)]
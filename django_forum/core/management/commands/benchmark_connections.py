@@ -0,0 +1,44 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import CONNECTION_MODES, run_connection_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulates requests that run one query each and reports their latency when every request opens a new "
+        "database connection, with persistent connections, with persistent connections plus health checks, and "
+        "with a psycopg 3 pool, along with the time saved against reconnecting."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200, help="Timed requests per strategy")
+        parser.add_argument(
+            "--modes",
+            default=",".join(CONNECTION_MODES),
+            help=f"Comma-separated strategies out of {', '.join(CONNECTION_MODES)}",
+        )
+        parser.add_argument("--database", default="default", help="Database alias to connect to")
+        parser.add_argument("--output", help="Also write the report to this JSON file")
+
+    def handle(self, *args, **options):
+        modes = options["modes"].split(",")
+        unknown = set(modes) - set(CONNECTION_MODES)
+        if unknown:
+            raise CommandError(f"Unknown strategies: {', '.join(sorted(unknown))}")
+
+        report = run_connection_benchmarks(options["iterations"], modes=modes, alias=options["database"])
+        for mode, result in report["modes"].items():
+            if "skipped" in result:
+                self.stdout.write(f"{mode:<14} skipped: {result['skipped']}")
+                continue
+            saved = f"  saved {result['saved_ms']:>7.3f}ms" if "saved_ms" in result else ""
+            self.stdout.write(
+                f"{mode:<14} p50 {result['p50_ms']:>7.3f}ms  p95 {result['p95_ms']:>7.3f}ms  "
+                f"mean {result['mean_ms']:>7.3f}ms  {result['backends']:>4} connections{saved}",
+            )
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Report written to {options['output']}")
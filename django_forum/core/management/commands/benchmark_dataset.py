@@ -0,0 +1,175 @@
+import json
+import time
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from forum.models import Answer, Question
+from leaderboards.snapshots import rebuild_leaderboards
+from reviews.models import CourseReview
+from users.models import UserProfile
+from users.stats import rebuild_user_stats
+from votes.models import Vote
+
+User = get_user_model()
+
+# In load order; derived tables (UserStats, leaderboards) are rebuilt instead of copied
+MODELS = [User, UserProfile, Question, Answer, CourseReview, Vote]
+VOTEABLE_MODELS = [Question, Answer, CourseReview]
+MANIFEST = "manifest.json"
+COPY_BLOCK_SIZE = 1 << 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports the forum dataset to PostgreSQL COPY files, or replaces the database contents with such an export. "
+        "Use it to give every benchmark run the same large starting database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["export", "import"])
+        parser.add_argument("directory", help="Directory holding the COPY files and manifest")
+        parser.add_argument(
+            "--noinput",
+            "--no-input",
+            action="store_false",
+            dest="interactive",
+            help="Do not ask before truncating the tables on import",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("COPY datasets require PostgreSQL")
+
+        directory = Path(options["directory"])
+        start = time.monotonic()
+
+        if options["action"] == "export":
+            rows = self.export(directory)
+        else:
+            if options["interactive"] and not self.confirm():
+                self.stdout.write("Import cancelled.")
+                return
+            rows = self.load(directory)
+
+        verb = "Exported" if options["action"] == "export" else "Imported"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {rows} rows in {time.monotonic() - start:.2f}s"))
+
+    def confirm(self):
+        answer = input(
+            f"This will delete all data in {connection.settings_dict['NAME']} that references users. "
+            "Type 'yes' to continue: ",
+        )
+        return answer == "yes"
+
+    def export(self, directory):
+        directory.mkdir(parents=True, exist_ok=True)
+        manifest = {"tables": [], "content_types": _content_type_ids()}
+
+        own_transaction = not connection.in_atomic_block
+        with transaction.atomic(), connection.cursor() as cursor:
+            # REPEATABLE READ gives every COPY the same snapshot, so foreign keys line up
+            if own_transaction:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            for model in MODELS:
+                table, columns = _table(model)
+                with open(directory / f"{table}.copy", "wb") as file:
+                    _copy_to(cursor, f"COPY {_quoted(table, columns)} TO STDOUT", file)
+                rows = model.objects.count()
+                manifest["tables"].append({"table": table, "columns": columns, "rows": rows})
+                self.stdout.write(f"{table}: {rows} rows")
+
+        (directory / MANIFEST).write_text(json.dumps(manifest, indent=2))
+        return sum(entry["rows"] for entry in manifest["tables"])
+
+    def load(self, directory):
+        try:
+            manifest = json.loads((directory / MANIFEST).read_text())
+        except FileNotFoundError as e:
+            raise CommandError(f"No {MANIFEST} in {directory}") from e
+
+        tables = {_table(model)[0]: _table(model)[1] for model in MODELS}
+        for entry in manifest["tables"]:
+            if not set(entry["columns"]) <= set(tables.get(entry["table"], ())):
+                raise CommandError(f"{entry['table']} in {MANIFEST} does not match the current schema")
+
+        quoted_tables = ", ".join(connection.ops.quote_name(table) for table in tables)
+        with transaction.atomic(), connection.cursor() as cursor:
+            # TRUNCATE refuses to run while deferred foreign key checks are pending
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+            cursor.execute(f"TRUNCATE {quoted_tables} RESTART IDENTITY CASCADE")
+            cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+            for entry in manifest["tables"]:
+                with open(directory / f"{entry['table']}.copy", "rb") as file:
+                    _copy_from(cursor, f"COPY {_quoted(entry['table'], entry['columns'])} FROM STDIN", file)
+                self.stdout.write(f"{entry['table']}: {entry['rows']} rows")
+
+            self.remap_content_types(cursor, manifest["content_types"])
+            for sql in connection.ops.sequence_reset_sql(no_style(), MODELS):
+                cursor.execute(sql)
+
+            rebuild_user_stats()
+            rebuild_leaderboards()
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {quoted_tables}")
+
+        return sum(entry["rows"] for entry in manifest["tables"])
+
+    def remap_content_types(self, cursor, exported):
+        """Point votes at this database's content type ids when they differ from the exporting one"""
+        current = _content_type_ids()
+        changed = {exported[label]: pk for label, pk in current.items() if exported.get(label, pk) != pk}
+        if not changed:
+            return
+
+        table = connection.ops.quote_name(Vote._meta.db_table)
+        cases = " ".join("WHEN %s THEN %s" for _ in changed)
+        params = [value for pair in changed.items() for value in pair]
+        cursor.execute(
+            f"UPDATE {table} SET content_type_id = CASE content_type_id {cases} END WHERE content_type_id = ANY(%s)",
+            [*params, list(changed)],
+        )
+
+
+# COPY goes through the driver's own API, which psycopg 2 and 3 (installed by the pool extra) spell differently.
+# Files are binary: COPY's text format is UTF-8 bytes either way, with no newline translation.
+def _copy_to(cursor, sql, file):
+    if _psycopg3():
+        with cursor.copy(sql) as copy:
+            for data in copy:
+                file.write(data)
+    else:
+        cursor.copy_expert(sql, file)
+
+
+def _copy_from(cursor, sql, file):
+    if _psycopg3():
+        with cursor.copy(sql) as copy:
+            while data := file.read(COPY_BLOCK_SIZE):
+                copy.write(data)
+    else:
+        cursor.copy_expert(sql, file, size=COPY_BLOCK_SIZE)
+
+
+def _psycopg3():
+    from django.db.backends.postgresql.base import is_psycopg3
+
+    return is_psycopg3
+
+
+def _table(model):
+    return model._meta.db_table, [field.column for field in model._meta.concrete_fields]
+
+
+def _quoted(table, columns):
+    quote = connection.ops.quote_name
+    return f"{quote(table)} ({', '.join(quote(column) for column in columns)})"
+
+
+def _content_type_ids():
+    content_types = ContentType.objects.get_for_models(*VOTEABLE_MODELS).values()
+    return {f"{content_type.app_label}.{content_type.model}": content_type.pk for content_type in content_types}
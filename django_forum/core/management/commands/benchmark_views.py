@@ -0,0 +1,82 @@
+import json
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from forum.models import Question
+
+from core.benchmarks import compare_reports, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a throwaway test database, requests every main view through the test client and writes p50/p95 "
+        "latency and query counts to a JSON report. With --baseline, exits with an error on regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50, help="Timed requests per view")
+        parser.add_argument("--output", default="benchmark-report.json", help="Where to write the JSON report")
+        parser.add_argument("--baseline", help="Report to compare against")
+        parser.add_argument(
+            "--latency-tolerance",
+            type=float,
+            default=0.25,
+            help="Allowed relative p95 slowdown against the baseline",
+        )
+        parser.add_argument("--dataset", help="benchmark_dataset export to load instead of generating data")
+        parser.add_argument("--users", type=int, default=500, help="Users to generate without --dataset")
+        parser.add_argument("--questions", type=int, default=2000, help="Questions to generate without --dataset")
+        parser.add_argument("--seed", type=int, default=42, help="Seed for generated data")
+        parser.add_argument("--keepdb", action="store_true", help="Reuse the test database and its data")
+
+    def handle(self, *args, **options):
+        baseline = self.read_baseline(options["baseline"])
+
+        setup_test_environment(debug=False)
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=options["verbosity"], autoclobber=True, keepdb=options["keepdb"])
+        try:
+            self.seed(options)
+            report = run_benchmarks(iterations=options["iterations"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=options["verbosity"], keepdb=options["keepdb"])
+            teardown_test_environment()
+
+        Path(options["output"]).write_text(json.dumps(report, indent=2))
+        for name, view in report["views"].items():
+            self.stdout.write(
+                f"{name:<16} p50 {view['p50_ms']:>8.2f}ms  p95 {view['p95_ms']:>8.2f}ms  {view['queries']:>3} queries",
+            )
+        self.stdout.write(f"Report written to {options['output']}")
+
+        if baseline is None:
+            return
+        regressions = compare_reports(report, baseline, latency_tolerance=options["latency_tolerance"])
+        if regressions:
+            raise CommandError("Regressions against baseline:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against baseline"))
+
+    def read_baseline(self, path):
+        if path is None:
+            return None
+        try:
+            return json.loads(Path(path).read_text())
+        except FileNotFoundError as e:
+            raise CommandError(f"Baseline {path} does not exist") from e
+
+    def seed(self, options):
+        if options["keepdb"] and Question.objects.exists():
+            return
+        if options["dataset"]:
+            call_command("benchmark_dataset", "import", options["dataset"], "--noinput", stdout=self.stdout)
+        else:
+            call_command(
+                "populate_fake_data",
+                users=options["users"],
+                questions=options["questions"],
+                seed=options["seed"],
+                stdout=self.stdout,
+            )
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import math
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from forum.models import Question
+from forum.views import QuestionListView
+
+from core.loadtest import SCENARIOS, LoadTestError, run_load_test, search_words
+from core.management.commands.populate_fake_data import DEFAULT_PASSWORD
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives a running server with simulated logged-in users browsing, searching, voting and answering, "
+        "and reports throughput, latency percentiles and error rates per endpoint for each concurrency stage. "
+        "Users and questions are read from the database the server uses, e.g. one seeded with populate_fake_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://localhost:8000", help="Server to load")
+        parser.add_argument("--language", default="en", help="Language prefix of the URLs")
+        parser.add_argument(
+            "--ramp",
+            default="10,25,50",
+            help="Comma-separated concurrency levels, each run as its own stage",
+        )
+        parser.add_argument("--duration", type=float, default=30.0, help="Seconds per stage")
+        parser.add_argument(
+            "--scenario",
+            choices=SCENARIOS,
+            default="browse",
+            help="Traffic mix: browse (mostly reads) or votes (back-to-back vote bursts)",
+        )
+        parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between a user's requests")
+        parser.add_argument("--users", type=int, default=200, help="Distinct accounts to log in with")
+        parser.add_argument("--password", default=DEFAULT_PASSWORD, help="Password of those accounts")
+        parser.add_argument("--timeout", type=float, default=30.0, help="Seconds before a request counts as failed")
+        parser.add_argument("--seed", type=int, help="Seed for the traffic mix")
+        parser.add_argument("--output", help="Also write the report to this JSON file")
+
+    def handle(self, *args, **options):
+        try:
+            stages = [int(level) for level in options["ramp"].split(",")]
+        except ValueError as e:
+            raise CommandError(f"--ramp must be comma-separated integers, got {options['ramp']!r}") from e
+
+        targets = self.targets(options["users"])
+        base_url = f"{options['url'].rstrip('/')}/{options['language']}"
+        self.stdout.write(
+            f"Loading {base_url} with {len(targets['usernames'])} accounts, {options['scenario']} scenario, "
+            f"stages {stages}, {options['duration']:g}s each",
+        )
+
+        try:
+            report = asyncio.run(
+                run_load_test(
+                    base_url,
+                    targets,
+                    stages,
+                    options["duration"],
+                    password=options["password"],
+                    actions=SCENARIOS[options["scenario"]],
+                    think_time=options["think_time"],
+                    seed=options["seed"],
+                    timeout=options["timeout"],
+                ),
+            )
+        except LoadTestError as e:
+            raise CommandError(str(e)) from e
+
+        for stage in report:
+            self.print_stage(stage)
+        if options["output"]:
+            Path(options["output"]).write_text(
+                json.dumps({"url": base_url, "scenario": options["scenario"], "stages": report}, indent=2),
+            )
+            self.stdout.write(f"Report written to {options['output']}")
+
+    def targets(self, users):
+        usernames = list(User.objects.filter(is_active=True).order_by("pk").values_list("username", flat=True)[:users])
+        questions = list(Question.objects.order_by("pk").values_list("pk", "author__username", "title"))
+        if not usernames or not questions:
+            raise CommandError("The database needs users and questions, run populate_fake_data first")
+
+        return {
+            "usernames": usernames,
+            "questions": [(pk, author) for pk, author, _ in questions],
+            "search_words": search_words(title for _, _, title in questions),
+            "question_type": ContentType.objects.get_for_model(Question).pk,
+            "pages": math.ceil(len(questions) / QuestionListView.paginate_by),
+        }
+
+    def print_stage(self, stage):
+        total = stage["total"]
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"\n{stage['concurrency']} users, {stage['duration_s']}s: {total['throughput_rps']} req/s, "
+                f"p95 {total['p95_ms']}ms, {total['error_rate']:.2%} errors",
+            ),
+        )
+        if stage["failed_users"]:
+            self.stdout.write(self.style.WARNING(f"{stage['failed_users']} users failed to start or crashed"))
+        self.stdout.write(
+            f"{'endpoint':<16}{'requests':>9}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>9}",
+        )
+        for name, endpoint in stage["endpoints"].items():
+            self.stdout.write(
+                f"{name:<16}{endpoint['requests']:>9}{endpoint['throughput_rps']:>9.1f}{endpoint['p50_ms']:>9.1f}"
+                f"{endpoint['p95_ms']:>9.1f}{endpoint['p99_ms']:>9.1f}{endpoint['error_rate']:>9.2%}",
+            )
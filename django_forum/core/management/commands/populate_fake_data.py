@@ -1,19 +1,35 @@
 # management/commands/populate_fake_data.py
+import os
 import random
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.contrib.contenttypes.models import ContentType
 from django.core.management.base import BaseCommand
-from faker import Faker
+from django.db import connections
+from django.db.models import Max
 from forum.models import Answer, Question
+from leaderboards.snapshots import rebuild_leaderboards
 from reviews.models import CourseReview
+from users.models import UserProfile, UserStats
+from users.stats import rebuild_reputation, rebuild_user_stats
 from votes.models import Vote
 
+from core import fake_data
+
 User = get_user_model()
 
+DEFAULT_PASSWORD = "testpass123"
+ADMIN_COUNT = 3
+
 
 class Command(BaseCommand):
-    help = "Populates database with fake data for all models"
+    help = "Populates database with fake data for all models using bulk inserts"
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -28,172 +44,204 @@ class Command(BaseCommand):
             default=100,
             help="Number of questions to create",
         )
+        parser.add_argument(
+            "--votes-per-user",
+            type=int,
+            default=30,
+            help="Average number of votes each user casts",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows generated per chunk and inserted per query",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes generating fake rows, 1 generates them inline",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            help="Seed for reproducible data, random by default",
+        )
 
     def handle(self, *args, **options):
-        fake = Faker()
-        user_count = options["users"]
-        questions_count = options["questions"]
-
-        self.stdout.write("Starting data population...")
-
-        # Create users with profiles
-        users = self.create_users(fake, user_count)
-
-        # Create questions
-        questions = self.create_questions(fake, questions_count, users)
-
-        # Create answers
-        answers = self.create_answers(fake, questions, users)
-
-        # Create reviews
-        reviews = self.create_reviews(fake, users)
-
-        # Create votes
-        self.create_votes(users, questions, answers, reviews)
-
+        self.batch_size = options["batch_size"]
+        self.seed = options["seed"] if options["seed"] is not None else random.randrange(2**32)
+
+        self.stdout.write(f"Starting data population with seed {self.seed}...")
+        started = time.monotonic()
+        first_user_pk = (User.objects.aggregate(pk=Max("pk"))["pk"] or 0) + 1
+
+        with self.generator(options["workers"]):
+            user_ids, review_ids = self.create_users(options["users"], first_user_pk)
+            question_ids, answer_ids = self.create_questions(options["questions"], user_ids)
+            vote_count = self.create_votes(user_ids, question_ids, answer_ids, review_ids, options["votes_per_user"])
+
+        step = time.monotonic()
+        new_users = User.objects.filter(pk__gte=first_user_pk)
+        rebuild_user_stats(new_users)
+        rebuild_reputation(new_users)
+        rebuild_leaderboards()
+        self.report("Stats and reputation", len(user_ids), step)
+
+        total = len(user_ids) + len(question_ids[0]) + len(answer_ids[0]) + len(review_ids[0]) + vote_count
         self.stdout.write(
             self.style.SUCCESS(
                 f"Successfully created:\n"
-                f"- {len(users)} users\n"
-                f"- {len(questions)} questions\n"
-                f"- {len(answers)} answers\n"
-                f"- {len(reviews)} reviews\n"
-                f"- {Vote.objects.count()} votes",
+                f"- {len(user_ids)} users\n"
+                f"- {len(question_ids[0])} questions\n"
+                f"- {len(answer_ids[0])} answers\n"
+                f"- {len(review_ids[0])} reviews\n"
+                f"- {vote_count} votes\n"
+                f"{self.rate(total, started)}",
             ),
         )
 
-    def create_users(self, fake, count):
-        users = []
-        for i in range(count):
-            try:
-                # Determine role (mostly students, few admins)
-                role = User.Role.ADMIN if i < 3 else User.Role.STUDENT
-
-                user = User.objects.create_user(
-                    username=fake.unique.user_name(),
-                    email=fake.unique.email(),
-                    password="testpass123",
-                    first_name=fake.first_name(),
-                    last_name=fake.last_name(),
-                    role=role,
-                )
-                users.append(user)
-
-                # Update profile
-                profile = user.profile
-                profile.bio = fake.paragraph() if random.random() > 0.3 else ""
-                profile.birthday = (
-                    fake.date_of_birth(
-                        minimum_age=18,
-                        maximum_age=70,
+    @contextmanager
+    def generator(self, workers):
+        """Set ``self.imap`` to an ordered map over chunks, run in ``workers`` processes"""
+        if workers <= 1:
+            self.imap = lambda func, jobs: (func(*job) for job in jobs)
+            yield
+            return
+
+        # Children must not share the parent's database sockets
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            self.imap = lambda func, jobs: _bounded_map(executor, func, jobs, ahead=workers * 2)
+            yield
+
+    def chunks(self, count):
+        for index, start in enumerate(range(0, count, self.batch_size)):
+            yield index, start, min(self.batch_size, count - start)
+
+    def create_users(self, count, offset):
+        step = time.monotonic()
+        password = make_password(DEFAULT_PASSWORD)
+        user_ids = array("q")
+        review_ids = (array("q"), array("q"))
+
+        jobs = [(self.seed, index, offset + start, size) for index, start, size in self.chunks(count)]
+        for rows, reviews in self.imap(fake_data.user_chunk, jobs):
+            users = User.objects.bulk_create(
+                [
+                    User(
+                        username=row["username"],
+                        email=row["email"],
+                        password=password,
+                        first_name=row["first_name"],
+                        last_name=row["last_name"],
+                        # Mostly students, few admins
+                        role=User.Role.ADMIN if len(user_ids) + position < ADMIN_COUNT else User.Role.STUDENT,
                     )
-                    if random.random() > 0.4
-                    else None
-                )
-                profile.reputation_points = random.randint(0, 500)
-                profile.save()
-
-            except Exception as e:
-                self.stdout.write(self.style.WARNING(f"Error creating user: {e}"))
-
-        return users
-
-    def create_questions(self, fake, count, users):
-        questions = []
-
-        for _ in range(count):
-            question = Question.objects.create(
-                title=fake.sentence()[:199],
-                content="\n".join(fake.paragraphs(nb=random.randint(2, 5))),
-                author=random.choice(users),
-                is_solved=random.random() > 0.7,  # 30% chance of being solved
+                    for position, row in enumerate(rows)
+                ],
+            )
+            UserProfile.objects.bulk_create(
+                [
+                    UserProfile(user_id=user.pk, bio=row["bio"], birthday=row["birthday"])
+                    for user, row in zip(users, rows, strict=True)
+                ],
+            )
+            UserStats.objects.bulk_create([UserStats(user_id=user.pk) for user in users])
+            created = CourseReview.objects.bulk_create(
+                [CourseReview(author_id=users[author].pk, **row) for author, row in reviews],
             )
-            questions.append(question)
-        return questions
-
-    def create_answers(self, fake, questions, users):
-        answers = []
-        for question in questions:
-            # Create 1-8 answers per question
-            num_answers = random.randint(1, 8)
-            question_answers = []
-
-            for _ in range(num_answers):
-                answer = Answer.objects.create(
-                    question=question,
-                    content="\n".join(fake.paragraphs(nb=random.randint(1, 4))),
-                    author=random.choice(users),
-                    is_accepted=False,
-                )
-                question_answers.append(answer)
-                answers.append(answer)
-
-            # Mark one answer as accepted if question is solved
-            if question.is_solved and question_answers:
-                accepted_answer = random.choice(question_answers)
-                accepted_answer.mark_accepted()  # This handles reputation points
-
-        return answers
-
-    def create_reviews(self, fake, users):
-        reviews = []
-        course_names = [
-            "Python Bootcamp",
-            "Django Mastery",
-            "React Fundamentals",
-            "JavaScript Pro",
-            "Data Science",
-            "Web Development",
-            "Mobile App Development",
-            "Cloud Engineering",
-            "DevOps Course",
-        ]
 
-        # Ensure each user reviews 2-5 courses
-        for user in users:
-            num_reviews = random.randint(2, 5)
-            user_courses = random.sample(course_names, num_reviews)
-
-            for course in user_courses:
-                review = CourseReview.objects.create(
-                    author=user,
-                    title=fake.sentence(),
-                    content="\n".join(fake.paragraphs(nb=random.randint(2, 4))),
-                    rating=random.randint(1, 5),
-                    course_name=course,
-                )
-                reviews.append(review)
-
-        return reviews
-
-    def create_votes(self, users, questions, answers, reviews):
-        voteable_objects = questions + answers + reviews
-
-        for user in users:
-            # Each user votes on 20-40 random objects
-            objects_to_vote = random.sample(
-                voteable_objects,
-                min(random.randint(20, 40), len(voteable_objects)),
+            user_ids.extend(user.pk for user in users)
+            review_ids[0].extend(review.pk for review in created)
+            review_ids[1].extend(review.author_id for review in created)
+
+        self.report("Users and reviews", len(user_ids) + len(review_ids[0]), step)
+        return user_ids, review_ids
+
+    def create_questions(self, count, user_ids):
+        step = time.monotonic()
+        question_ids = (array("q"), array("q"))
+        answer_ids = (array("q"), array("q"))
+
+        jobs = [(self.seed, index, size, len(user_ids)) for index, _, size in self.chunks(count)]
+        for rows, answers in self.imap(fake_data.question_chunk, jobs):
+            questions = Question.objects.bulk_create(
+                [Question(author_id=user_ids[row.pop("author")], **row) for row in rows],
+            )
+            created = Answer.objects.bulk_create(
+                [
+                    Answer(question_id=questions[question].pk, author_id=user_ids[row.pop("author")], **row)
+                    for question, row in answers
+                ],
+                batch_size=self.batch_size,
             )
 
-            for obj in objects_to_vote:
-                # Skip if user is the author
-                if hasattr(obj, "author") and obj.author == user:
-                    continue
-
-                vote_type = random.choices(
-                    ["up", "down"],
-                    weights=[0.7, 0.3],  # 70% upvotes, 30% downvotes
-                )[0]
-
-                Vote.objects.get_or_create(
-                    user=user,
-                    content_type=ContentType.objects.get_for_model(obj),
-                    object_id=obj.id,
-                    defaults={"vote_type": vote_type},
-                )
-
-                # Update reputation points based on votes
-                if vote_type == "up" and hasattr(obj, "author"):
-                    obj.author.profile.reputation_points += 1
-                    obj.author.profile.save()
+            question_ids[0].extend(question.pk for question in questions)
+            question_ids[1].extend(question.author_id for question in questions)
+            answer_ids[0].extend(answer.pk for answer in created)
+            answer_ids[1].extend(answer.author_id for answer in created)
+
+        self.report("Questions and answers", len(question_ids[0]) + len(answer_ids[0]), step)
+        return question_ids, answer_ids
+
+    def create_votes(self, user_ids, question_ids, answer_ids, review_ids, votes_per_user):
+        step = time.monotonic()
+        # One pool of everything voteable, addressed by position: questions, then answers, then reviews
+        pool = []
+        for model, (pks, authors) in ((Question, question_ids), (Answer, answer_ids), (CourseReview, review_ids)):
+            pool.append((len(pks), ContentType.objects.get_for_model(model).pk, pks, authors))
+        pool_size = sum(size for size, *_ in pool)
+        if not user_ids or not pool_size:
+            return 0
+
+        jobs = [
+            (self.seed, index, start, size, pool_size, votes_per_user)
+            for index, start, size in self.chunks(len(user_ids))
+        ]
+        vote_count = 0
+        for rows in self.imap(fake_data.vote_chunk, jobs):
+            votes = []
+            for user, target, vote_type in rows:
+                content_type_id, object_id, author_id = _pool_item(pool, target)
+                # Nobody votes on their own content
+                if author_id != user_ids[user]:
+                    votes.append(
+                        Vote(
+                            user_id=user_ids[user],
+                            content_type_id=content_type_id,
+                            object_id=object_id,
+                            vote_type=vote_type,
+                        ),
+                    )
+            Vote.objects.bulk_create(votes, batch_size=self.batch_size)
+            vote_count += len(votes)
+
+        self.report("Votes", vote_count, step)
+        return vote_count
+
+    def report(self, label, rows, started):
+        self.stdout.write(f"{label}: {rows} rows, {self.rate(rows, started)}")
+
+    def rate(self, rows, started):
+        elapsed = time.monotonic() - started
+        return f"{elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)"
+
+
+def _pool_item(pool, position):
+    for size, content_type_id, pks, authors in pool:
+        if position < size:
+            return content_type_id, pks[position], authors[position]
+        position -= size
+    raise IndexError(position)
+
+
+def _bounded_map(executor, func, jobs, ahead):
+    """Ordered ``executor.map`` that keeps at most ``ahead`` chunks in flight to cap memory use"""
+    pending = deque()
+    for job in jobs:
+        pending.append(executor.submit(func, *job))
+        if len(pending) >= ahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
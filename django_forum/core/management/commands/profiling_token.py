@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.profiling import make_token
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints a signed X-Profile-Token header value. Requests sending it are profiled by ProfilingMiddleware "
+        "regardless of PROFILING_SAMPLE_RATE, until the token is PROFILING_TOKEN_MAX_AGE seconds old."
+    )
+
+    def handle(self, *args, **options):
+        if not settings.PROFILING_DIR:
+            self.stderr.write(self.style.WARNING("PROFILING_DIR is not set, the profiling middleware is off"))
+        self.stdout.write(f"X-Profile-Token: {make_token()}")
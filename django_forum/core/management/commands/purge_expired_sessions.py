@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes expired rows from django_session in small batches. "
+        "Unlike clearsessions, each batch is its own short transaction, so the table is never locked for long."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of sessions to delete per batch",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.1,
+            help="Seconds to sleep between batches",
+        )
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE not in (
+            "django.contrib.sessions.backends.db",
+            "django.contrib.sessions.backends.cached_db",
+        ):
+            self.stdout.write(self.style.WARNING(f"{settings.SESSION_ENGINE} does not store sessions in the database"))
+
+        batch_size = options["batch_size"]
+        now = timezone.now()
+        total = 0
+
+        while True:
+            keys = list(
+                Session.objects.filter(expire_date__lt=now).values_list("session_key", flat=True)[:batch_size],
+            )
+            if not keys:
+                break
+
+            # Re-checked, so a session refreshed since the SELECT survives
+            deleted, _ = Session.objects.filter(session_key__in=keys, expire_date__lt=now).delete()
+            total += deleted
+            self.stdout.write(f"Deleted {total} expired sessions...")
+
+            if len(keys) < batch_size:
+                break
+            time.sleep(options["pause"])
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {total} expired sessions"))
@@ -0,0 +1,87 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SORT_KEYS = {
+    "total": lambda query: query["total_ms"],
+    "count": lambda query: query["count"],
+    "max": lambda query: query["max_ms"],
+    "mean": lambda query: query["total_ms"] / query["count"],
+}
+
+
+class Command(BaseCommand):
+    help = "Prints the slowest query fingerprints from the slow-query log, with the views running them and their plans."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--log", default=None, help="Slow-query log to read (default: SLOW_QUERY_LOG)")
+        parser.add_argument("--limit", type=int, default=10, help="Number of fingerprints to show")
+        parser.add_argument(
+            "--sort", choices=list(SORT_KEYS), default="total", help="Rank by total, count, max or mean time"
+        )
+        parser.add_argument("--view", help="Only queries run by this URL name, e.g. forum:question_list")
+        parser.add_argument("--no-plans", action="store_false", dest="plans", help="Leave out the EXPLAIN plans")
+
+    def handle(self, *args, **options):
+        path = Path(options["log"] or settings.SLOW_QUERY_LOG)
+        # Oldest rotated file (highest number) first, so the newest plan for a fingerprint wins
+        rotated = [file for file in path.parent.glob(f"{path.name}.*") if file.suffix[1:].isdigit()]
+        rotated.sort(key=lambda file: int(file.suffix[1:]), reverse=True)
+        files = [file for file in [*rotated, path] if file.exists()]
+        if not files:
+            raise CommandError(f"{path} does not exist - no query has been slower than SLOW_QUERY_THRESHOLD_MS yet")
+
+        queries = {}
+        for file in files:
+            self.aggregate(file, queries, options["view"])
+
+        ranked = sorted(queries.values(), key=SORT_KEYS[options["sort"]], reverse=True)[: options["limit"]]
+        if not ranked:
+            self.stdout.write("No slow queries logged")
+        for number, query in enumerate(ranked, 1):
+            self.print_query(number, query, plans=options["plans"])
+
+    def aggregate(self, file, queries, view):
+        with open(file, encoding="utf-8") as lines:
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if view and entry["view"] != view:
+                    continue
+
+                query = queries.setdefault(
+                    entry["fingerprint"],
+                    {"sql": entry["sql"], "count": 0, "total_ms": 0.0, "max_ms": 0.0, "views": {}, "plan": None},
+                )
+                query["count"] += 1
+                query["total_ms"] += entry["duration_ms"]
+                if entry["duration_ms"] >= query["max_ms"]:
+                    query["max_ms"] = entry["duration_ms"]
+                    query["stack"] = entry["stack"]
+                views = query["views"]
+                views[entry["view"] or "-"] = views.get(entry["view"] or "-", 0) + 1
+                query["plan"] = entry["plan"] or query["plan"]
+                query["fingerprint"] = entry["fingerprint"]
+
+    def print_query(self, number, query, *, plans):
+        mean = query["total_ms"] / query["count"]
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"#{number} {query['fingerprint']}: {query['count']}x, total {query['total_ms']:.0f}ms, "
+                f"mean {mean:.1f}ms, max {query['max_ms']:.1f}ms",
+            ),
+        )
+        views = ", ".join(f"{view} ({count})" for view, count in sorted(query["views"].items(), key=lambda v: -v[1]))
+        self.stdout.write(f"  views: {views}")
+        self.stdout.write(f"  sql:   {query['sql']}")
+        for frame in query.get("stack", []):
+            self.stdout.write(f"  at {frame}")
+        if plans and query["plan"]:
+            self.stdout.write("  plan:")
+            for line in query["plan"].splitlines():
+                self.stdout.write(f"    {line}")
+        self.stdout.write("")
@@ -0,0 +1,24 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+from core.warmup import SHARED_ENTRIES, warm_shared_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the shared cache entries every page reads, so the first requests after a deploy or a cache "
+        "flush find them ready instead of all computing them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clear", action="store_true", help="Empty the shared cache first")
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            caches["default"].clear()
+            self.stdout.write("Cleared the default cache")
+
+        timings = warm_shared_cache()
+        for key, seconds in timings.items():
+            self.stdout.write(f"{key:<24} {seconds * 1000:>8.1f}ms")
+        self.stdout.write(self.style.SUCCESS(f"Warmed {len(SHARED_ENTRIES)} entries"))
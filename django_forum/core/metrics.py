@@ -0,0 +1,359 @@
+"""Prometheus-format metrics without a client library or an external service.
+
+Every process keeps its samples in a dict of doubles. When ``METRICS_DIR`` is
+set, the dict lives in a memory-mapped file ``<pid>.db`` in that directory,
+so the ``/metrics`` view of any gunicorn worker can sum the samples of all
+of them. Recording a sample is a ``struct.pack_into`` on the mapping;
+scraping reads a few small files.
+
+When a worker exits, ``mark_process_dead()`` adds its counters and
+histograms into ``archive.db`` and removes its file, so sums never go down
+and Prometheus sees no counter reset when gunicorn recycles workers.
+Per-process series (labelled by ``pid``) are dropped with their process.
+
+File layout: an 8-byte header holding the number of bytes in use, then
+entries of ``<key length: uint32><key: utf-8, padded to 8 bytes><value: float64>``.
+Keys are JSON ``[sample name, [[label, value], ...]]``.
+"""
+
+import contextlib
+import functools
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+
+import django.conf
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 30, 50, 100, 200)
+
+INITIAL_FILE_SIZE = 64 * 1024
+HEADER = struct.Struct("<Q")
+KEY_LENGTH = struct.Struct("<I")
+VALUE = struct.Struct("<d")
+ARCHIVE = "archive.db"
+LOCK = "metrics.lock"
+
+_registry = {}
+
+
+def _format_number(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=(), *, per_process=False):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Series of one process, dropped when it dies instead of archived
+        self.per_process = per_process
+        _registry[name] = self
+
+    def inc(self, *labelvalues, amount=1):
+        _store().inc(_key(self.name + "_total", self.labelnames, labelvalues), amount)
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = [(bound, _format_number(bound)) for bound in (*buckets, math.inf)]
+        self.per_process = False
+        _registry[name] = self
+
+    def observe(self, value, *labelvalues):
+        store = _store()
+        # Buckets are stored cumulatively, so summing files and rendering need no extra work
+        for bound, le in self.buckets:
+            if value <= bound:
+                store.inc(_key(self.name + "_bucket", (*self.labelnames, "le"), (*labelvalues, le)), 1)
+        store.inc(_key(self.name + "_sum", self.labelnames, labelvalues), value)
+        store.inc(_key(self.name + "_count", self.labelnames, labelvalues), 1)
+
+
+REQUEST_DURATION = Histogram(
+    "forum_request_duration_seconds",
+    "Request latency by URL name",
+    ["view", "method"],
+)
+REQUEST_QUERIES = Histogram(
+    "forum_request_queries",
+    "Database queries per request by URL name",
+    ["view"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    "forum_request_db_duration_seconds",
+    "Time spent in the database per request by URL name",
+    ["view"],
+)
+RESPONSES = Counter("forum_responses", "Responses by URL name and status class", ["view", "status"])
+CACHE_REQUESTS = Counter("forum_cache_requests", "Application cache lookups by result", ["result"])
+VOTES = Counter("forum_votes", "Vote writes by voted model and action", ["model", "action"])
+WORKER_REQUESTS = Counter(
+    "forum_worker_requests",
+    "Requests served by each worker process",
+    ["pid"],
+    per_process=True,
+)
+WORKER_BUSY = Counter(
+    "forum_worker_busy_seconds",
+    "Time each worker process spent serving requests",
+    ["pid"],
+    per_process=True,
+)
+
+
+def observe_request(view, method, status, metrics, total):
+    """Record a finished request measured by the timing middleware"""
+    view = view or "unresolved"
+    pid = str(os.getpid())
+    REQUEST_DURATION.observe(total, view, method)
+    REQUEST_QUERIES.observe(metrics.queries, view)
+    REQUEST_DB_DURATION.observe(metrics.db_time, view)
+    RESPONSES.inc(view, f"{status // 100}xx")
+    WORKER_REQUESTS.inc(pid)
+    WORKER_BUSY.inc(pid, amount=total)
+
+
+def render():
+    """Return the samples of every process in the Prometheus text format"""
+    samples = {}
+    for key, value in _collect():
+        samples[key] = samples.get(key, 0.0) + value
+
+    by_metric = {}
+    for key, value in samples.items():
+        name, labels = json.loads(key)
+        by_metric.setdefault(_metric_name(name), []).append((name, labels, value))
+
+    lines = []
+    for metric_name in sorted(by_metric):
+        metric = _registry.get(metric_name)
+        if metric is not None:
+            lines.append(f"# HELP {metric_name} {metric.documentation}")
+            lines.append(f"# TYPE {metric_name} {metric.type}")
+        for name, labels, value in sorted(by_metric[metric_name], key=_sample_order):
+            lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def mark_process_dead(pid, directory=None):
+    """Fold a dead worker's samples into the archive and remove its file"""
+    directory = directory or django.conf.settings.METRICS_DIR
+    if not directory:
+        return
+    path = Path(directory, f"{pid}.db")
+    # Exclusive, so no scrape sees the samples in both files or in neither
+    with _locked(directory, exclusive=True):
+        try:
+            samples = _read_file(path)
+        except FileNotFoundError:
+            return
+        archive = _MmapStore(Path(directory, ARCHIVE))
+        try:
+            for key, value in samples:
+                if not _per_process(key):
+                    archive.inc(key, value)
+        finally:
+            archive.close()
+        path.unlink()
+
+
+def reset():
+    """Forget this process' samples, for tests"""
+    global _local_store
+    if _local_store is not None:
+        _local_store.close()
+    _local_store = None
+
+
+class _DictStore:
+    def __init__(self):
+        self.pid = os.getpid()
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, key, amount):
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def items(self):
+        with self.lock:
+            return list(self.values.items())
+
+    def close(self):
+        pass
+
+
+class _MmapStore:
+    def __init__(self, path):
+        self.pid = os.getpid()
+        self.path = path
+        self.lock = threading.Lock()
+        self.positions = {}
+        self.file = open(path, "a+b")  # noqa: SIM115 - kept open for the life of the process
+        if os.fstat(self.file.fileno()).st_size == 0:
+            self.file.truncate(INITIAL_FILE_SIZE)
+        self.mapping = mmap.mmap(self.file.fileno(), 0)
+        self.used = HEADER.unpack_from(self.mapping, 0)[0] or HEADER.size
+        for key, _, position in _read_entries(self.mapping):
+            self.positions[key] = position
+
+    def inc(self, key, amount):
+        with self.lock:
+            position = self.positions.get(key)
+            if position is None:
+                position = self._add(key)
+            VALUE.pack_into(self.mapping, position, VALUE.unpack_from(self.mapping, position)[0] + amount)
+
+    def items(self):
+        with self.lock:
+            return [(key, VALUE.unpack_from(self.mapping, position)[0]) for key, position in self.positions.items()]
+
+    def close(self):
+        self.mapping.close()
+        self.file.close()
+
+    def _add(self, key):
+        encoded = key.encode()
+        padded = len(encoded) + (-(KEY_LENGTH.size + len(encoded)) % 8)
+        size = KEY_LENGTH.size + padded + VALUE.size
+        if self.used + size > len(self.mapping):
+            self._grow(self.used + size)
+
+        KEY_LENGTH.pack_into(self.mapping, self.used, len(encoded))
+        self.mapping[self.used + KEY_LENGTH.size : self.used + KEY_LENGTH.size + len(encoded)] = encoded
+        position = self.used + KEY_LENGTH.size + padded
+        VALUE.pack_into(self.mapping, position, 0.0)
+        # The entry is complete before readers can see it
+        self.used += size
+        HEADER.pack_into(self.mapping, 0, self.used)
+        self.positions[key] = position
+        return position
+
+    def _grow(self, needed):
+        size = len(self.mapping)
+        while size < needed:
+            size *= 2
+        self.mapping.close()
+        self.file.truncate(size)
+        self.mapping = mmap.mmap(self.file.fileno(), 0)
+
+
+_local_store = None
+_store_lock = threading.Lock()
+
+
+def _store():
+    global _local_store
+    pid = os.getpid()
+    # A forked worker must not keep writing into its parent's file
+    if _local_store is None or _local_store.pid != pid:
+        with _store_lock:
+            if _local_store is None or _local_store.pid != pid:
+                _local_store = _open_store(pid)
+    return _local_store
+
+
+def _open_store(pid):
+    directory = django.conf.settings.METRICS_DIR
+    if not directory:
+        return _DictStore()
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    return _MmapStore(Path(directory, f"{pid}.db"))
+
+
+def _collect():
+    directory = django.conf.settings.METRICS_DIR
+    if not directory:
+        return _store().items()
+
+    samples = []
+    with _locked(directory, exclusive=False):
+        for path in Path(directory).glob("*.db"):
+            with contextlib.suppress(FileNotFoundError):
+                samples.extend(_read_file(path))
+    return samples
+
+
+def _read_file(path):
+    with open(path, "rb") as file:
+        data = file.read()
+    return [(key, VALUE.unpack_from(data, position)[0]) for key, _, position in _read_entries(data)]
+
+
+@contextlib.contextmanager
+def _locked(directory, *, exclusive):
+    # Metric files are only shared between gunicorn processes, so only on Unix
+    import fcntl
+
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    with open(Path(directory, LOCK), "a") as file:
+        fcntl.flock(file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+def _per_process(key):
+    metric = _registry.get(_metric_name(json.loads(key)[0]))
+    return metric is not None and metric.per_process
+
+
+def _read_entries(data):
+    if len(data) < HEADER.size:
+        return
+    used = HEADER.unpack_from(data, 0)[0]
+    position = HEADER.size
+    while position < used:
+        length = KEY_LENGTH.unpack_from(data, position)[0]
+        start = position + KEY_LENGTH.size
+        key = bytes(data[start : start + length]).decode()
+        value_position = start + length + (-(KEY_LENGTH.size + length) % 8)
+        yield key, length, value_position
+        position = value_position + VALUE.size
+
+
+@functools.lru_cache(maxsize=4096)
+def _key(name, labelnames, labelvalues):
+    if len(labelnames) != len(labelvalues):
+        raise ValueError(f"{name} expects labels {labelnames}, got {labelvalues}")
+    return json.dumps([name, [[label, str(value)] for label, value in zip(labelnames, labelvalues, strict=True)]])
+
+
+def _metric_name(sample_name):
+    for suffix in ("_bucket", "_sum", "_count", "_total"):
+        if sample_name.endswith(suffix) and sample_name.removesuffix(suffix) in _registry:
+            return sample_name.removesuffix(suffix)
+    return sample_name
+
+
+def _sample_order(sample):
+    name, labels, _ = sample
+    # Keep buckets in numeric order within each series
+    plain = [(label, value) for label, value in labels if label != "le"]
+    le = next((float(value) for label, value in labels if label == "le"), 0.0)
+    return plain, name, le
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{label}="{_escape(value)}"' for label, value in labels) + "}"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -0,0 +1,190 @@
+import logging
+import random
+import time
+
+import django.conf
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+
+from core import metrics as prometheus
+from core import profiling
+from core.db_routers import routing
+from core.instrumentation import end_request, start_request
+
+logger = logging.getLogger("core.requests")
+
+
+class RequestTimingMiddleware:
+    """Measures every request and reports it in one log line and, with ``SERVER_TIMING_HEADER``, a ``Server-Timing`` header.
+
+    Records total time, database time and query count, template render time
+    (context processors included, and also reported on their own) and cache
+    hits/misses. Keep it first in ``MIDDLEWARE`` so the total covers the
+    other middleware as well. Works under both WSGI and ASGI.
+    """
+
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = start_request(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics, token = start_request(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        total = metrics.total_time
+        if django.conf.settings.SERVER_TIMING_HEADER:
+            response["Server-Timing"] = _server_timing(metrics, total)
+        _log(request, response, metrics, total)
+        return response
+
+
+class ProfilingMiddleware:
+    """Profiles a ``PROFILING_SAMPLE_RATE`` fraction of requests, plus those with a valid ``X-Profile-Token``.
+
+    Profiles go to ``PROFILING_DIR`` tagged with the URL name, in the
+    ``PROFILING_FORMAT`` of ``core.profiling``. Without ``PROFILING_DIR``
+    the middleware removes itself at startup and costs nothing.
+    """
+
+    def __init__(self, get_response):
+        settings = django.conf.settings
+        if not settings.PROFILING_DIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.profiler_class = profiling.PROFILERS[settings.PROFILING_FORMAT]
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.token_max_age = settings.PROFILING_TOKEN_MAX_AGE
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profiler = self.profiler_class()
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+
+        match = request.resolver_match
+        path = profiling.save(profiler, match.view_name if match else None)
+        logger.info("Profiled %s %s to %s", request.method, request.path, path)
+        return response
+
+    def should_profile(self, request):
+        token = request.headers.get("X-Profile-Token")
+        if token:
+            return profiling.check_token(token, self.token_max_age)
+        return random.random() < self.sample_rate
+
+
+class ReplicaPinningMiddleware:
+    """Routes each request through ``core.db_routers`` and pins clients that wrote to the primary.
+
+    Unsafe methods (POST, ...) read from the primary throughout, since what
+    they read decides what they write. A request that writes sets a cookie holding the time until which the
+    client's reads must stay on the primary, ``REPLICA_PIN_SECONDS`` ahead,
+    which should exceed the usual replica lag. Keep it above the session
+    middleware, so the session is read from the primary right after a login.
+    Without ``DATABASE_REPLICAS`` the middleware removes itself at startup.
+    """
+
+    cookie_name = "replica_pin"
+    safe_methods = ("GET", "HEAD", "OPTIONS")
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        settings = django.conf.settings
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.pin_seconds = settings.REPLICA_PIN_SECONDS
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routing(pinned=self.is_pinned(request)) as state:
+            response = self.get_response(request)
+        return self.finish(request, response, state)
+
+    async def __acall__(self, request):
+        # The routing state is a context variable, which the async ORM's worker threads inherit
+        with routing(pinned=self.is_pinned(request)) as state:
+            response = await self.get_response(request)
+        return self.finish(request, response, state)
+
+    def finish(self, request, response, state):
+        if state.wrote:
+            response.set_cookie(
+                self.cookie_name,
+                f"{time.time() + self.pin_seconds:.3f}",
+                max_age=self.pin_seconds,
+                secure=request.is_secure(),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def is_pinned(self, request):
+        if request.method not in self.safe_methods:
+            return True
+        try:
+            return float(request.COOKIES.get(self.cookie_name, 0)) > time.time()
+        except ValueError:
+            return False
+
+
+def _server_timing(metrics, total):
+    return ", ".join(
+        [
+            f"total;dur={total * 1000:.1f}",
+            f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+            f"tpl;dur={metrics.template_time * 1000:.1f}",
+            f"ctx;dur={metrics.context_time * 1000:.1f}",
+            f'cache;desc="hits={metrics.cache_hits} misses={metrics.cache_misses}"',
+        ]
+    )
+
+
+def _log(request, response, metrics, total):
+    match = request.resolver_match
+    view = match.view_name if match else None
+    prometheus.observe_request(view, request.method, response.status_code, metrics, total)
+    fields = {
+        "method": request.method,
+        "path": request.path,
+        "view": view,
+        "status": response.status_code,
+        "total_ms": round(total * 1000, 1),
+        "db_ms": round(metrics.db_time * 1000, 1),
+        "queries": metrics.queries,
+        "template_ms": round(metrics.template_time * 1000, 1),
+        "context_ms": round(metrics.context_time * 1000, 1),
+        "cache_hits": metrics.cache_hits,
+        "cache_misses": metrics.cache_misses,
+    }
+    context_processors = {name: round(seconds * 1000, 1) for name, seconds in metrics.context_processors.items()}
+    logger.info(
+        " ".join(f"{key}={value}" for key, value in fields.items()),
+        extra={"request_metrics": fields, "context_processors": context_processors},
+    )
@@ -0,0 +1,112 @@
+"""Per-request profiles for the profiling middleware.
+
+Two formats are supported:
+
+* ``pstats`` - a deterministic cProfile dump, open it with ``python -m pstats``
+  or snakeviz;
+* ``collapsed`` - stacks sampled from the request thread every
+  ``PROFILING_INTERVAL`` seconds, one ``frame;frame;frame count`` line per
+  stack, ready for flamegraph.pl or speedscope. Much cheaper than cProfile.
+"""
+
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+import django.conf
+from django.core import signing
+
+TOKEN_SALT = "core.profiling"
+TOKEN_VALUE = "profile"
+
+
+def make_token():
+    """Return a value for the ``X-Profile-Token`` header that forces a request to be profiled"""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(TOKEN_VALUE)
+
+
+def check_token(token, max_age):
+    try:
+        return signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=max_age) == TOKEN_VALUE
+    except signing.BadSignature:
+        return False
+
+
+class CProfiler:
+    suffix = "pstats"
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def write(self, path):
+        self.profile.dump_stats(path)
+
+
+class StackSampler:
+    suffix = "collapsed"
+
+    def __init__(self, interval=None):
+        self.interval = interval or django.conf.settings.PROFILING_INTERVAL
+        self.thread_id = threading.get_ident()
+        self.stacks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        lines = (f"{stack} {count}" for stack, count in sorted(self.stacks.items()))
+        Path(path).write_text("\n".join(lines) + "\n" if self.stacks else "")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = ";".join(reversed(list(_frames(frame))))
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+
+PROFILERS = {"pstats": CProfiler, "collapsed": StackSampler}
+
+
+def save(profiler, view_name, directory=None, max_files=None):
+    """Write ``profiler`` to the profile directory, dropping the oldest profiles beyond ``max_files``"""
+    settings = django.conf.settings
+    directory = Path(directory or settings.PROFILING_DIR)
+    max_files = settings.PROFILING_MAX_FILES if max_files is None else max_files
+    directory.mkdir(parents=True, exist_ok=True)
+
+    tag = re.sub(r"[^\w.-]+", "_", view_name or "unresolved")
+    # Names start with the time so they sort oldest first
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}-{os.getpid()}"
+    path = directory / f"{stamp}-{tag}.{profiler.suffix}"
+    profiler.write(path)
+
+    profiles = [profile for suffix in PROFILERS for profile in directory.glob(f"*.{suffix}")]
+    profiles.sort(key=lambda profile: profile.name)
+    for old in profiles[: max(0, len(profiles) - max_files)]:
+        old.unlink(missing_ok=True)
+    return path
+
+
+def _frames(frame):
+    while frame is not None:
+        code = frame.f_code
+        yield f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+        frame = frame.f_back
@@ -0,0 +1,143 @@
+"""Slow-query log: queries slower than ``SLOW_QUERY_THRESHOLD_MS`` with their fingerprint, view, caller and plan.
+
+``record_slow_queries`` is installed as an execute wrapper on every database
+connection (see ``CoreConfig.ready``). Each slow query is appended to an
+in-process ring buffer and logged as one JSON line to the
+``core.slow_queries`` logger, which ``SLOW_QUERY_LOG`` points at a file.
+The first time a process sees a fingerprint it also captures the
+``EXPLAIN`` plan. ``manage.py slow_queries`` ranks the logged fingerprints.
+"""
+
+import collections
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import traceback
+
+import django.conf
+from django.utils import timezone
+
+from core.instrumentation import current_metrics
+
+logger = logging.getLogger("core.slow_queries")
+
+RING_BUFFER_SIZE = 500
+STACK_DEPTH = 6
+# Bounds memory if a process keeps producing new fingerprints
+MAX_EXPLAINED = 10_000
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+# Frames left out of stack summaries
+INSTRUMENTATION = {
+    "manage.py",
+    "core/instrumentation.py",
+    "core/middleware.py",
+    "core/slow_queries.py",
+    "core/template_backends.py",
+}
+
+_recent = collections.deque(maxlen=RING_BUFFER_SIZE)
+_explained = set()
+_lock = threading.Lock()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """Return ``(id, normalized sql)``; queries differing only in values or ``IN`` list length share an id"""
+    normalized = sql.replace("%s", "?")
+    normalized = _STRING.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _PLACEHOLDER_LIST.sub("(...)", normalized)
+    normalized = _WHITESPACE.sub(" ", normalized).strip()
+    return hashlib.sha1(normalized.encode(), usedforsecurity=False).hexdigest()[:12], normalized
+
+
+def record_slow_queries(execute, sql, params, many, context):
+    threshold = django.conf.settings.SLOW_QUERY_THRESHOLD_MS
+    if not threshold:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    # Failed queries are left to the exception; EXPLAIN would fail in their aborted transaction too
+    duration_ms = (time.perf_counter() - start) * 1000
+    if duration_ms >= threshold:
+        _record(sql, params, many, context["connection"], duration_ms)
+    return result
+
+
+def recent():
+    """Slow queries recorded by this process, oldest first"""
+    with _lock:
+        return list(_recent)
+
+
+def reset():
+    with _lock:
+        _recent.clear()
+        _explained.clear()
+
+
+def _record(sql, params, many, connection, duration_ms):
+    query_id, normalized = fingerprint(sql)
+    with _lock:
+        first_seen = query_id not in _explained
+        if first_seen:
+            if len(_explained) >= MAX_EXPLAINED:
+                _explained.clear()
+            _explained.add(query_id)
+
+    metrics = current_metrics()
+    match = metrics.request.resolver_match if metrics is not None and metrics.request is not None else None
+    entry = {
+        "time": timezone.now().isoformat(),
+        "fingerprint": query_id,
+        "duration_ms": round(duration_ms, 2),
+        "sql": normalized,
+        "view": match.view_name if match else None,
+        "stack": _stack_summary(),
+        "plan": _explain(connection, sql, params) if first_seen and not many else None,
+    }
+    with _lock:
+        _recent.append(entry)
+    logger.warning(json.dumps(entry))
+
+
+def _explain(connection, sql, params):
+    if connection.vendor != "postgresql" or not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+
+    # Straight on the driver cursor, so execute wrappers do not see it. In a transaction a failing
+    # EXPLAIN would abort it, so it runs inside its own savepoint there.
+    in_transaction = not connection.get_autocommit()
+    with connection.connection.cursor() as cursor:
+        if in_transaction:
+            cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute(f"EXPLAIN (ANALYZE off) {sql}", params)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        except Exception as e:
+            # A missing plan must never break the caller of the query
+            plan = f"EXPLAIN failed: {e}"
+            if in_transaction:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+        if in_transaction:
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+    return plan
+
+
+def _stack_summary():
+    # The innermost project frames, skipping Django, third-party code and the instrumentation itself
+    base_dir = str(django.conf.settings.BASE_DIR) + "/"
+    frames = []
+    for frame in traceback.extract_stack():
+        filename = frame.filename.removeprefix(base_dir)
+        if filename != frame.filename and "site-packages" not in filename and filename not in INSTRUMENTATION:
+            frames.append(f"{filename}:{frame.lineno} in {frame.name}")
+    return frames[-STACK_DEPTH:]
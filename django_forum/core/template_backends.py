@@ -0,0 +1,54 @@
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from core.instrumentation import current_metrics
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, recording render and context processor time for the timing middleware"""
+
+    def __init__(self, params):
+        super().__init__(params)
+        self.engine.template_context_processors = tuple(
+            _timed_processor(processor) for processor in self.engine.template_context_processors
+        )
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name).template, self)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current_metrics()
+        if metrics is None:
+            return super().render(context, request)
+
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - start
+
+
+def _timed_processor(processor):
+    name = f"{processor.__module__}.{processor.__qualname__}"
+
+    def timed(request):
+        metrics = current_metrics()
+        if metrics is None:
+            return processor(request)
+
+        start = time.perf_counter()
+        try:
+            return processor(request)
+        finally:
+            metrics.context_processors[name] = metrics.context_processors.get(name, 0.0) + time.perf_counter() - start
+
+    return timed
@@ -0,0 +1,105 @@
+import io
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncRequestFactory
+from django.test.utils import CaptureQueriesContext
+
+
+def async_request(path, user, *, method="post", data=None):
+    """Build a request from ``user`` for calling an async view directly.
+
+    The URLconf serves the async variant of a view only under ASGI, so
+    tests call it themselves; the request skips the middleware.
+    """
+    request = getattr(AsyncRequestFactory(), method)(path, data)
+    request.user = user
+
+    async def auser():
+        return user
+
+    request.auser = auser
+    return request
+
+
+class QueryBudgetMixin:
+    """TestCase mixin asserting that a view stays within a query budget however much data there is"""
+
+    def count_queries(self, url, *, method="get", data=None, client=None):
+        """Request ``url`` and return ``(response, number of queries)``"""
+        client = client or self.client
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, method)(url, data)
+        # Read the count right away, the next request resets the connection's query log
+        return response, len(queries)
+
+    def assertQueryBudget(self, url, budget, grow=None, *, method="get", data=None, client=None):
+        """Assert that ``url`` runs at most ``budget`` queries, and the same number again after ``grow()``.
+
+        ``grow`` should add data the view displays (more answers, votes, ...);
+        an unchanged count after it shows the view has no per-row queries.
+        GET views are requested once beforehand so warm-up queries, e.g. the
+        content type cache filling, are not counted.
+        """
+        if method == "get":
+            self.count_queries(url, client=client, data=data)
+
+        response, before = self.count_queries(url, method=method, data=data, client=client)
+        self.assertLess(response.status_code, 500, f"{url} failed with {response.status_code}")
+        self.assertLessEqual(before, budget, f"{url} ran {before} queries, the budget is {budget}")
+
+        if grow is not None:
+            grow()
+            _, after = self.count_queries(url, method=method, data=data, client=client)
+            self.assertEqual(after, before, f"{url} ran {before} queries, then {after} with more data - N+1?")
+
+        return response
+
+
+class QueryPlanMixin:
+    """TestCase mixin asserting on the PostgreSQL plans of querysets.
+
+    Plans are taken with ``enable_seqscan`` off. The planner then only picks a
+    sequential scan when no index can serve the query, so a ``Seq Scan`` in
+    the plan means a missing index however few rows the test tables hold.
+    ``setUpTestData`` seeds a small forum and ANALYZEs it so the planner has
+    statistics to work with.
+    """
+
+    seed_users = 20
+    seed_questions = 60
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        call_command(
+            "populate_fake_data",
+            users=cls.seed_users,
+            questions=cls.seed_questions,
+            workers=1,
+            seed=7,
+            stdout=io.StringIO(),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def plan(self, queryset):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            try:
+                return queryset.explain()
+            finally:
+                cursor.execute("RESET enable_seqscan")
+
+    def assertNoSeqScan(self, queryset, *tables):
+        """Assert that none of ``tables`` is read with a sequential scan; returns the plan"""
+        plan = self.plan(queryset)
+        for table in tables:
+            self.assertNotRegex(plan, rf"Seq Scan on {table}\b", f"{table} is scanned sequentially:\n{plan}")
+        return plan
+
+    def assertUsesIndex(self, queryset, index):
+        """Assert that the plan reads ``index``; returns the plan"""
+        plan = self.plan(queryset)
+        self.assertRegex(plan, rf"(Index(?: Only)? Scan(?: Backward)? using|Bitmap Index Scan on) {index}\b", plan)
+        return plan
@@ -0,0 +1,1137 @@
+# core/tests.py
+import asyncio
+import json
+import logging
+import os
+import pstats
+import tempfile
+import time
+from collections import Counter
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import Count, Q, QuerySet
+from django.template import Context, Template, TemplateSyntaxError
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone, translation
+from forum.models import Answer, Question
+from reviews.models import CourseReview
+from users.models import UserProfile, UserStats
+from votes.models import Vote
+
+from core import fake_data, slow_queries
+from core import metrics as prometheus
+from core.benchmarks import compare_reports, run_benchmarks, run_connection_benchmarks
+from core.cache import LOCK_SUFFIX, get_or_compute, invalidate, single_flight
+from core.context_processors import COMMUNITY_STATS_KEY
+from core.db_routers import ReplicaRouter, routing
+from core.events import Broker
+from core.events import publish as publish_event
+from core.profiling import check_token as check_profiling_token
+from core.profiling import make_token as make_profiling_token
+from core.rep_rules import REPUTATION_RULES
+from core.warmup import SHARED_ENTRIES, STEPS, warm_up
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+LOCMEM_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "core-tests",
+    },
+    "local": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "core-tests-local",
+    },
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class GetOrComputeTest(TestCase):
+    """Test stampede-protected get_or_compute helper"""
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return {"value": self.calls}
+
+    def test_value_computed_once(self):
+        """Test that a fresh entry is served from cache"""
+        first = get_or_compute("key", self.compute, 60)
+        second = get_or_compute("key", self.compute, 60)
+
+        self.assertEqual(first, {"value": 1})
+        self.assertEqual(second, {"value": 1})
+        self.assertEqual(self.calls, 1)
+
+    def test_lock_released_after_compute(self):
+        """Test that the single-flight lock does not outlive the computation"""
+        get_or_compute("key", self.compute, 60)
+        self.assertIsNone(cache.get("key" + LOCK_SUFFIX))
+
+    def test_lock_released_when_compute_fails(self):
+        """Test that a failing computation does not leave the lock behind"""
+
+        def broken():
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            get_or_compute("key", broken, 60)
+        self.assertIsNone(cache.get("key" + LOCK_SUFFIX))
+
+    def test_expired_entry_refreshed(self):
+        """Test that a logically expired entry is recomputed"""
+        cache.set("key", ({"value": 0}, 0.1, time.time() - 1), 60)
+
+        self.assertEqual(get_or_compute("key", self.compute, 60), {"value": 1})
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_served_while_refreshing(self):
+        """Test that other workers get the stale value while one refreshes"""
+        cache.set("key", ({"value": 0}, 0.1, time.time() - 1), 60)
+        cache.add("key" + LOCK_SUFFIX, 1, 30)  # another worker is refreshing
+
+        self.assertEqual(get_or_compute("key", self.compute, 60), {"value": 0})
+        self.assertEqual(self.calls, 0)
+
+    def test_early_recomputation_near_expiry(self):
+        """Test probabilistic early expiration for slow computations"""
+        # Expires in 1s but took 10s to compute - refresh is practically certain
+        cache.set("key", ({"value": 0}, 10.0, time.time() + 1), 60)
+
+        with mock.patch("core.cache.random.random", return_value=0.5):
+            self.assertEqual(get_or_compute("key", self.compute, 60), {"value": 1})
+
+    def test_no_early_recomputation_far_from_expiry(self):
+        """Test that fresh entries are not recomputed early"""
+        cache.set("key", ({"value": 0}, 0.01, time.time() + 3600), 7200)
+
+        with mock.patch("core.cache.random.random", return_value=0.5):
+            self.assertEqual(get_or_compute("key", self.compute, 60), {"value": 0})
+        self.assertEqual(self.calls, 0)
+
+    def test_cold_miss_falls_back_to_compute(self):
+        """Test that a cold miss computes if the lock holder never fills the entry"""
+        cache.add("key" + LOCK_SUFFIX, 1, 30)
+
+        with mock.patch("core.cache.COLD_MISS_WAIT", 0.01):
+            self.assertEqual(get_or_compute("key", self.compute, 60), {"value": 1})
+
+    def test_single_flight(self):
+        """Test that only one holder gets the lock and that it is released on exit"""
+        with single_flight("key") as first:
+            with single_flight("key") as second:
+                self.assertEqual((first, second), (True, False))
+            self.assertIsNotNone(cache.get("key" + LOCK_SUFFIX))
+        self.assertIsNone(cache.get("key" + LOCK_SUFFIX))
+
+    def test_invalidate(self):
+        """Test that invalidate drops the entry"""
+        get_or_compute("key", self.compute, 60)
+        invalidate("key")
+        get_or_compute("key", self.compute, 60)
+
+        self.assertEqual(self.calls, 2)
+
+
+class PurgeExpiredSessionsCommandTest(TestCase):
+    """Test purge_expired_sessions management command"""
+
+    def setUp(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f"expired{i}", session_data="", expire_date=now - timedelta(days=1)) for i in range(7)]
+            + [
+                Session(session_key=f"active{i}", session_data="", expire_date=now + timedelta(days=1))
+                for i in range(3)
+            ],
+        )
+
+    def test_purges_only_expired_sessions(self):
+        """Test that expired sessions are deleted in batches and active ones kept"""
+        out = StringIO()
+        call_command("purge_expired_sessions", batch_size=3, pause=0, stdout=out)
+
+        self.assertEqual(Session.objects.count(), 3)
+        self.assertFalse(Session.objects.filter(session_key__startswith="expired").exists())
+        self.assertIn("Purged 7 expired sessions", out.getvalue())
+
+    def test_session_refreshed_after_select_kept(self):
+        """Test that a session refreshed between a batch's SELECT and DELETE is not deleted"""
+        values_list = QuerySet.values_list
+
+        def select_then_refresh(queryset, *args, **kwargs):
+            keys = list(values_list(queryset, *args, **kwargs))
+            Session.objects.filter(session_key="expired0").update(expire_date=timezone.now() + timedelta(days=1))
+            return keys
+
+        with mock.patch.object(QuerySet, "values_list", autospec=True, side_effect=select_then_refresh):
+            call_command("purge_expired_sessions", batch_size=10, pause=0, stdout=StringIO())
+
+        self.assertTrue(Session.objects.filter(session_key="expired0").exists())
+        self.assertEqual(Session.objects.count(), 4)
+
+
+class PopulateFakeDataCommandTest(TestCase):
+    """Test bulk populate_fake_data management command"""
+
+    def populate(self, **options):
+        out = StringIO()
+        call_command("populate_fake_data", users=6, questions=9, batch_size=4, workers=1, seed=7, stdout=out, **options)
+        return out.getvalue()
+
+    def test_creates_requested_rows(self):
+        """Test that every model is populated in bulk"""
+        output = self.populate()
+
+        self.assertEqual(User.objects.count(), 6)
+        self.assertEqual(UserProfile.objects.count(), 6)
+        self.assertEqual(UserStats.objects.count(), 6)
+        self.assertEqual(Question.objects.count(), 9)
+        self.assertTrue(Answer.objects.exists())
+        self.assertTrue(CourseReview.objects.exists())
+        self.assertTrue(Vote.objects.exists())
+        self.assertIn("rows/s", output)
+
+    def test_no_self_votes(self):
+        """Test that users never vote on their own questions"""
+        self.populate()
+
+        for vote in Vote.objects.filter(content_type__model="question"):
+            self.assertNotEqual(Question.objects.get(pk=vote.object_id).author_id, vote.user_id)
+
+    def test_counters_match_rows(self):
+        """Test that stats and reputation match counts taken straight from the generated rows"""
+        self.populate()
+
+        points = Counter()
+        for model, prefix in ((Question, "question"), (Answer, "answer"), (CourseReview, "review")):
+            votes = model.objects.values_list("author_id").annotate(
+                up=Count("votes", filter=Q(votes__vote_type="up")),
+                down=Count("votes", filter=Q(votes__vote_type="down")),
+            )
+            for author_id, up, down in votes:
+                points[author_id] += (
+                    up * REPUTATION_RULES[f"{prefix}_upvote"] + down * REPUTATION_RULES[f"{prefix}_downvote"]
+                )
+
+        users = User.objects.annotate(
+            question_count=Count("questions", distinct=True),
+            answer_count=Count("answers", distinct=True),
+            review_count=Count("reviews", distinct=True),
+            accepted_count=Count("answers", filter=Q(answers__is_accepted=True), distinct=True),
+        )
+        expected = {
+            user.pk: (
+                points[user.pk] + user.accepted_count * REPUTATION_RULES["answer_accepted"],
+                user.question_count,
+                user.answer_count,
+                user.review_count,
+                user.accepted_count,
+            )
+            for user in users
+        }
+        stored = {
+            stats.user_id: (
+                stats.user.profile.reputation_points,
+                stats.questions_count,
+                stats.answers_count,
+                stats.reviews_count,
+                stats.accepted_answers_count,
+            )
+            for stats in UserStats.objects.select_related("user__profile")
+        }
+        self.assertEqual(stored, expected)
+        self.assertTrue(any(points.values()))
+
+    def test_seed_is_deterministic(self):
+        """Test that a seed reproduces the same rows regardless of chunking across workers"""
+        self.assertEqual(fake_data.question_chunk(7, 0, 5, 10), fake_data.question_chunk(7, 0, 5, 10))
+        self.assertEqual(fake_data.user_chunk(7, 1, 4, 4), fake_data.user_chunk(7, 1, 4, 4))
+        self.assertNotEqual(fake_data.question_chunk(7, 0, 5, 10), fake_data.question_chunk(8, 0, 5, 10))
+
+
+class PopulateFakeDataWorkersTest(TransactionTestCase):
+    """Test populate_fake_data with worker processes, which close the connections a TestCase would hold open"""
+
+    def populate(self, workers):
+        call_command(
+            "populate_fake_data", users=6, questions=9, batch_size=4, workers=workers, seed=7, stdout=StringIO()
+        )
+        # Primary keys differ between runs, so rows are compared by their generated content
+        return {
+            "users": list(
+                User.objects.order_by("pk").values_list(
+                    "username", "email", "role", "profile__bio", "profile__birthday", "profile__reputation_points"
+                )
+            ),
+            "questions": list(
+                Question.objects.order_by("pk").values_list("author__username", "title", "content", "is_solved")
+            ),
+            "answers": list(
+                Answer.objects.order_by("pk").values_list(
+                    "question__title", "author__username", "content", "is_accepted"
+                )
+            ),
+            "reviews": list(
+                CourseReview.objects.order_by("pk").values_list("author__username", "title", "rating", "course_name")
+            ),
+            "votes": list(
+                Vote.objects.order_by("pk").values_list("user__username", "content_type__model", "vote_type")
+            ),
+        }
+
+    def test_workers_match_inline_run(self):
+        """Test that a seed produces the same rows with several workers as with one"""
+        inline = self.populate(workers=1)
+        User.objects.all().delete()
+        parallel = self.populate(workers=3)
+
+        self.assertTrue(inline["votes"])
+        self.assertEqual(parallel, inline)
+
+
+class BenchmarkDatasetCommandTest(TestCase):
+    """Test COPY-based benchmark_dataset export and import"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", email="author@example.com", password="testpass123")
+        self.voter = User.objects.create_user(username="voter", email="voter@example.com", password="testpass123")
+        self.question = Question.objects.create(title="Copied", content="Tab\tand\nnewline", author=self.author)
+        Answer.objects.create(question=self.question, content="Answer", author=self.voter)
+        Vote.objects.create(
+            user=self.voter,
+            content_type=ContentType.objects.get_for_model(Question),
+            object_id=self.question.pk,
+            vote_type="up",
+        )
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command("benchmark_dataset", *args, self.directory, "--noinput", stdout=out)
+        return out.getvalue()
+
+    def test_round_trip(self):
+        """Test that an import restores exactly what was exported"""
+        self.run_command("export")
+        Question.objects.create(title="Added later", content="Gone after import", author=self.author)
+        User.objects.create_user(username="latecomer", email="late@example.com", password="testpass123")
+
+        output = self.run_command("import")
+
+        self.assertIn("Imported", output)
+        self.assertEqual(list(Question.objects.values_list("title", "content")), [("Copied", "Tab\tand\nnewline")])
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Vote.objects.count(), 1)
+
+    def test_derived_counters_rebuilt(self):
+        """Test that stats are rebuilt from the imported rows"""
+        self.run_command("export")
+        self.run_command("import")
+
+        self.assertEqual(UserStats.objects.get(user__username="author").questions_count, 1)
+        self.assertEqual(UserStats.objects.get(user__username="author").question_upvotes, 1)
+        self.assertEqual(UserStats.objects.get(user__username="voter").answers_count, 1)
+
+    def test_sequences_reset(self):
+        """Test that new rows get fresh ids after an import"""
+        self.run_command("export")
+        self.run_command("import")
+
+        question = Question.objects.create(title="New", content="New", author_id=self.author.pk)
+        self.assertGreater(question.pk, self.question.pk)
+
+    def test_import_without_export(self):
+        """Test that a directory without a manifest is rejected"""
+        with self.assertRaises(CommandError):
+            self.run_command("import")
+
+
+class ViewBenchmarksTest(TestCase):
+    """Test per-view benchmark runner and baseline comparison"""
+
+    def report(self, queries=10, p95_ms=20.0):
+        return {"views": {"home": {"queries": queries, "p50_ms": p95_ms / 2, "p95_ms": p95_ms}}}
+
+    def test_run_benchmarks(self):
+        """Test that every view is measured and answers successfully"""
+        call_command("populate_fake_data", users=4, questions=3, workers=1, seed=3, stdout=StringIO())
+
+        report = run_benchmarks(iterations=2)
+
+        self.assertEqual(report["dataset"]["questions"], 3)
+        self.assertIn("question_search", report["views"])
+        for name, view in report["views"].items():
+            self.assertEqual(view["status"], 200, name)
+            self.assertGreater(view["queries"], 0, name)
+            self.assertLessEqual(view["p50_ms"], view["p95_ms"], name)
+
+    def test_no_regressions(self):
+        """Test that small latency noise is not reported"""
+        self.assertEqual(compare_reports(self.report(p95_ms=21.0), self.report()), [])
+
+    def test_query_regression(self):
+        """Test that any extra query is a regression"""
+        self.assertEqual(compare_reports(self.report(queries=11), self.report()), ["home: 10 -> 11 queries"])
+
+    def test_latency_regression(self):
+        """Test that p95 growth beyond the tolerance is a regression"""
+        self.assertEqual(len(compare_reports(self.report(p95_ms=30.0), self.report(), latency_tolerance=0.25)), 1)
+        self.assertEqual(compare_reports(self.report(p95_ms=30.0), self.report(), latency_tolerance=1.0), [])
+
+
+class ConnectionBenchmarkTest(TransactionTestCase):
+    """Test the database connection strategy benchmark"""
+
+    def test_connections_per_strategy(self):
+        """Test that reconnecting opens a connection per request and persistent connections reuse one"""
+        report = run_connection_benchmarks(iterations=5, modes=["reconnect", "persistent", "health_checks"])
+
+        self.assertEqual(report["modes"]["reconnect"]["backends"], 5)
+        self.assertEqual(report["modes"]["persistent"]["backends"], 1)
+        self.assertEqual(report["modes"]["health_checks"]["backends"], 1)
+        self.assertEqual(report["modes"]["reconnect"]["saved_ms"], 0)
+        self.assertIn("saved_ms", report["modes"]["persistent"])
+
+    def test_settings_restored(self):
+        """Test that the connection settings are back to the configured ones afterwards"""
+        settings_dict = connection.settings_dict.copy()
+        run_connection_benchmarks(iterations=2, modes=["persistent", "pool"])
+
+        self.assertEqual(connection.settings_dict, settings_dict)
+
+    def test_unknown_strategy(self):
+        """Test that the command rejects strategies it does not know"""
+        with self.assertRaises(CommandError):
+            call_command("benchmark_connections", modes="persistent,bogus", stdout=StringIO())
+
+
+@override_settings(SERVER_TIMING_HEADER=True)
+class RequestTimingMiddlewareTest(TestCase):
+    """Test Server-Timing header and per-request log line"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpass123")
+        Question.objects.create(title="Question", content="Content", author=self.user)
+
+    def timings(self, response):
+        return {
+            metric.split(";")[0]: metric for metric in (part.strip() for part in response["Server-Timing"].split(","))
+        }
+
+    def test_server_timing_header(self):
+        """Test that the header reports total, database, template and cache metrics"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("forum:question_list"))
+        query_count = len(queries)
+
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {"total", "db", "tpl", "ctx", "cache"})
+        self.assertIn(f'desc="{query_count} queries"', timings["db"])
+        self.assertRegex(timings["total"], r"^total;dur=\d+\.\d$")
+
+    def test_log_line(self):
+        """Test that one structured line is logged per request"""
+        with self.assertLogs("core.requests", level="INFO") as logs:
+            self.client.get(reverse("forum:question_list"))
+
+        self.assertEqual(len(logs.records), 1)
+        record = logs.records[0]
+        self.assertEqual(record.request_metrics["view"], "forum:question_list")
+        self.assertEqual(record.request_metrics["status"], 200)
+        self.assertGreater(record.request_metrics["queries"], 0)
+        self.assertIn("core.context_processors.community_stats", record.context_processors)
+        self.assertIn("view=forum:question_list", record.getMessage())
+
+    async def test_async_view(self):
+        """Test that queries the async ORM runs in worker threads are counted under ASGI"""
+        question = await Question.objects.aget()
+        voter = await User.objects.acreate_user(username="voter", email="voter@example.com", password="testpass123")
+        await self.async_client.aforce_login(voter)
+        content_type = await sync_to_async(ContentType.objects.get_for_model)(Question)
+
+        with self.assertLogs("core.requests", level="INFO") as logs:
+            response = await self.async_client.post(reverse("votes:vote", args=[content_type.pk, question.pk, "up"]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(logs.records[0].request_metrics["queries"], 0)
+        self.assertRegex(self.timings(response)["db"], r'desc="[1-9]\d* queries"')
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_cache_hits_and_misses(self):
+        """Test that cached computations and fragments count as misses first and hits afterwards"""
+        cache.clear()
+        caches["local"].clear()
+        first = self.timings(self.client.get(reverse("forum:question_list")))
+        second = self.timings(self.client.get(reverse("forum:question_list")))
+
+        # Community stats, then the header navigation, guest menu and footer fragments
+        self.assertIn('"hits=0 misses=4"', first["cache"])
+        self.assertIn('"hits=4 misses=0"', second["cache"])
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_disabled(self):
+        """Test that the header can be turned off while logging continues"""
+        with self.assertLogs("core.requests", level="INFO"):
+            response = self.client.get(reverse("forum:question_list"))
+
+        self.assertNotIn("Server-Timing", response)
+
+
+@override_settings(METRICS_ALLOWED_IPS=["127.0.0.1"])
+class MetricsEndpointTest(TestCase):
+    """Test Prometheus metrics recording, aggregation and the /metrics endpoint"""
+
+    def setUp(self):
+        prometheus.reset()
+        self.addCleanup(prometheus.reset)
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpass123")
+        self.voter = User.objects.create_user(username="voter", email="voter@example.com", password="testpass123")
+        self.question = Question.objects.create(title="Question", content="Content", author=self.user)
+
+    def scrape(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        return response.content.decode()
+
+    def test_access_restricted(self):
+        """Test that only allowed addresses or the bearer token may scrape"""
+        self.assertEqual(self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.1").status_code, 403)
+
+        with override_settings(METRICS_TOKEN="secret"):
+            wrong = self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.1", HTTP_AUTHORIZATION="Bearer nope")
+            right = self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.1", HTTP_AUTHORIZATION="Bearer secret")
+
+        self.assertEqual(wrong.status_code, 403)
+        self.assertEqual(right.status_code, 200)
+
+    @override_settings(METRICS_ALLOWED_IPS=[], METRICS_TOKEN="secret")
+    def test_token_required_by_default(self):
+        """Test that without an allowlist even local clients, e.g. a reverse proxy, need the token"""
+        self.assertEqual(self.client.get(reverse("metrics"), REMOTE_ADDR="127.0.0.1").status_code, 403)
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="127.0.0.1", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+
+    def test_requests_labelled_by_url_name(self):
+        """Test that latency and query histograms use the URL name, not the path"""
+        self.client.get(reverse("forum:question_detail", kwargs={"pk": self.question.pk}))
+        self.client.get(reverse("leaderboards:leaderboard"))
+
+        body = self.scrape()
+
+        self.assertIn("# TYPE forum_request_duration_seconds histogram", body)
+        self.assertIn('forum_request_duration_seconds_count{view="forum:question_detail",method="GET"} 1', body)
+        self.assertIn(
+            'forum_request_duration_seconds_bucket{view="leaderboards:leaderboard",method="GET",le="+Inf"} 1', body
+        )
+        self.assertIn('forum_request_queries_count{view="forum:question_detail"} 1', body)
+        self.assertIn('forum_responses_total{view="forum:question_detail",status="2xx"} 1', body)
+        self.assertIn(f'forum_worker_requests_total{{pid="{os.getpid()}"}}', body)
+        self.assertNotIn(f"/question/{self.question.pk}/", body)
+
+    def test_vote_writes(self):
+        """Test that vote writes are counted by model and action"""
+        self.client.login(username="voter", password="testpass123")
+        content_type = ContentType.objects.get_for_model(Question)
+        url = reverse(
+            "votes:vote", kwargs={"content_type_id": content_type.pk, "object_id": self.question.pk, "vote_type": "up"}
+        )
+        self.client.post(url)
+        self.client.post(url)
+
+        body = self.scrape()
+
+        self.assertIn('forum_votes_total{model="question",action="added"} 1', body)
+        self.assertIn('forum_votes_total{model="question",action="removed"} 1', body)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_cache_lookups(self):
+        """Test that cache hits and misses are counted for the hit ratio"""
+        cache.clear()
+        get_or_compute("metrics-test", lambda: 1, 60)
+        get_or_compute("metrics-test", lambda: 1, 60)
+
+        body = self.scrape()
+
+        self.assertIn('forum_cache_requests_total{result="hit"}', body)
+        self.assertIn('forum_cache_requests_total{result="miss"}', body)
+
+    def test_workers_aggregated_through_shared_directory(self):
+        """Test that samples from every worker file are summed"""
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            prometheus.reset()
+            prometheus.VOTES.inc("answer", "added", amount=2)
+
+            other = prometheus._MmapStore(Path(directory, "999999.db"))
+            for _ in range(2000):
+                # Enough distinct keys to grow the file past its initial size
+                other.inc(prometheus._key("forum_votes_total", ("model", "action"), ("answer", "added")), 1)
+                other.inc(prometheus._key("forum_worker_requests_total", ("pid",), (str(len(other.positions)),)), 1)
+            other.close()
+
+            body = prometheus.render()
+            self.assertIn('forum_votes_total{model="answer",action="added"} 2002', body)
+            self.assertGreater(Path(directory, "999999.db").stat().st_size, prometheus.INITIAL_FILE_SIZE)
+
+            prometheus.reset()
+
+    def test_dead_workers_archived(self):
+        """Test that a dead worker's counters stay in the sums while its per-process series go"""
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            prometheus.reset()
+            self.addCleanup(prometheus.reset)
+            prometheus.VOTES.inc("answer", "added", amount=2)
+            for pid in ("999998", "999999"):
+                other = prometheus._MmapStore(Path(directory, f"{pid}.db"))
+                other.inc(prometheus._key("forum_votes_total", ("model", "action"), ("answer", "added")), 3)
+                other.inc(prometheus._key("forum_request_queries_count", ("view",), ("home:home",)), 1)
+                other.inc(prometheus._key("forum_worker_busy_seconds_total", ("pid",), (pid,)), 0.5)
+                other.close()
+
+            prometheus.mark_process_dead(999998)
+            prometheus.mark_process_dead(999999)
+            prometheus.mark_process_dead(999999)
+
+            body = prometheus.render()
+            self.assertIn('forum_votes_total{model="answer",action="added"} 8', body)
+            self.assertIn('forum_request_queries_count{view="home:home"} 2', body)
+            self.assertNotIn('pid="999999"', body)
+            files = {path.name for path in Path(directory).glob("*.db")}
+            self.assertEqual(files, {"archive.db", f"{os.getpid()}.db"})
+
+    def test_label_values_escaped(self):
+        """Test that quotes, backslashes and newlines in label values keep the output parseable"""
+        prometheus.CACHE_REQUESTS.inc('a"b\\c\nd')
+
+        self.assertIn('forum_cache_requests_total{result="a\\"b\\\\c\\nd"} 1', prometheus.render())
+
+
+class ProfilingMiddlewareTest(TestCase):
+    """Test opt-in request profiling"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpass123")
+        Question.objects.create(title="Question", content="Content", author=self.user)
+
+    def profiles(self):
+        return sorted(Path(self.directory.name).iterdir())
+
+    def test_disabled_without_directory(self):
+        """Test that no profiles are written when PROFILING_DIR is unset"""
+        with override_settings(PROFILING_DIR="", PROFILING_SAMPLE_RATE=1.0):
+            self.client.get(reverse("forum:question_list"))
+
+        self.assertEqual(self.profiles(), [])
+
+    def test_sampled_request_collapsed(self):
+        """Test that sampled requests produce collapsed stacks tagged with the URL name"""
+        with override_settings(PROFILING_DIR=self.directory.name, PROFILING_SAMPLE_RATE=1.0, PROFILING_INTERVAL=0.0001):
+            response = self.client.get(reverse("forum:question_list"), {"q": "Question"})
+
+        self.assertEqual(response.status_code, 200)
+        [profile] = self.profiles()
+        self.assertTrue(profile.name.endswith("-forum_question_list.collapsed"))
+        for line in profile.read_text().splitlines():
+            self.assertRegex(line, r"^.+ \d+$")
+
+    def test_sampled_request_pstats(self):
+        """Test that the pstats format writes a cProfile dump"""
+        with override_settings(PROFILING_DIR=self.directory.name, PROFILING_SAMPLE_RATE=1.0, PROFILING_FORMAT="pstats"):
+            self.client.get(reverse("users:profile", kwargs={"username": "testuser"}))
+
+        [profile] = self.profiles()
+        self.assertTrue(profile.name.endswith("-users_profile.pstats"))
+        self.assertGreater(pstats.Stats(str(profile)).total_calls, 0)
+
+    def test_signed_header(self):
+        """Test that a valid token forces profiling and a forged one does not"""
+        with override_settings(PROFILING_DIR=self.directory.name, PROFILING_SAMPLE_RATE=0.0):
+            self.client.get(reverse("forum:question_list"))
+            self.client.get(reverse("forum:question_list"), HTTP_X_PROFILE_TOKEN="profile:forged:signature")
+            self.assertEqual(self.profiles(), [])
+
+            self.client.get(reverse("forum:question_list"), HTTP_X_PROFILE_TOKEN=make_profiling_token())
+
+        self.assertEqual(len(self.profiles()), 1)
+
+    def test_rotation(self):
+        """Test that only the newest PROFILING_MAX_FILES profiles are kept"""
+        with override_settings(PROFILING_DIR=self.directory.name, PROFILING_SAMPLE_RATE=1.0, PROFILING_MAX_FILES=2):
+            for _ in range(4):
+                self.client.get(reverse("forum:question_list"))
+
+        self.assertEqual(len(self.profiles()), 2)
+
+    def test_profiling_token_command(self):
+        """Test that the command prints a header the middleware accepts"""
+        out = StringIO()
+        call_command("profiling_token", stdout=out, stderr=StringIO())
+
+        name, token = out.getvalue().strip().split(": ")
+        self.assertEqual(name, "X-Profile-Token")
+        self.assertTrue(check_profiling_token(token, max_age=60))
+
+
+class SlowQueryLogTest(TestCase):
+    """Test slow-query recording, EXPLAIN capture and the slow_queries command"""
+
+    def setUp(self):
+        slow_queries.reset()
+        self.addCleanup(slow_queries.reset)
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpass123")
+        Question.objects.create(title="Question", content="Content", author=self.user)
+
+    def test_fingerprint(self):
+        """Test that values and IN list lengths do not change the fingerprint"""
+        first, normalized = slow_queries.fingerprint("SELECT * FROM t WHERE id IN (%s, %s) AND name = 'a' LIMIT 8")
+        second, _ = slow_queries.fingerprint("SELECT *  FROM t WHERE id IN (%s) AND name = 'it''s' LIMIT 20")
+        other, _ = slow_queries.fingerprint("SELECT * FROM t WHERE id = %s")
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(normalized, "SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?")
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001)
+    def test_records_view_stack_and_plan(self):
+        """Test that slow queries carry the view, the calling code and a plan for new fingerprints"""
+        with self.assertLogs("core.slow_queries", level="WARNING") as logs:
+            self.client.get(reverse("forum:question_list"), {"q": "Question"})
+            self.client.get(reverse("forum:question_list"), {"q": "Question"})
+
+        entries = [entry for entry in slow_queries.recent() if '"forum_question"' in entry["sql"]]
+        self.assertTrue(entries)
+        self.assertEqual({entry["view"] for entry in entries}, {"forum:question_list"})
+        self.assertEqual(len(logs.records), len(slow_queries.recent()))
+        self.assertEqual(
+            json.loads(logs.records[0].getMessage())["fingerprint"], slow_queries.recent()[0]["fingerprint"]
+        )
+
+        by_fingerprint = {}
+        for entry in entries:
+            by_fingerprint.setdefault(entry["fingerprint"], []).append(entry)
+        for repeated in by_fingerprint.values():
+            # Planned once per fingerprint
+            self.assertIn("Scan", repeated[0]["plan"])
+            self.assertTrue(all(entry["plan"] is None for entry in repeated[1:]))
+        self.assertTrue(any(frame.startswith("forum/views.py") for entry in entries for frame in entry["stack"]))
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001)
+    def test_explain_inside_transaction(self):
+        """Test that a failing EXPLAIN does not abort the surrounding transaction"""
+        # SET runs fine, but EXPLAIN SET is a syntax error
+        with (
+            mock.patch.object(slow_queries, "EXPLAINABLE", ("SET",)),
+            self.assertLogs("core.slow_queries", level="WARNING"),
+            connection.cursor() as cursor,
+        ):
+            cursor.execute("SET LOCAL statement_timeout = 0")
+            self.assertEqual(User.objects.filter(pk=self.user.pk).count(), 1)
+
+        self.assertTrue(slow_queries.recent()[0]["plan"].startswith("EXPLAIN failed"))
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_disabled(self):
+        """Test that a zero threshold records nothing"""
+        self.client.get(reverse("forum:question_list"))
+
+        self.assertEqual(slow_queries.recent(), [])
+
+    def test_top_offenders_command(self):
+        """Test that the command ranks fingerprints and prints their plans"""
+        entries = [
+            {
+                "fingerprint": "aaa",
+                "duration_ms": 300.0,
+                "sql": "SELECT a",
+                "view": "forum:question_list",
+                "plan": "Seq Scan on a",
+            },
+            {
+                "fingerprint": "aaa",
+                "duration_ms": 250.0,
+                "sql": "SELECT a",
+                "view": "forum:question_list",
+                "plan": None,
+            },
+            {
+                "fingerprint": "bbb",
+                "duration_ms": 400.0,
+                "sql": "SELECT b",
+                "view": "leaderboards:leaderboard",
+                "plan": None,
+            },
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            log = Path(directory, "slow.log")
+            log.write_text(
+                "".join(json.dumps({**entry, "stack": ["forum/views.py:1 in get"]}) + "\n" for entry in entries)
+            )
+
+            out = StringIO()
+            call_command("slow_queries", log=str(log), stdout=out)
+            by_view = StringIO()
+            call_command("slow_queries", log=str(log), view="leaderboards:leaderboard", stdout=by_view)
+
+        output = out.getvalue()
+        self.assertLess(output.index("aaa: 2x, total 550ms"), output.index("bbb: 1x, total 400ms"))
+        self.assertIn("Seq Scan on a", output)
+        self.assertIn("forum:question_list (2)", output)
+        self.assertNotIn("aaa", by_view.getvalue())
+
+    def test_command_without_log(self):
+        """Test that a missing log is reported"""
+        with self.assertRaises(CommandError):
+            call_command("slow_queries", log="/nonexistent/slow.log", stdout=StringIO())
+
+
+class LoadTestCommandTest(LiveServerTestCase):
+    """Test the aiohttp load generator against a live server"""
+
+    def setUp(self):
+        call_command("populate_fake_data", users=4, questions=6, workers=1, seed=5, stdout=StringIO())
+
+    def test_load_test(self):
+        """Test that every simulated action succeeds and is reported per stage and endpoint"""
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory, "load.json")
+            out = StringIO()
+            call_command(
+                "load_test",
+                url=self.live_server_url,
+                ramp="1,2",
+                duration=1.5,
+                seed=1,
+                output=str(output),
+                stdout=out,
+            )
+            report = json.loads(output.read_text())
+
+        self.assertEqual([stage["concurrency"] for stage in report["stages"]], [1, 2])
+        for stage in report["stages"]:
+            self.assertEqual(stage["failed_users"], 0)
+            self.assertGreater(stage["total"]["requests"], 0)
+            self.assertIn("login", stage["endpoints"])
+            for name, endpoint in stage["endpoints"].items():
+                self.assertEqual(endpoint["errors"], 0, name)
+        self.assertIn("question_detail", out.getvalue())
+
+    def test_votes_scenario(self):
+        """Test that the votes scenario sends nothing but votes after logging in"""
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory, "load.json")
+            call_command(
+                "load_test",
+                url=self.live_server_url,
+                ramp="2",
+                duration=1.0,
+                scenario="votes",
+                seed=1,
+                output=str(output),
+                stdout=StringIO(),
+            )
+            report = json.loads(output.read_text())
+
+        self.assertEqual(report["scenario"], "votes")
+        endpoints = report["stages"][0]["endpoints"]
+        self.assertGreater(endpoints["vote"]["requests"], 0)
+        self.assertEqual(endpoints["vote"]["errors"], 0)
+        self.assertNotIn("question_detail", endpoints)
+
+    def test_wrong_password(self):
+        """Test that a run where no user can log in fails loudly"""
+        with self.assertRaises(CommandError):
+            call_command(
+                "load_test",
+                url=self.live_server_url,
+                ramp="1",
+                duration=0.5,
+                password="wrong",
+                stdout=StringIO(),
+            )
+
+
+class EventBrokerTest(SimpleTestCase):
+    """Test how the events broker hands notifications to the streams of each topic"""
+
+    def notify(self, broker, topic, event="score", data=None):
+        broker.dispatch(json.dumps({"topic": topic, "event": event, "data": data or {}}))
+
+    def test_fan_out_by_topic(self):
+        """Test that one notification reaches every stream of its topic and no other"""
+        broker = Broker()
+        first, second, other = asyncio.Queue(), asyncio.Queue(), asyncio.Queue()
+        broker.subscribers["question:1"].update({first, second})
+        broker.subscribers["question:2"].add(other)
+
+        self.notify(broker, "question:1", data={"id": 1})
+
+        self.assertEqual(first.get_nowait(), ("score", {"id": 1}))
+        self.assertEqual(second.get_nowait(), ("score", {"id": 1}))
+        self.assertTrue(other.empty())
+
+    def test_slow_stream_is_reset(self):
+        """Test that a stream whose queue is full is told to reload instead"""
+        broker = Broker()
+        queue = asyncio.Queue(maxsize=2)
+        broker.subscribers["question:1"].add(queue)
+
+        for _ in range(3):
+            self.notify(broker, "question:1")
+
+        self.assertEqual(queue.qsize(), 1)
+        self.assertEqual(queue.get_nowait(), ("reset", {}))
+
+    def test_malformed_payload(self):
+        """Test that payloads not sent by publish() are logged and skipped"""
+        broker = Broker()
+        with self.assertLogs("core.events", level="WARNING"):
+            broker.dispatch("not json")
+            broker.dispatch(json.dumps({"event": "score"}))
+
+    @override_settings(LIVE_UPDATES=True)
+    def test_payload_too_large(self):
+        """Test that events over the NOTIFY size limit are not sent"""
+        self.assertFalse(publish_event("question:1", "answer", {"html": "x" * 8000}))
+
+    @override_settings(LIVE_UPDATES=False)
+    def test_disabled(self):
+        """Test that nothing is sent without LIVE_UPDATES, not even a query (SimpleTestCase refuses those)"""
+        self.assertTrue(publish_event("question:1", "score", {"id": 1}))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class WarmUpTest(TestCase):
+    """Test the pre-fork warm-up run by gunicorn.conf.py"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_warm_up(self):
+        """Test that every step runs and the community stats are cached afterwards"""
+        self.assertEqual(set(warm_up()), {name for name, _ in STEPS})
+        self.assertIsNotNone(cache.get("core:community_stats"))
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRouterTest(SimpleTestCase):
+    """Test the routing decisions of the replica router"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_in_request(self):
+        """Test that reads in a request go to a replica and writes to the primary"""
+        with routing():
+            self.assertEqual(self.router.db_for_read(Question), "replica")
+            self.assertEqual(self.router.db_for_write(Question), "default")
+
+    def test_write_pins_request(self):
+        """Test that reads after a write in the same request go to the primary"""
+        with routing() as state:
+            self.router.db_for_write(Vote)
+            self.assertEqual(self.router.db_for_read(Vote), "default")
+        self.assertTrue(state.wrote)
+
+    def test_pinned_request(self):
+        """Test that a pinned request reads from the primary"""
+        with routing(pinned=True):
+            self.assertEqual(self.router.db_for_read(Question), "default")
+
+    def test_outside_request(self):
+        """Test that commands and shells read from the primary"""
+        self.assertEqual(self.router.db_for_read(Question), "default")
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Test that without replicas everything goes to the primary"""
+        with routing():
+            self.assertEqual(self.router.db_for_read(Question), "default")
+
+    def test_migrations(self):
+        """Test that only the primary is migrated"""
+        self.assertTrue(self.router.allow_migrate("default", "forum"))
+        self.assertFalse(self.router.allow_migrate("replica", "forum"))
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaPinningTest(TransactionTestCase):
+    """Test reads and writes of whole requests against a replica alias mirroring the test database"""
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", email="author@example.com", password="pass12345")
+        self.voter = User.objects.create_user(username="voter", email="voter@example.com", password="pass12345")
+        self.question = Question.objects.create(title="Replicated question", content="Content", author=self.author)
+        self.client.force_login(self.voter)
+
+    def get(self, url, **kwargs):
+        """Request ``url`` and return the response with the queries each alias ran"""
+        with (
+            CaptureQueriesContext(connections["default"]) as primary,
+            CaptureQueriesContext(connections["replica"]) as replica,
+        ):
+            response = self.client.get(url, **kwargs)
+        return response, len(primary), len(replica)
+
+    def test_reads_from_replica(self):
+        """Test that list and detail pages only read from the replica"""
+        for url in [reverse("forum:question_list"), reverse("forum:question_detail", args=[self.question.pk])]:
+            response, primary, replica = self.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(primary, 0, url)
+            self.assertGreater(replica, 0, url)
+        self.assertNotIn("replica_pin", response.cookies)
+
+    def test_vote_pins_client(self):
+        """Test that a vote reads its counts from the primary and pins the client for the next request"""
+        content_type = ContentType.objects.get_for_model(Question)
+        url = reverse("votes:vote", args=[content_type.pk, self.question.pk, "up"])
+        with CaptureQueriesContext(connections["replica"]) as replica:
+            response = self.client.post(url)
+        self.assertEqual(response.json()["vote_count"], 1)
+        self.assertIn("replica_pin", response.cookies)
+        self.assertEqual(len(replica), 0)
+
+        _, primary, replica = self.get(reverse("forum:question_detail", args=[self.question.pk]))
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_answer_redirect_reads_primary(self):
+        """Test that the page a new answer redirects to is read from the primary"""
+        response = self.client.post(
+            reverse("forum:answer_create", args=[self.question.pk]),
+            {"content": "A fresh answer"},
+        )
+        self.assertEqual(response.status_code, 302)
+
+        response, _, replica = self.get(response.url)
+        self.assertContains(response, "A fresh answer")
+        self.assertEqual(replica, 0)
+
+    def test_pin_expires(self):
+        """Test that an expired pin cookie sends reads back to the replica"""
+        self.client.cookies["replica_pin"] = str(time.time() - 1)
+        _, primary, replica = self.get(reverse("forum:question_list"))
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class WarmCacheCommandTest(TestCase):
+    """Test the warm_cache management command"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fills_shared_entries(self):
+        """Test that every shared entry is cached after the command"""
+        out = StringIO()
+        call_command("warm_cache", stdout=out)
+
+        for key, _ in SHARED_ENTRIES:
+            self.assertIsNotNone(cache.get(key), key)
+            self.assertIn(key, out.getvalue())
+
+    def test_recomputes_fresh_entries(self):
+        """Test that entries are recomputed even when they have not expired"""
+        call_command("warm_cache", stdout=StringIO())
+        Question.objects.create(
+            title="Warm", content="Content", author=User.objects.create_user(username="warm", password=None)
+        )
+        call_command("warm_cache", stdout=StringIO())
+
+        self.assertEqual(cache.get(COMMUNITY_STATS_KEY)[0]["total_questions"], 1)
+
+    def test_clear(self):
+        """Test that --clear drops other entries of the shared cache"""
+        cache.set("unrelated", 1)
+        call_command("warm_cache", clear=True, stdout=StringIO())
+
+        self.assertIsNone(cache.get("unrelated"))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FragmentCacheTest(TestCase):
+    """Test the cache_fragment template tag and the cached header, footer and pagination"""
+
+    def setUp(self):
+        caches["local"].clear()
+
+    def render(self, source, **context):
+        return Template("{% load fragment_cache %}" + source).render(Context(context))
+
+    def test_served_from_cache(self):
+        """Test that a fragment is rendered once and then served from the local tier"""
+        source = '{% cache_fragment "test" page %}{{ page }}-{{ other }}{% endcache_fragment %}'
+        self.assertEqual(self.render(source, page=1, other="a"), "1-a")
+        self.assertEqual(self.render(source, page=1, other="b"), "1-a")
+        self.assertEqual(self.render(source, page=2, other="b"), "2-b")
+
+    def test_varies_on_language(self):
+        """Test that every language gets its own copy of a fragment"""
+        source = '{% load i18n %}{% cache_fragment "test" %}{% trans "Forum" %}{% endcache_fragment %}'
+        with translation.override("en"):
+            english = self.render(source)
+        with translation.override("ru"):
+            russian = self.render(source)
+
+        self.assertEqual(english, "Forum")
+        self.assertNotEqual(russian, english)
+
+    def test_requires_name(self):
+        """Test that the tag needs a fragment name"""
+        with self.assertRaises(TemplateSyntaxError):
+            self.render("{% cache_fragment %}{% endcache_fragment %}")
+
+    def test_header_per_user(self):
+        """Test that cached header fragments never leak one visitor's menu or CSRF token to another"""
+        alice = User.objects.create_user(username="alice", email="alice@example.com", password=None)
+        self.client.get(reverse("forum:question_list"))
+
+        self.client.force_login(alice)
+        response = self.client.get(reverse("forum:question_list"))
+        self.assertContains(response, "My Profile")
+        self.assertNotContains(response, "Join Free")
+
+        self.client.logout()
+        response = self.client.get(reverse("forum:question_list"))
+        self.assertContains(response, "Join Free")
+        self.assertNotContains(response, "My Profile")
+
+    def test_pagination_per_page(self):
+        """Test that each page of a list gets its own pagination fragment"""
+        author = User.objects.create_user(username="author", email="author@example.com", password=None)
+        Question.objects.bulk_create(
+            Question(title=f"Question {number}", content="Content", author=author) for number in range(25)
+        )
+        first = self.client.get(reverse("forum:question_list"))
+        second = self.client.get(reverse("forum:question_list"), {"page": 2})
+
+        self.assertContains(first, '<span class="page-link bg-warning border-warning text-dark">1</span>')
+        self.assertContains(second, '<span class="page-link bg-warning border-warning text-dark">2</span>')
+        self.assertContains(second, 'aria-label="Question pagination"')
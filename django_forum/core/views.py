@@ -0,0 +1,23 @@
+import hmac
+
+import django.conf
+from django.http import HttpResponse, HttpResponseForbidden
+
+from core import metrics as prometheus
+
+
+def metrics(request):
+    """Prometheus scrape endpoint, open to a ``METRICS_TOKEN`` bearer and any ``METRICS_ALLOWED_IPS``"""
+    if not _may_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(prometheus.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _may_scrape(request):
+    settings = django.conf.settings
+    if request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS:
+        return True
+
+    token = settings.METRICS_TOKEN
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    return bool(token) and scheme.lower() == "bearer" and hmac.compare_digest(credentials.encode(), token.encode())
@@ -0,0 +1,91 @@
+"""Fill caches before they serve traffic.
+
+``gunicorn.conf.py`` runs ``warm_up()`` once in the master when the app is
+preloaded, so the URL resolver, compiled templates and in-process caches are
+inherited by every forked worker and shared copy-on-write. Without
+``preload_app`` each worker warms itself after it has loaded the app.
+
+``warm_shared_cache()``, behind the ``warm_cache`` command, recomputes the
+entries of the shared ``default`` cache that every page reads.
+"""
+
+import functools
+import time
+from pathlib import Path
+
+import django.conf
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.template import engines
+from django.urls import reverse
+from home.views import STATS_KEY, compute_home_stats
+from users.ranks import get_rank_index
+
+from core.cache import get_or_compute, refresh
+from core.context_processors import COMMUNITY_STATS_KEY, compute_community_stats
+
+
+def warm_up():
+    """Run every step in order and return the seconds each one took"""
+    return _timed(STEPS)
+
+
+def warm_shared_cache():
+    """Recompute every shared entry, even fresh ones, and return the seconds each key took"""
+    timeout = django.conf.settings.STATS_CACHE_TIMEOUT
+    return _timed((key, functools.partial(refresh, key, compute, timeout)) for key, compute in SHARED_ENTRIES)
+
+
+def warm_urls():
+    # The first reverse() builds the reverse lookup tables of the whole URLconf
+    reverse("home:home")
+
+
+def warm_templates():
+    # Only DEBUG=False keeps compiled templates, in the cached loader; the project's own are the ones pages use
+    base_dir = Path(django.conf.settings.BASE_DIR)
+    for engine in engines.all():
+        for directory in map(Path, engine.template_dirs):
+            if not directory.is_relative_to(base_dir):
+                continue
+            for path in sorted(directory.rglob("*.html")):
+                engine.get_template(path.relative_to(directory).as_posix())
+
+
+def warm_content_types():
+    ContentType.objects.get_for_models(*apps.get_models())
+
+
+def warm_ranks():
+    get_rank_index()
+
+
+def warm_stats():
+    # Only fills missing entries: other servers sharing the cache may have them already
+    timeout = django.conf.settings.STATS_CACHE_TIMEOUT
+    for key, compute in SHARED_ENTRIES:
+        get_or_compute(key, compute, timeout)
+
+
+def _timed(steps):
+    timings = {}
+    for name, step in steps:
+        start = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+# Shared cache entries read on every page or on the landing page, cached for STATS_CACHE_TIMEOUT
+SHARED_ENTRIES = [
+    (COMMUNITY_STATS_KEY, compute_community_stats),
+    (STATS_KEY, compute_home_stats),
+]
+
+STEPS = [
+    ("urls", warm_urls),
+    ("templates", warm_templates),
+    ("content_types", warm_content_types),
+    ("ranks", warm_ranks),
+    ("stats", warm_stats),
+]
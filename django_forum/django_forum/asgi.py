@@ -3,5 +3,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_forum.settings")
+# Tells the settings they are served under ASGI, see ASGI there
+os.environ["DJANGO_ASGI"] = "True"
 
 application = get_asgi_application()
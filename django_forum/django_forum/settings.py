@@ -1,5 +1,6 @@
 import pathlib
 import sys
+import tempfile
 
 import decouple
 import django.urls
@@ -25,9 +26,13 @@ INSTALLED_APPS = [
     "reviews.apps.ReviewsConfig",
     "votes.apps.VotesConfig",
     "home.apps.HomeConfig",
+    "leaderboards.apps.LeaderboardsConfig",
 ]
 
 MIDDLEWARE = [
+    "core.middleware.RequestTimingMiddleware",
+    "core.middleware.ProfilingMiddleware",
+    "core.middleware.ReplicaPinningMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
@@ -40,14 +45,20 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "django_forum.urls"
 
+TEMPLATE_LOADERS = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "core.template_backends.InstrumentedDjangoTemplates",
         "DIRS": [
             BASE_DIR / "templates",
         ],
-        "APP_DIRS": True,
         "OPTIONS": {
+            # Compile each template once per process; in development re-read them so edits show up
+            "loaders": TEMPLATE_LOADERS if DEBUG else [("django.template.loaders.cached.Loader", TEMPLATE_LOADERS)],
             "context_processors": [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
@@ -59,6 +70,8 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "django_forum.wsgi.application"
+# Set by asgi.py, never in the environment by hand
+ASGI = decouple.config("DJANGO_ASGI", default=False, cast=bool)
 
 DATABASES = {
     "default": {
@@ -68,8 +81,171 @@ DATABASES = {
         "PASSWORD": decouple.config("DB_PASSWORD"),
         "HOST": decouple.config("DB_HOST"),
         "PORT": decouple.config("DB_PORT"),
+        # Seconds a connection is reused across requests (one per thread), 0 reconnects on every request
+        "CONN_MAX_AGE": decouple.config("DB_CONN_MAX_AGE", default=60, cast=int),
+        # Ping a reused connection once per request, so a server restart costs a reconnect instead of a 500
+        "CONN_HEALTH_CHECKS": decouple.config("DB_CONN_HEALTH_CHECKS", default=True, cast=bool),
+    }
+}
+
+if ASGI:
+    # Each request runs its synchronous code in a thread of its own, so a persistent connection would be
+    # left open per request until PostgreSQL refuses new clients; reuse connections through DB_POOL instead
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+
+# psycopg 3 pool, one per worker process, instead of a connection per thread; needs the pool extra
+if decouple.config("DB_POOL", default=False, cast=bool):
+    # Django refuses persistent connections next to a pool, and the pool checks connections itself
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": decouple.config("DB_POOL_MIN_SIZE", default=1, cast=int),
+            # Each worker thread holds at most one connection at a time, so more would sit idle
+            "max_size": decouple.config("DB_POOL_MAX_SIZE", default=4, cast=int),
+            # Seconds a request waits for a free connection before failing
+            "timeout": decouple.config("DB_POOL_TIMEOUT", default=10, cast=float),
+        },
+    }
+
+# Read replicas as "host" or "host:port", using the primary's database and credentials. Each becomes a
+# "replica_<n>" alias; pointing one at the primary's own host exercises the routing without replication.
+DATABASE_REPLICAS = []
+for number, address in enumerate(decouple.config("DB_REPLICA_HOSTS", default="", cast=lambda v: v.split(",")), 1):
+    if not address:
+        continue
+    host, _, port = address.partition(":")
+    alias = f"replica_{number}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        # Tests read replicas through the test database
+        "TEST": {"MIRROR": "default"},
     }
+    DATABASE_REPLICAS.append(alias)
+
+if IS_TESTING:
+    # Tests enable the router by overriding DATABASE_REPLICAS with this alias
+    DATABASES["replica"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+
+DATABASE_ROUTERS = ["core.db_routers.ReplicaRouter"]
+# Seconds a client keeps reading from the primary after it wrote, longer than replicas usually lag
+REPLICA_PIN_SECONDS = decouple.config("REPLICA_PIN_SECONDS", default=5, cast=int)
+
+# Live updates over server-sent events (core.events). Streams are served under ASGI only, so they are on there by
+# default; WSGI servers whose proxy sends the events URLs to ASGI servers turn them on to publish their writes
+LIVE_UPDATES = decouple.config("LIVE_UPDATES", default=ASGI, cast=bool)
+# The LISTEN/NOTIFY channel, seconds between keep-alive comments on a quiet stream, and events buffered for a
+# slow client
+EVENTS_CHANNEL = decouple.config("EVENTS_CHANNEL", default="forum_events")
+EVENTS_HEARTBEAT_SECONDS = decouple.config("EVENTS_HEARTBEAT_SECONDS", default=15, cast=float)
+EVENTS_QUEUE_SIZE = decouple.config("EVENTS_QUEUE_SIZE", default=100, cast=int)
+
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    # Local stand-ins for a networked cache: shared by every worker on the machine, or every machine on the database
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "db": "django.core.cache.backends.db.DatabaseCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+    "memcached": "django.core.cache.backends.memcached.PyMemcacheCache",
+    "dummy": "django.core.cache.backends.dummy.DummyCache",
 }
+CACHE_KEY_PREFIX = decouple.config("CACHE_KEY_PREFIX", default="forum")
+# Bump to drop every cached value at once, e.g. after a deploy that changes what they hold
+CACHE_VERSION = decouple.config("CACHE_VERSION", default=1, cast=int)
+CACHE_DIR = decouple.config("CACHE_DIR", default=str(pathlib.Path(tempfile.gettempdir(), "django_forum_cache")))
+
+
+def _cache_tier(alias, backend, timeout, max_entries):
+    # CACHE_<ALIAS>_BACKEND, _LOCATION, _TIMEOUT and _MAX_ENTRIES override the defaults below
+    env = f"CACHE_{alias.upper()}"
+    backend = decouple.config(f"{env}_BACKEND", default=backend)
+    locations = {
+        "locmem": alias,
+        "file": str(pathlib.Path(CACHE_DIR, alias)),
+        "db": f"cache_{alias}",
+        "redis": "redis://localhost:6379/0",
+        "memcached": "localhost:11211",
+    }
+    return {
+        "BACKEND": CACHE_BACKENDS[backend],
+        "LOCATION": decouple.config(f"{env}_LOCATION", default=locations.get(backend, "")),
+        # Tiers may share a server, so every key names its tier
+        "KEY_PREFIX": f"{CACHE_KEY_PREFIX}:{alias}",
+        "VERSION": CACHE_VERSION,
+        "TIMEOUT": decouple.config(f"{env}_TIMEOUT", default=timeout, cast=int),
+        # Only the locmem, file and db backends cull; the others evict on their own
+        "OPTIONS": {"MAX_ENTRIES": decouple.config(f"{env}_MAX_ENTRIES", default=max_entries, cast=int)}
+        if backend in ("locmem", "file", "db")
+        else {},
+    }
+
+
+CACHES = {
+    # Shared by every worker: computed stats, authenticated users
+    "default": _cache_tier("default", "file", timeout=300, max_entries=10000),
+    # Per-process LRU for small, hot values that may be a little stale; no network round trip
+    "local": _cache_tier("local", "locmem", timeout=60, max_entries=1000),
+    # Kept apart so flushing the other tiers does not log everyone out
+    "sessions": _cache_tier("sessions", "file", timeout=60 * 60 * 24 * 14, max_entries=100000),
+}
+# Used by the cached_db session mode
+SESSION_CACHE_ALIAS = "sessions"
+# {% cache_fragment %} keeps rendered header, footer and pagination fragments in this tier for this many seconds
+FRAGMENT_CACHE_ALIAS = "local"
+FRAGMENT_CACHE_TIMEOUT = decouple.config("FRAGMENT_CACHE_TIMEOUT", default=300, cast=int)
+
+if IS_TESTING:
+    # Tests assert on freshly written data, so cached computations must never leak between them
+    CACHES = {alias: {"BACKEND": CACHE_BACKENDS["dummy"]} for alias in CACHES}
+
+SESSION_ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    # Reads come from the cache, writes still go through to PostgreSQL
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    # No server-side storage at all; sessions must stay small and JSON-serializable
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+SESSION_ENGINE = SESSION_ENGINES[decouple.config("DJANGO_SESSION_MODE", default="db")]
+
+STATS_CACHE_TIMEOUT = decouple.config("STATS_CACHE_TIMEOUT", default=60, cast=int)
+# Seconds to cache the authenticated user and profile between requests, 0 disables it
+AUTH_USER_CACHE_TIMEOUT = decouple.config("AUTH_USER_CACHE_TIMEOUT", default=0, cast=int)
+# Expose per-request timings to clients; they reveal query counts and cache behaviour, so only in DEBUG by default.
+# The log line is written either way
+SERVER_TIMING_HEADER = decouple.config("SERVER_TIMING_HEADER", default=DEBUG, cast=bool)
+# Shared directory for per-worker metric files; empty keeps metrics in memory (single process)
+METRICS_DIR = decouple.config("METRICS_DIR", default="")
+# Clients allowed to scrape /metrics without the token. Empty by default: behind a reverse proxy REMOTE_ADDR is
+# the proxy's address, so allowing 127.0.0.1 there would let every client in. Only list addresses of direct scrapers
+METRICS_ALLOWED_IPS = decouple.config(
+    "METRICS_ALLOWED_IPS", default="", cast=lambda v: [ip for ip in v.split(",") if ip]
+)
+# Scrapers send "Authorization: Bearer <token>"; empty disables token access
+METRICS_TOKEN = decouple.config("METRICS_TOKEN", default="")
+# Where request profiles are written; empty turns the profiling middleware off
+PROFILING_DIR = decouple.config("PROFILING_DIR", default="")
+# Fraction of requests to profile, e.g. 0.01; requests with a valid X-Profile-Token are always profiled
+PROFILING_SAMPLE_RATE = decouple.config("PROFILING_SAMPLE_RATE", default=0.0, cast=float)
+# "collapsed" samples stacks for flamegraphs, "pstats" runs cProfile
+PROFILING_FORMAT = decouple.config("PROFILING_FORMAT", default="collapsed")
+# Seconds between stack samples in the collapsed format
+PROFILING_INTERVAL = decouple.config("PROFILING_INTERVAL", default=0.001, cast=float)
+# Newest profiles to keep, older ones are deleted
+PROFILING_MAX_FILES = decouple.config("PROFILING_MAX_FILES", default=200, cast=int)
+# Seconds a token from the profiling_token command stays valid
+PROFILING_TOKEN_MAX_AGE = decouple.config("PROFILING_TOKEN_MAX_AGE", default=3600, cast=int)
+# Queries slower than this are logged with their plan; 0 turns the slow-query log off
+SLOW_QUERY_THRESHOLD_MS = decouple.config("SLOW_QUERY_THRESHOLD_MS", default=200, cast=float)
+SLOW_QUERY_LOG = decouple.config("SLOW_QUERY_LOG", default=str(BASE_DIR / "slow_queries.log"))
+if IS_TESTING:
+    SLOW_QUERY_THRESHOLD_MS = 0
+# Seconds between rebuilds of the in-memory reputation index used for rank lookups
+RANK_INDEX_TIMEOUT = decouple.config("RANK_INDEX_TIMEOUT", default=300, cast=int)
+if IS_TESTING:
+    RANK_INDEX_TIMEOUT = 0
+# Seconds after which the request that reads the leaderboards rebuilds them, along with the scheduler's periodic rebuild
+LEADERBOARD_MAX_AGE = decouple.config("LEADERBOARD_MAX_AGE", default=900, cast=int)
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -156,6 +332,10 @@ LOGGING = {
             "format": "{levelname} {message}",
             "style": "{",
         },
+        "message": {
+            "format": "{message}",
+            "style": "{",
+        },
     },
     "handlers": {
         "console": {"level": "DEBUG", "class": "logging.StreamHandler", "formatter": "simple"},
@@ -165,8 +345,24 @@ LOGGING = {
             "filename": "django_tests.log",
             "formatter": "verbose",
         },
+        # One JSON object per line, read back by the slow_queries command
+        "slow_queries": {
+            "level": "WARNING",
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": SLOW_QUERY_LOG,
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 3,
+            # Only create the file once there is a slow query to write
+            "delay": True,
+            "formatter": "message",
+        },
     },
     "loggers": {
+        "core.slow_queries": {
+            "handlers": ["slow_queries"],
+            "level": "WARNING",
+            "propagate": False,
+        },
         "django": {
             "handlers": ["console", "file"],
             "level": "INFO",
@@ -182,5 +378,12 @@ LOGGING = {
             "level": "INFO",
             "propagate": False,
         },
+        "core.requests": {
+            # stdout only: "file" never rotates, and collecting the process output is left to the container runtime
+            "handlers": ["console"],
+            # One line per request would drown the test output
+            "level": "WARNING" if IS_TESTING else "INFO",
+            "propagate": False,
+        },
     },
 }
@@ -1,3 +1,4 @@
+import core.views
 import django.contrib.admin
 from django.conf.urls.i18n import i18n_patterns
 from django.conf.urls.static import static
@@ -5,6 +6,7 @@ from django.urls import include, path
 
 urlpatterns = [
     path("i18n/", include("django.conf.urls.i18n")),
+    path("metrics", core.views.metrics, name="metrics"),
 ]
 
 urlpatterns += i18n_patterns(
@@ -0,0 +1,45 @@
+"""Live updates of the question page, sent to its open tabs through ``core.events``"""
+
+import django.conf
+from asgiref.sync import sync_to_async
+from core.events import publish
+from django.template.loader import render_to_string
+
+from forum.models import Answer, Question
+
+
+def question_topic(question_id):
+    return f"question:{question_id}"
+
+
+def answer_posted(answer):
+    """Push the new answer, rendered once here instead of in every tab"""
+    if not django.conf.settings.LIVE_UPDATES:
+        return
+    topic = question_topic(answer.question_id)
+    html = render_to_string("forum/live_answer.html", {"answer": answer})
+    # NOTIFY payloads are capped at 8000 bytes; tabs show a reload link for longer answers
+    if not publish(topic, "answer", {"id": answer.pk, "html": html}):
+        publish(topic, "answer", {"id": answer.pk})
+
+
+def answer_accepted(answer):
+    publish(question_topic(answer.question_id), "accepted", {"id": answer.pk})
+
+
+aanswer_accepted = sync_to_async(answer_accepted)
+
+
+def score_changed(obj, upvotes, downvotes):
+    """Push vote totals rather than deltas, so a missed or repeated event cannot leave a tab off by one"""
+    if isinstance(obj, Question):
+        question_id = obj.pk
+    elif isinstance(obj, Answer):
+        question_id = obj.question_id
+    else:
+        return
+    data = {"model": obj._meta.model_name, "id": obj.pk, "upvotes": upvotes, "downvotes": downvotes}
+    publish(question_topic(question_id), "score", data)
+
+
+ascore_changed = sync_to_async(score_changed)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("forum", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(fields=["-created_at"], name="forum_question_created_idx"),
+        ),
+    ]
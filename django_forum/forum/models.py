@@ -4,6 +4,7 @@ from core.mixins import VoteableMixin
 from core.rep_rules import REPUTATION_RULES
 from django.contrib.contenttypes.fields import GenericRelation
 from django.db import models
+from users.models import UserStats
 from votes.models import Vote
 
 
@@ -22,6 +23,10 @@ class Question(VoteableMixin, models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Newest-first listings (forum, home page) read this instead of sorting the table
+            models.Index(fields=["-created_at"], name="forum_question_created_idx"),
+        ]
 
     def __str__(self):
         return self.title
@@ -63,3 +68,20 @@ class Answer(VoteableMixin, models.Model):
             points = REPUTATION_RULES["answer_accepted"]
             self.author.profile.reputation_points += points
             self.author.profile.save()
+
+            UserStats.bump(self.author_id, accepted_answers_count=1)
+
+    async def amark_accepted(self):
+        """Async ``mark_accepted()``. ``question`` and ``author__profile`` must already be loaded"""
+        if not self.is_accepted:
+            self.is_accepted = True
+            await self.asave()
+
+            self.question.is_solved = True
+            await self.question.asave()
+
+            points = REPUTATION_RULES["answer_accepted"]
+            self.author.profile.reputation_points += points
+            await self.author.profile.asave()
+
+            await UserStats.abump(self.author_id, accepted_answers_count=1)
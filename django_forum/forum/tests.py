@@ -1,12 +1,26 @@
 # forum/tests.py
+import asyncio
+import json
 import logging
 
+from asgiref.sync import sync_to_async
+from core.events import broker
+from core.testing import QueryBudgetMixin, QueryPlanMixin, async_request
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.contrib.contenttypes.models import ContentType
+from django.core.asgi import get_asgi_application
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from users.models import UserStats
+from votes.models import Vote
 
+from forum import events
 from forum.forms import AnswerForm, QuestionForm
 from forum.models import Answer, Question
+from forum.views import QuestionDetailView, QuestionListView, aaccept_answer
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
@@ -645,6 +659,40 @@ class AcceptAnswerViewTest(TestCase):
         self.answer.refresh_from_db()
         self.assertTrue(self.answer.is_accepted)
 
+    async def test_acceptance_under_asgi(self):
+        """Test accepting through the ASGI handler, where the view runs on the event loop"""
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.post(self.accept_url)
+
+        self.assertEqual(response.status_code, 200)
+        await self.answer.arefresh_from_db()
+        self.assertTrue(self.answer.is_accepted)
+        stats = await UserStats.objects.aget(user=self.answer_author)
+        self.assertEqual(stats.accepted_answers_count, 1)
+
+    async def test_async_variant(self):
+        """Test the view ASGI workers serve, which unaccepts the previous answer as well"""
+        previous = await Answer.objects.acreate(
+            question=self.question, content="Previous", author=self.answer_author, is_accepted=True
+        )
+        await UserStats.objects.filter(user=self.answer_author).aupdate(accepted_answers_count=1)
+
+        response = await aaccept_answer(async_request(self.accept_url, self.user), self.answer.pk)
+
+        self.assertEqual(json.loads(response.content), {"success": True})
+        await previous.arefresh_from_db()
+        await self.answer.arefresh_from_db()
+        self.assertEqual((previous.is_accepted, self.answer.is_accepted), (False, True))
+        stats = await UserStats.objects.aget(user=self.answer_author)
+        self.assertEqual(stats.accepted_answers_count, 1)
+
+    async def test_async_variant_owner_required(self):
+        """Test that only the question author may accept through the async view"""
+        response = await aaccept_answer(async_request(self.accept_url, self.other_user), self.answer.pk)
+
+        self.assertEqual(response.status_code, 403)
+
 
 class URLTests(TestCase):
     """Test URL patterns and their accessibility"""
@@ -724,3 +772,241 @@ class IntegrationTests(TestCase):
 
         # Alternative: Check that the question has an accepted answer
         self.assertTrue(question.answers.filter(is_accepted=True).exists())
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Test that forum views run a bounded number of queries regardless of data size"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", email="author@example.com", password="testpass123")
+        self.voters = [
+            User.objects.create_user(username=f"voter{i}", email=f"voter{i}@example.com", password="testpass123")
+            for i in range(3)
+        ]
+        self.question = Question.objects.create(title="Budget question", content="Content", author=self.author)
+        self.answer = Answer.objects.create(question=self.question, content="Budget answer", author=self.voters[0])
+        self.client.login(username="voter1", password="testpass123")
+
+    def add_answers(self, count):
+        for i in range(count):
+            answer = Answer.objects.create(question=self.question, content=f"Answer {i}", author=self.voters[i % 3])
+            self.add_votes(answer)
+
+    def add_questions(self, count):
+        for i in range(count):
+            question = Question.objects.create(title=f"Budget question {i}", content="Content", author=self.author)
+            Answer.objects.create(question=question, content="Budget answer", author=self.voters[0])
+            self.add_votes(question)
+
+    def add_votes(self, obj):
+        content_type = ContentType.objects.get_for_model(obj)
+        for voter in self.voters:
+            if voter != obj.author:
+                Vote.objects.create(user=voter, content_type=content_type, object_id=obj.pk, vote_type="up")
+
+    def test_question_list(self):
+        """Test question list budget"""
+        self.assertQueryBudget(reverse("forum:question_list"), 20, grow=lambda: self.add_questions(15))
+
+    def test_question_search(self):
+        """Test question search budget"""
+        url = reverse("forum:question_list") + "?q=budget"
+        self.assertQueryBudget(url, 20, grow=lambda: self.add_questions(15))
+
+    def test_question_detail(self):
+        """Test that question detail does not query per answer"""
+        url = reverse("forum:question_detail", kwargs={"pk": self.question.pk})
+        self.assertQueryBudget(url, 19, grow=lambda: self.add_answers(30))
+
+    def test_question_detail_anonymous(self):
+        """Test question detail budget for anonymous users"""
+        self.client.logout()
+        url = reverse("forum:question_detail", kwargs={"pk": self.question.pk})
+        self.assertQueryBudget(url, 17, grow=lambda: self.add_answers(30))
+
+    def test_question_create(self):
+        """Test question create form and submission budgets"""
+        url = reverse("forum:question_create")
+        self.assertQueryBudget(url, 16)
+        self.assertQueryBudget(url, 4, method="post", data={"title": "New question", "content": "New content"})
+
+    def test_question_update_and_delete(self):
+        """Test question edit and delete budgets"""
+        self.client.login(username="author", password="testpass123")
+        self.assertQueryBudget(reverse("forum:question_update", kwargs={"pk": self.question.pk}), 17)
+        url = reverse("forum:question_delete", kwargs={"pk": self.question.pk})
+        self.assertQueryBudget(url, 18, grow=lambda: self.add_answers(10))
+        # Stats for the cascaded answers and votes are taken with one UPDATE per author, not per row
+        self.assertQueryBudget(url, 16, method="post")
+
+    def test_answer_views(self):
+        """Test answer create, edit and delete budgets"""
+        self.client.login(username="voter0", password="testpass123")
+        url = reverse("forum:answer_create", kwargs={"question_id": self.question.pk})
+        self.assertQueryBudget(url, 4, method="post", data={"content": "Another answer"})
+        self.assertQueryBudget(reverse("forum:answer_update", kwargs={"pk": self.answer.pk}), 18)
+        url = reverse("forum:answer_delete", kwargs={"pk": self.answer.pk})
+        self.assertQueryBudget(url, 18)
+        self.assertQueryBudget(url, 8, method="post")
+
+    def test_accept_answer(self):
+        """Test accept answer budget"""
+        self.client.login(username="author", password="testpass123")
+        self.add_answers(10)
+        self.assertQueryBudget(reverse("forum:answer_accept", kwargs={"pk": self.answer.pk}), 13, method="post")
+
+
+class QueryPlanTest(QueryPlanMixin, TestCase):
+    """Test that the forum's querysets are served by indexes"""
+
+    def make_view(self, view_class, params=None, **kwargs):
+        request = RequestFactory().get("/", params or {})
+        request.user = self.user
+        view = view_class()
+        view.setup(request, **kwargs)
+        return view
+
+    def setUp(self):
+        self.user = User.objects.order_by("pk").first()
+        self.question = Question.objects.annotate(num_answers=Count("answers")).order_by("-num_answers").first()
+
+    def test_question_list(self):
+        """Test that the first page comes off the created_at index, and votes off the vote index"""
+        queryset = self.make_view(QuestionListView).get_queryset()[:10]
+
+        self.assertUsesIndex(queryset, "forum_question_created_idx")
+        self.assertNoSeqScan(queryset, "forum_question", "votes_vote", "users_user")
+
+    def test_search_votes(self):
+        """Test that search results still count their votes through the vote index"""
+        word = self.question.title.split()[0]
+        queryset = self.make_view(QuestionListView, {"q": word}).get_queryset()[:10]
+
+        # Substring search itself cannot use a b-tree index, only the vote subqueries can
+        self.assertNoSeqScan(queryset, "votes_vote")
+
+    def test_question_detail(self):
+        """Test that the question and its answers are fetched by key"""
+        view = self.make_view(QuestionDetailView, pk=self.question.pk)
+        view.object = view.get_object()
+
+        self.assertNoSeqScan(view.get_queryset().filter(pk=self.question.pk), "forum_question", "votes_vote")
+        answers = view.get_context_data()["answers"]
+        plan = self.assertNoSeqScan(answers, "forum_answer", "votes_vote", "users_user")
+        self.assertRegex(plan, r"Index Scan using forum_answer_question_id_\w+")
+
+
+@override_settings(LIVE_UPDATES=True)
+class QuestionEventsTest(TransactionTestCase):
+    """Test the question page's server-sent events, delivered through PostgreSQL NOTIFY on commit"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", email="author@example.com", password="testpass123")
+        self.answerer = User.objects.create_user(username="answerer", email="answerer@example.com", password="pass123")
+        self.question = Question.objects.create(title="Live question", content="Content", author=self.author)
+        self.url = reverse("forum:question_events", args=[self.question.pk])
+
+    async def open_stream(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b"retry: 3000\n\n")
+        return stream
+
+    async def next_event(self, stream):
+        event, data = (await asyncio.wait_for(anext(stream), 5)).decode().strip().splitlines()
+        return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+    async def test_vote_pushes_totals(self):
+        """Test that a vote pushes the new totals of the voted answer"""
+        answer = await Answer.objects.acreate(question=self.question, content="Answer", author=self.author)
+        stream = await self.open_stream()
+        await self.async_client.aforce_login(self.answerer)
+        content_type = await sync_to_async(ContentType.objects.get_for_model)(Answer)
+
+        await self.async_client.post(reverse("votes:vote", args=[content_type.pk, answer.pk, "down"]))
+
+        event = await self.next_event(stream)
+        self.assertEqual(event, ("score", {"model": "answer", "id": answer.pk, "upvotes": 0, "downvotes": 1}))
+        await stream.aclose()
+
+    async def test_answer_and_acceptance(self):
+        """Test that a new answer arrives rendered, followed by its acceptance"""
+        stream = await self.open_stream()
+        await self.async_client.aforce_login(self.answerer)
+
+        await self.async_client.post(reverse("forum:answer_create", args=[self.question.pk]), {"content": "Pushed"})
+
+        event, data = await self.next_event(stream)
+        answer = await Answer.objects.aget(question=self.question)
+        self.assertEqual((event, data["id"]), ("answer", answer.pk))
+        self.assertIn("Pushed", data["html"])
+
+        await self.async_client.aforce_login(self.author)
+        await self.async_client.post(reverse("forum:answer_accept", args=[answer.pk]))
+
+        self.assertEqual(await self.next_event(stream), ("accepted", {"id": answer.pk}))
+        await stream.aclose()
+
+    def test_not_streamed_under_wsgi(self):
+        """Test that WSGI answers 204 so EventSource stops reconnecting"""
+        self.assertEqual(self.client.get(self.url).status_code, 204)
+
+    async def test_stream_over_asgi(self):
+        """Test the stream as an ASGI server drives it, from the first frame until the client disconnects"""
+        answer = await Answer.objects.acreate(question=self.question, content="Answer", author=self.answerer)
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": self.url,
+            "raw_path": self.url.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"testserver"), (b"accept", b"text/event-stream")],
+            "client": ("127.0.0.1", 40000),
+            "server": ("testserver", 80),
+        }
+        requests = [{"type": "http.request", "body": b"", "more_body": False}]
+        disconnected = asyncio.Event()
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        sent = asyncio.Queue()
+        server = asyncio.create_task(get_asgi_application()(scope, receive, sent.put))
+
+        async def next_message():
+            return await asyncio.wait_for(sent.get(), 5)
+
+        start = await next_message()
+        self.assertEqual(start["status"], 200)
+        self.assertIn((b"Content-Type", b"text/event-stream"), start["headers"])
+        self.assertEqual((await next_message())["body"], b"retry: 3000\n\n")
+
+        await sync_to_async(events.answer_accepted)(answer)
+
+        body = (await next_message())["body"]
+        self.assertEqual(body, f'event: accepted\ndata: {{"id":{answer.pk}}}\n\n'.encode())
+        disconnected.set()
+        await asyncio.wait_for(server, 5)
+        self.assertEqual(dict(broker.subscribers), {})
+        self.assertIsNone(broker.listener)
+
+    @override_settings(LIVE_UPDATES=False)
+    def test_off_without_live_updates(self):
+        """Test that without LIVE_UPDATES pages do not subscribe and writes neither render nor notify"""
+        self.client.login(username="answerer", password="pass123")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("forum:answer_create", args=[self.question.pk]), {"content": "New"})
+
+        self.assertRedirects(response, self.question.get_absolute_url(), fetch_redirect_response=False)
+        self.assertTemplateNotUsed(response, "forum/live_answer.html")
+        self.assertNotIn("pg_notify", " ".join(query["sql"] for query in queries))
+        self.assertNotContains(self.client.get(self.question.get_absolute_url()), "EventSource")
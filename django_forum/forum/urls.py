@@ -1,3 +1,4 @@
+import django.conf
 from django.urls import path
 
 from forum import views
@@ -11,9 +12,14 @@ urlpatterns = [
     path("question/new/", views.QuestionCreateView.as_view(), name="question_create"),
     path("question/<int:pk>/edit/", views.QuestionUpdateView.as_view(), name="question_update"),
     path("question/<int:pk>/delete/", views.QuestionDeleteView.as_view(), name="question_delete"),
+    path("question/<int:pk>/events/", views.question_events, name="question_events"),
     # Answers
     path("question/<int:question_id>/answer/", views.AnswerCreateView.as_view(), name="answer_create"),
     path("answer/<int:pk>/edit/", views.AnswerUpdateView.as_view(), name="answer_update"),
     path("answer/<int:pk>/delete/", views.AnswerDeleteView.as_view(), name="answer_delete"),
-    path("answer/<int:pk>/accept/", views.accept_answer, name="answer_accept"),
+    path(
+        "answer/<int:pk>/accept/",
+        views.aaccept_answer if django.conf.settings.ASGI else views.accept_answer,
+        name="answer_accept",
+    ),
 ]
@@ -1,13 +1,19 @@
+import django.conf
 import django.urls
+from core.events import stream
+from core.mixins import with_votes
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.handlers.asgi import ASGIRequest
 from django.db.models import Q
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404
 from django.utils.translation import gettext_lazy as _
 from django.views.decorators.http import require_POST
 from django.views.generic import CreateView, DeleteView, DetailView, ListView, UpdateView
+from users.models import UserStats
 
+from forum import events
 from forum.forms import AnswerForm, QuestionForm
 from forum.models import Answer, Question
 
@@ -41,7 +47,7 @@ class QuestionListView(ListView):
             queryset = Question.objects.all().select_related("author", "author__profile").prefetch_related("answers")
 
         self.search_words = queryset.count()
-        return queryset.order_by("-created_at")
+        return with_votes(queryset, self.request.user).order_by("-created_at")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -59,25 +65,14 @@ class QuestionDetailView(DetailView):
     template_name = "forum/question_detail.html"
     context_object_name = "question"
 
+    def get_queryset(self):
+        return with_votes(super().get_queryset().select_related("author__profile"), self.request.user)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["answer_form"] = AnswerForm()
-        context["answers"] = self.object.answers.all()
-        question = context["question"]
-
-        question.upvotes = question.get_upvotes().count()
-        question.downvotes = question.get_downvotes().count()
-        question.vote_count = question.upvotes - question.downvotes
-
-        question.user_vote = question.get_user_vote(self.request.user)
-
-        for answer in context["answers"]:
-            answer.upvotes = answer.get_upvotes().count()
-            answer.downvotes = answer.get_downvotes().count()
-            answer.vote_count = answer.upvotes - answer.downvotes
-
-            answer.user_vote = answer.get_user_vote(self.request.user)
-
+        context["live_updates"] = django.conf.settings.LIVE_UPDATES
+        context["answers"] = with_votes(self.object.answers.select_related("author__profile"), self.request.user)
         return context
 
 
@@ -118,7 +113,9 @@ class AnswerCreateView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         form.instance.author = self.request.user
         form.instance.question_id = self.kwargs["question_id"]
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        events.answer_posted(self.object)
+        return response
 
     def get_success_url(self):
         return django.urls.reverse("forum:question_detail", kwargs={"pk": self.kwargs["question_id"]})
@@ -150,13 +147,52 @@ class AnswerDeleteView(LoginRequiredMixin, DeleteView):
 @require_POST
 @login_required
 def accept_answer(request, pk):
-    answer = get_object_or_404(Answer, pk=pk)
+    """Served under WSGI; ``aaccept_answer`` is the same view for ASGI"""
+    answer = get_object_or_404(Answer.objects.select_related("question", "author__profile"), pk=pk)
 
-    if request.user != answer.question.author:
+    if request.user.pk != answer.question.author_id:
         return JsonResponse({"error": _("Only question author can accept answers")}, status=403)
 
-    Answer.objects.filter(question=answer.question, is_accepted=True).update(is_accepted=False)
+    previously_accepted = Answer.objects.filter(question=answer.question_id, is_accepted=True)
+    for author_id in previously_accepted.values_list("author_id", flat=True):
+        UserStats.bump(author_id, accepted_answers_count=-1)
+    previously_accepted.update(is_accepted=False)
 
     answer.mark_accepted()
+    events.answer_accepted(answer)
+
+    return JsonResponse({"success": True})
+
+
+@require_POST
+@login_required
+async def aaccept_answer(request, pk):
+    answer = await aget_object_or_404(Answer.objects.select_related("question", "author__profile"), pk=pk)
+
+    user = await request.auser()
+    if user.pk != answer.question.author_id:
+        return JsonResponse({"error": _("Only question author can accept answers")}, status=403)
+
+    previously_accepted = Answer.objects.filter(question=answer.question_id, is_accepted=True)
+    async for author_id in previously_accepted.values_list("author_id", flat=True):
+        await UserStats.abump(author_id, accepted_answers_count=-1)
+    await previously_accepted.aupdate(is_accepted=False)
+
+    await answer.amark_accepted()
+    await events.aanswer_accepted(answer)
 
     return JsonResponse({"success": True})
+
+
+async def question_events(request, pk):
+    """Server-sent events keeping an open question page up to date, see ``forum.events``"""
+    if not django.conf.settings.LIVE_UPDATES or not isinstance(request, ASGIRequest):
+        # Nothing is published, or a WSGI worker would be tied up for as long as the tab stays open;
+        # 204 tells EventSource not to retry
+        return HttpResponse(status=204)
+    # No database access: a connection held for the life of every open tab would run out long before the tabs do
+    return StreamingHttpResponse(
+        stream(events.question_topic(pk)),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
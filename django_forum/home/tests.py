@@ -0,0 +1,74 @@
+# home/tests.py
+import logging
+
+from asgiref.sync import sync_to_async
+from core.testing import QueryBudgetMixin, async_request
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from django.urls import reverse
+from forum.models import Answer, Question
+from reviews.models import CourseReview
+from votes.models import Vote
+
+from home.views import ahome_view
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Test that home views run a bounded number of queries regardless of data size"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpass123")
+        self.voter = User.objects.create_user(username="voter", email="voter@example.com", password="testpass123")
+        self.add_content(2)
+
+    def add_content(self, count):
+        for i in range(count):
+            question = Question.objects.create(title=f"Question {i}", content="Content", author=self.user)
+            Answer.objects.create(question=question, content="Answer", author=self.voter)
+            CourseReview.objects.create(
+                author=self.user,
+                title="Review",
+                content="Content",
+                rating=5,
+                course_name=f"Course {CourseReview.objects.count()}",
+            )
+            Vote.objects.create(
+                user=self.voter,
+                content_type=ContentType.objects.get_for_model(Question),
+                object_id=question.pk,
+                vote_type="up",
+            )
+
+    def test_home_anonymous(self):
+        """Test home page budget for anonymous users"""
+        self.assertQueryBudget(reverse("home:home"), 28, grow=lambda: self.add_content(10))
+
+    def test_home_signed_in(self):
+        """Test home page budget with the personal stats block"""
+        self.client.login(username="testuser", password="testpass123")
+        self.assertQueryBudget(reverse("home:home"), 34, grow=lambda: self.add_content(10))
+
+    async def test_async_variant(self):
+        """Test that the view ASGI workers serve renders the same personal stats"""
+        user = await User.objects.select_related("profile").aget(username="testuser")
+
+        response = await ahome_view(async_request(reverse("home:home"), user, method="get"))
+
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertIn("My Profile", content)
+        await sync_to_async(self.client.force_login)(user)
+        expected = await sync_to_async(self.client.get)(reverse("home:home"))
+        for key in ("user_questions", "user_answers", "user_reviews"):
+            self.assertIn(f">{expected.context[key]}<", content)
+        self.assertIn(f"#{expected.context['user_rank']} ", content)
+
+    def test_page_not_found(self):
+        """Test custom 404 page budget"""
+        self.assertQueryBudget(reverse("home:panda"), 16)
@@ -1,3 +1,4 @@
+import django.conf
 from django.urls import path
 
 from home import views
@@ -5,6 +6,6 @@ from home import views
 app_name = "home"
 
 urlpatterns = [
-    path("", views.home_view, name="home"),
+    path("", views.ahome_view if django.conf.settings.ASGI else views.home_view, name="home"),
     path("page-not-found", views.panda, name="panda"),
 ]
@@ -1,5 +1,9 @@
 from datetime import timedelta
 
+import django.conf
+from asgiref.sync import sync_to_async
+from core.cache import get_or_compute
+from core.mixins import with_votes
 from django.contrib.auth import get_user_model
 from django.http import Http404
 from django.shortcuts import render
@@ -7,51 +11,81 @@ from django.utils import timezone
 from forum.models import Answer, Question
 from reviews.models import CourseReview
 from users.models import UserProfile
+from users.ranks import get_user_rank
 
 User = get_user_model()
 
+STATS_KEY = "home:stats"
+
 
 def home_view(request):
-    context = {}
+    """Served under WSGI; ``ahome_view`` is the same view for ASGI"""
+    context = get_or_compute(STATS_KEY, compute_home_stats, django.conf.settings.STATS_CACHE_TIMEOUT).copy()
 
-    context["total_users"] = User.objects.count()
-    context["total_questions"] = Question.objects.count()
-    context["total_answers"] = Answer.objects.count()
-    context["total_reviews"] = CourseReview.objects.count()
+    if request.user.is_authenticated:
+        user = request.user
+        context["user_questions"] = user.questions.count()
+        context["user_answers"] = user.answers.count()
+        context["user_reviews"] = user.reviews.count()
+        context["user_rank"] = get_user_rank(user)
 
-    context["latest_questions"] = (
-        Question.objects.select_related("author", "author__profile")
-        .prefetch_related("answers")
-        .order_by("-created_at")[:8]
-    )
+    return render_home(request, context)
+
+
+async def ahome_view(request):
+    user = await request.auser()
+    # Otherwise the template's request.user would load the same user and profile a second time
+    request.user = user
+    stats = await sync_to_async(get_or_compute)(STATS_KEY, compute_home_stats, django.conf.settings.STATS_CACHE_TIMEOUT)
+    context = stats.copy()
+
+    if user.is_authenticated:
+        context["user_questions"] = await user.questions.acount()
+        context["user_answers"] = await user.answers.acount()
+        context["user_reviews"] = await user.reviews.acount()
+        context["user_rank"] = await sync_to_async(get_user_rank)(user)
+
+    return await sync_to_async(render_home)(request, context)
+
+
+def render_home(request, context):
+    user = request.user
+
+    context["latest_questions"] = with_votes(
+        Question.objects.select_related("author", "author__profile").prefetch_related("answers"),
+        user,
+    ).order_by("-created_at")[:8]
 
-    context["latest_reviews"] = CourseReview.objects.select_related("author", "author__profile").order_by(
-        "-created_at",
-    )[:6]
+    context["latest_reviews"] = with_votes(
+        CourseReview.objects.select_related("author", "author__profile"),
+        user,
+    ).order_by("-created_at")[:6]
 
     context["top_contributors"] = (
         UserProfile.objects.select_related("user").filter(reputation_points__gt=0).order_by("-reputation_points")[:5]
     )
 
-    day_ago = timezone.now() - timedelta(hours=24)
-    context["questions_tonight"] = Question.objects.filter(created_at__gte=day_ago).count()
-    context["total_answers_tonight"] = Answer.objects.filter(created_at__gte=day_ago).count()
+    return render(request, "home/home.html", context)
 
-    top_profile = UserProfile.objects.order_by("-reputation_points").first()
-    if top_profile:
-        context["top_user"] = top_profile.user.username
-        context["top_reputation"] = top_profile.reputation_points
 
-    if request.user.is_authenticated:
-        user = request.user
-        context["user_questions"] = user.questions.count()
-        context["user_answers"] = user.answers.count()
-        context["user_reviews"] = user.reviews.count()
+def compute_home_stats():
+    stats = {}
 
-        user_rank = UserProfile.objects.filter(reputation_points__gt=user.profile.reputation_points).count() + 1
-        context["user_rank"] = user_rank
+    stats["total_users"] = User.objects.count()
+    stats["total_questions"] = Question.objects.count()
+    stats["total_answers"] = Answer.objects.count()
+    stats["total_reviews"] = CourseReview.objects.count()
 
-    return render(request, "home/home.html", context)
+    day_ago = timezone.now() - timedelta(hours=24)
+    stats["questions_tonight"] = Question.objects.filter(created_at__gte=day_ago).count()
+    stats["total_answers_tonight"] = Answer.objects.filter(created_at__gte=day_ago).count()
+
+    top_profile = UserProfile.objects.select_related("user").order_by("-reputation_points").first()
+    if top_profile:
+        stats["top_user"] = top_profile.user.username
+        stats["top_reputation"] = top_profile.reputation_points
+
+    return stats
 
 
 def custom_404_view(request, exception):
@@ -0,0 +1,55 @@
+from datetime import timedelta
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import F, Max, Window
+from django.db.models.functions import Rank
+from django.utils import timezone
+from users.models import UserProfile
+
+from leaderboards.models import RankHistory
+
+BATCH_SIZE = 5000
+
+
+def snapshot_ranks(date=None, batch_size=BATCH_SIZE):
+    """Store every user's reputation and competition rank (1, 1, 3) for ``date``, replacing an earlier run for that day"""
+    date = date or timezone.localdate()
+    ranked = (
+        UserProfile.objects.annotate(rank=Window(Rank(), order_by=F("reputation_points").desc()))
+        .values_list("user_id", "reputation_points", "rank")
+        .iterator(chunk_size=batch_size)
+    )
+    rows = (
+        RankHistory(date=date, user_id=user_id, reputation_points=points, rank=rank) for user_id, points, rank in ranked
+    )
+
+    stored = 0
+    with transaction.atomic():
+        RankHistory.objects.filter(date=date).delete()
+        while batch := list(islice(rows, batch_size)):
+            RankHistory.objects.bulk_create(batch)
+            stored += len(batch)
+    return stored
+
+
+def rank_changes(user_ids, days=1):
+    """Return ``{user_id: places moved up}`` between the latest snapshot and the one ``days`` before it.
+
+    Negative values mean the user dropped. Users missing from either
+    snapshot are left out.
+    """
+    latest = RankHistory.objects.aggregate(date=Max("date"))["date"]
+    if latest is None:
+        return {}
+    earlier = RankHistory.objects.filter(date__lte=latest - timedelta(days=days)).aggregate(date=Max("date"))["date"]
+    if earlier is None:
+        return {}
+
+    current = _ranks_on(latest, user_ids)
+    previous = _ranks_on(earlier, user_ids)
+    return {user_id: previous[user_id] - rank for user_id, rank in current.items() if user_id in previous}
+
+
+def _ranks_on(date, user_ids):
+    return dict(RankHistory.objects.filter(date=date, user_id__in=user_ids).values_list("user_id", "rank"))
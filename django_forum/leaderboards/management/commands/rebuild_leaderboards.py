@@ -0,0 +1,14 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from leaderboards.snapshots import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = "Recomputes the weekly, monthly and all-time leaderboard snapshots. Run it periodically, e.g. from cron."
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        rebuild_leaderboards()
+        self.stdout.write(self.style.SUCCESS(f"Leaderboards rebuilt in {time.monotonic() - start:.2f}s"))
@@ -0,0 +1,23 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+
+from leaderboards.history import BATCH_SIZE, snapshot_ranks
+
+
+class Command(BaseCommand):
+    help = "Stores today's reputation and rank of every user for rank-change tracking. Run it once a day."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            type=datetime.date.fromisoformat,
+            help="Day to record the snapshot under (YYYY-MM-DD), defaults to today",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows per INSERT")
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        stored = snapshot_ranks(options["date"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Stored {stored} ranks in {time.monotonic() - start:.2f}s"))
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaderboardSnapshot",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "window",
+                    models.CharField(
+                        choices=[("week", "This week"), ("month", "This month"), ("all_time", "All time")],
+                        max_length=8,
+                        unique=True,
+                    ),
+                ),
+                ("starts_at", models.DateTimeField(blank=True, null=True)),
+                ("participants", models.PositiveIntegerField(default=0)),
+                ("computed_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="LeaderboardEntry",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("rank", models.PositiveIntegerField()),
+                ("reputation_points", models.IntegerField()),
+                ("questions_count", models.PositiveIntegerField(default=0)),
+                ("answers_count", models.PositiveIntegerField(default=0)),
+                ("reviews_count", models.PositiveIntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="leaderboard_entries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "snapshot",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="entries",
+                        to="leaderboards.leaderboardsnapshot",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["snapshot", "rank"],
+                "constraints": [
+                    models.UniqueConstraint(fields=("snapshot", "rank"), name="leaderboards_unique_snapshot_rank")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leaderboards", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RankHistory",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("date", models.DateField()),
+                ("reputation_points", models.IntegerField()),
+                ("rank", models.PositiveIntegerField()),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rank_history",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "rank history",
+                "ordering": ["-date", "rank"],
+                "constraints": [
+                    models.UniqueConstraint(fields=("date", "user"), name="leaderboards_unique_rank_history_day")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leaderboards", "0002_rank_history"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="leaderboardentry",
+            name="snapshot",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="entries",
+                to="leaderboards.leaderboardsnapshot",
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leaderboards", "0003_drop_redundant_snapshot_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="leaderboardentry",
+            options={"ordering": ["snapshot", "rank", "id"]},
+        ),
+        migrations.RemoveConstraint(
+            model_name="leaderboardentry",
+            name="leaderboards_unique_snapshot_rank",
+        ),
+        migrations.AddIndex(
+            model_name="leaderboardentry",
+            index=models.Index(fields=["snapshot", "rank", "id"], name="leaderboards_snapshot_rank"),
+        ),
+        migrations.AddConstraint(
+            model_name="leaderboardentry",
+            constraint=models.UniqueConstraint(fields=("user", "snapshot"), name="leaderboards_unique_user_snapshot"),
+        ),
+    ]
@@ -0,0 +1,69 @@
+import django.conf
+from django.db import models
+
+
+class LeaderboardSnapshot(models.Model):
+    class Window(models.TextChoices):
+        WEEK = "week", "This week"
+        MONTH = "month", "This month"
+        ALL_TIME = "all_time", "All time"
+
+    window = models.CharField(max_length=8, choices=Window.choices, unique=True)
+    starts_at = models.DateTimeField(null=True, blank=True)
+    participants = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.get_window_display()} leaderboard ({self.computed_at:%Y-%m-%d %H:%M})"
+
+
+class LeaderboardEntry(models.Model):
+    # The (snapshot, rank) index already covers lookups by snapshot, in rank order
+    snapshot = models.ForeignKey(LeaderboardSnapshot, on_delete=models.CASCADE, related_name="entries", db_index=False)
+    rank = models.PositiveIntegerField()
+    user = models.ForeignKey(
+        django.conf.settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="leaderboard_entries",
+    )
+    # Reputation earned inside the snapshot's window
+    reputation_points = models.IntegerField()
+    questions_count = models.PositiveIntegerField(default=0)
+    answers_count = models.PositiveIntegerField(default=0)
+    reviews_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Tied entries share a rank; the primary key keeps them in the order they were ranked
+        ordering = ["snapshot", "rank", "id"]
+        constraints = [
+            models.UniqueConstraint(fields=["user", "snapshot"], name="leaderboards_unique_user_snapshot"),
+        ]
+        indexes = [
+            models.Index(fields=["snapshot", "rank", "id"], name="leaderboards_snapshot_rank"),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} {self.user.username} ({self.reputation_points})"
+
+
+class RankHistory(models.Model):
+    """Daily record of a user's reputation and competition rank, written by the snapshot_ranks command"""
+
+    date = models.DateField()
+    user = models.ForeignKey(
+        django.conf.settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="rank_history",
+    )
+    reputation_points = models.IntegerField()
+    rank = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ["-date", "rank"]
+        constraints = [
+            models.UniqueConstraint(fields=["date", "user"], name="leaderboards_unique_rank_history_day"),
+        ]
+        verbose_name_plural = "rank history"
+
+    def __str__(self):
+        return f"{self.date}: #{self.rank} {self.user.username} ({self.reputation_points})"
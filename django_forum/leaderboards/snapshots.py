@@ -0,0 +1,162 @@
+from collections import Counter
+from datetime import timedelta
+
+import django.conf
+from core.cache import single_flight
+from core.rep_rules import REPUTATION_RULES
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.utils import timezone
+from forum.models import Answer, Question
+from reviews.models import CourseReview
+from users.models import UserProfile
+from votes.models import Vote
+
+from leaderboards.models import LeaderboardEntry, LeaderboardSnapshot
+
+LEADERBOARD_SIZE = 20
+REBUILD_KEY = "leaderboards:rebuild"
+
+Window = LeaderboardSnapshot.Window
+
+# Content model -> (reputation rule prefix, entry counter field)
+CONTENT_MODELS = {
+    Question: ("question", "questions_count"),
+    Answer: ("answer", "answers_count"),
+    CourseReview: ("review", "reviews_count"),
+}
+
+
+def window_start(window, now):
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if window == Window.WEEK:
+        return day_start - timedelta(days=day_start.weekday())
+    if window == Window.MONTH:
+        return day_start.replace(day=1)
+    return None
+
+
+def get_leaderboards():
+    """Return ``{window: snapshot}`` with ranked entries prefetched.
+
+    Snapshots that are missing, older than ``LEADERBOARD_MAX_AGE`` or from a
+    week or month that has ended are rebuilt by the one request that wins
+    the rebuild lock; concurrent requests get whatever is stored so far, so
+    windows can be absent until the first build ends.
+    """
+    snapshots = _load_snapshots()
+    if _stale(snapshots, timezone.now()):
+        with single_flight(REBUILD_KEY) as acquired:
+            if acquired:
+                rebuild_leaderboards()
+                snapshots = _load_snapshots()
+    return snapshots
+
+
+def rebuild_leaderboards(now=None):
+    now = now or timezone.now()
+    for window in Window:
+        starts_at = window_start(window, now)
+        if starts_at is None:
+            participants, rows = _all_time_rows()
+        else:
+            participants, rows = _window_rows(starts_at)
+        _store(window, starts_at, now, participants, rows)
+
+
+def _stale(snapshots, now):
+    max_age = timedelta(seconds=django.conf.settings.LEADERBOARD_MAX_AGE)
+    for window in Window:
+        snapshot = snapshots.get(window)
+        if snapshot is None or now - snapshot.computed_at > max_age or snapshot.starts_at != window_start(window, now):
+            return True
+    return False
+
+
+def _load_snapshots():
+    entries = Prefetch("entries", queryset=LeaderboardEntry.objects.select_related("user"))
+    return {snapshot.window: snapshot for snapshot in LeaderboardSnapshot.objects.prefetch_related(entries)}
+
+
+def _all_time_rows():
+    profiles = UserProfile.objects.filter(reputation_points__gt=0)
+    leaders = profiles.select_related("user__stats").order_by("-reputation_points", "user_id")[:LEADERBOARD_SIZE]
+
+    rows = [
+        {
+            "user_id": profile.user_id,
+            "reputation_points": profile.reputation_points,
+            "questions_count": profile.user.stats.questions_count,
+            "answers_count": profile.user.stats.answers_count,
+            "reviews_count": profile.user.stats.reviews_count,
+        }
+        for profile in leaders
+    ]
+    return profiles.count(), rows
+
+
+def _window_rows(starts_at):
+    """Rank everyone who posted or earned reputation since ``starts_at`` by the reputation earned in that window"""
+    earned = Counter()
+    counts = {}
+
+    for model, (rule_prefix, count_field) in CONTENT_MODELS.items():
+        created = model.objects.filter(created_at__gte=starts_at).order_by()
+        for author_id, count in created.values_list("author_id").annotate(count=Count("pk")):
+            counts.setdefault(author_id, Counter())[count_field] = count
+
+        votes = (
+            Vote.objects.filter(content_type=ContentType.objects.get_for_model(model), created_at__gte=starts_at)
+            .annotate(author=Subquery(model.objects.filter(pk=OuterRef("object_id")).values("author_id")[:1]))
+            .exclude(author=None)
+            .order_by()
+            .values_list("author", "vote_type")
+            .annotate(count=Count("pk"))
+        )
+        for author_id, vote_type, count in votes:
+            suffix = "upvote" if vote_type == "up" else "downvote"
+            earned[author_id] += REPUTATION_RULES[f"{rule_prefix}_{suffix}"] * count
+
+    # Acceptance is not timestamped; the answer's updated_at is set when it gets accepted
+    accepted = Answer.objects.filter(is_accepted=True, updated_at__gte=starts_at).order_by()
+    for author_id, count in accepted.values_list("author_id").annotate(count=Count("pk")):
+        earned[author_id] += REPUTATION_RULES["answer_accepted"] * count
+
+    participants = set(counts) | set(earned)
+    all_time = dict(UserProfile.objects.filter(user_id__in=participants).values_list("user_id", "reputation_points"))
+    leaders = sorted(participants, key=lambda user_id: (-earned[user_id], -all_time.get(user_id, 0), user_id))
+
+    rows = [
+        {
+            "user_id": user_id,
+            "reputation_points": earned[user_id],
+            **counts.get(user_id, {}),
+        }
+        for user_id in leaders[:LEADERBOARD_SIZE]
+    ]
+    return len(participants), rows
+
+
+def _store(window, starts_at, computed_at, participants, rows):
+    with transaction.atomic():
+        snapshot, _ = LeaderboardSnapshot.objects.update_or_create(
+            window=window,
+            defaults={"starts_at": starts_at, "participants": participants, "computed_at": computed_at},
+        )
+        snapshot.entries.all().delete()
+        LeaderboardEntry.objects.bulk_create(
+            [LeaderboardEntry(snapshot=snapshot, rank=rank, **row) for rank, row in _competition_ranks(rows)],
+        )
+
+
+def _competition_ranks(rows):
+    """Yield ``(rank, row)`` for rows sorted by reputation; ties share a rank and the next one skips (1, 1, 3).
+
+    Same rule as ``users.ranks.RankIndex``.
+    """
+    rank = previous = None
+    for position, row in enumerate(rows, start=1):
+        if row["reputation_points"] != previous:
+            rank, previous = position, row["reputation_points"]
+        yield rank, row
@@ -1,18 +1,39 @@
 import logging
 from datetime import timedelta
+from io import StringIO
 
+from core.cache import single_flight
+from core.testing import QueryBudgetMixin, QueryPlanMixin
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
-from forum.models import Question
+from forum.models import Answer, Question
 from users.models import UserProfile
+from votes.models import Vote
+
+from leaderboards.history import rank_changes, snapshot_ranks
+from leaderboards.models import LeaderboardSnapshot, RankHistory
+from leaderboards.snapshots import REBUILD_KEY, get_leaderboards, rebuild_leaderboards, window_start
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
+LOCMEM_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "leaderboards-tests",
+    },
+    "local": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "leaderboards-tests-local",
+    },
+}
+
 
 class LeaderboardViewTest(TestCase):
     """Test LeaderboardView functionality"""
@@ -219,3 +240,255 @@ class LeaderboardEdgeCasesTest(TestCase):
 
         response = self.client.get(reverse("leaderboards:leaderboard"))
         self.assertEqual(response.status_code, 200)
+
+
+class LeaderboardSnapshotTest(TestCase):
+    """Test precomputed leaderboard snapshots"""
+
+    def setUp(self):
+        self.veteran = User.objects.create_user(username="veteran", email="vet@example.com", password="testpass123")
+        self.veteran.profile.reputation_points = 1000
+        self.veteran.profile.save()
+
+        self.newcomer = User.objects.create_user(username="newcomer", email="new@example.com", password="testpass123")
+        self.voter = User.objects.create_user(username="voter", email="voter@example.com", password="testpass123")
+
+        old_question = Question.objects.create(title="Old", content="Old content", author=self.veteran)
+        Question.objects.filter(pk=old_question.pk).update(created_at=timezone.now() - timedelta(days=60))
+
+        question = Question.objects.create(title="Fresh", content="Fresh content", author=self.voter)
+        answer = Answer.objects.create(question=question, content="Fresh answer", author=self.newcomer)
+        Vote.objects.create(
+            user=self.voter,
+            content_type=ContentType.objects.get_for_model(Answer),
+            object_id=answer.pk,
+            vote_type="up",
+        )
+        answer.mark_accepted()
+
+    def test_rebuild_creates_every_window(self):
+        """Test that a rebuild stores one snapshot per window"""
+        rebuild_leaderboards()
+        self.assertEqual(
+            set(LeaderboardSnapshot.objects.values_list("window", flat=True)),
+            set(LeaderboardSnapshot.Window.values),
+        )
+
+    def test_rebuild_replaces_entries(self):
+        """Test that rebuilding twice does not duplicate entries"""
+        rebuild_leaderboards()
+        rebuild_leaderboards()
+        snapshot = LeaderboardSnapshot.objects.get(window=LeaderboardSnapshot.Window.ALL_TIME)
+        self.assertEqual(snapshot.entries.count(), UserProfile.objects.filter(reputation_points__gt=0).count())
+
+    def test_month_ranks_by_reputation_earned(self):
+        """Test that monthly rank uses reputation earned this month, not all-time totals"""
+        month = get_leaderboards()[LeaderboardSnapshot.Window.MONTH]
+        entries = list(month.entries.all())
+
+        self.assertEqual([entry.user for entry in entries], [self.newcomer, self.voter])
+        self.assertEqual(entries[0].rank, 1)
+        self.assertGreater(entries[0].reputation_points, 0)
+        self.assertEqual(entries[0].answers_count, 1)
+        self.assertEqual(month.participants, 2)
+
+    def test_ties_share_rank(self):
+        """Test that users with equal reputation share a rank and the next rank is skipped"""
+        UserProfile.objects.filter(user__in=[self.newcomer, self.voter]).update(reputation_points=1000)
+        UserProfile.objects.filter(user=self.veteran).update(reputation_points=500)
+        rebuild_leaderboards()
+
+        all_time = get_leaderboards()[LeaderboardSnapshot.Window.ALL_TIME]
+        ranks = [(entry.user, entry.rank) for entry in all_time.entries.all()]
+        self.assertEqual(ranks, [(self.newcomer, 1), (self.voter, 1), (self.veteran, 3)])
+
+    def test_old_activity_excluded_from_week(self):
+        """Test that activity before the window starts is ignored"""
+        week = get_leaderboards()[LeaderboardSnapshot.Window.WEEK]
+        self.assertNotIn(self.veteran, [entry.user for entry in week.entries.all()])
+
+    def test_view_reads_snapshots(self):
+        """Test that the view serves stored snapshots instead of recomputing"""
+        rebuild_leaderboards()
+        Question.objects.create(title="Later", content="Later content", author=self.veteran)
+
+        response = self.client.get(reverse("leaderboards:leaderboard"))
+        month_usernames = [entry.user.username for entry in response.context["month_leaders"]]
+        self.assertNotIn("veteran", month_usernames)
+
+    @override_settings(LEADERBOARD_MAX_AGE=600)
+    def test_old_snapshots_rebuilt(self):
+        """Test that snapshots older than LEADERBOARD_MAX_AGE are rebuilt on read"""
+        rebuild_leaderboards(now=timezone.now() - timedelta(minutes=11))
+        Question.objects.create(title="Later", content="Later content", author=self.veteran)
+
+        week = get_leaderboards()[LeaderboardSnapshot.Window.WEEK]
+        self.assertGreater(week.computed_at, timezone.now() - timedelta(minutes=1))
+        self.assertIn(self.veteran, [entry.user for entry in week.entries.all()])
+
+    @override_settings(LEADERBOARD_MAX_AGE=10**9)
+    def test_ended_window_rebuilt(self):
+        """Test that a week or month snapshot is rebuilt once its window has ended, however recent it is"""
+        rebuild_leaderboards(now=timezone.now() - timedelta(days=40))
+
+        snapshots = get_leaderboards()
+        now = timezone.now()
+        for window in (LeaderboardSnapshot.Window.WEEK, LeaderboardSnapshot.Window.MONTH):
+            self.assertEqual(snapshots[window].starts_at, window_start(window, now))
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_missing_snapshots_built_once(self):
+        """Test that only the request holding the rebuild lock builds missing snapshots"""
+        with single_flight(REBUILD_KEY) as acquired:
+            self.assertTrue(acquired)
+            self.assertEqual(get_leaderboards(), {})
+
+            response = self.client.get(reverse("leaderboards:leaderboard"))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context["all_time_leaders"], [])
+
+        self.assertFalse(LeaderboardSnapshot.objects.exists())
+        self.assertEqual(len(get_leaderboards()), len(LeaderboardSnapshot.Window))
+
+    def test_rebuild_command(self):
+        """Test rebuild_leaderboards management command"""
+        out = StringIO()
+        call_command("rebuild_leaderboards", stdout=out)
+
+        self.assertEqual(LeaderboardSnapshot.objects.count(), len(LeaderboardSnapshot.Window))
+        self.assertIn("Leaderboards rebuilt", out.getvalue())
+
+
+class RankHistoryTest(TestCase):
+    """Test daily rank snapshots and rank movement"""
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.users = {}
+        for username, points in [("alice", 300), ("bob", 200), ("carol", 200), ("dave", 50)]:
+            user = User.objects.create_user(username=username, email=f"{username}@example.com", password="testpass123")
+            user.profile.reputation_points = points
+            user.profile.save()
+            self.users[username] = user
+
+    def set_reputation(self, username, points):
+        UserProfile.objects.filter(user=self.users[username]).update(reputation_points=points)
+
+    def test_competition_ranks_stored(self):
+        """Test that ties share a rank and the next rank is skipped, as on the leaderboard"""
+        stored = snapshot_ranks(self.today)
+
+        ranks = dict(RankHistory.objects.filter(date=self.today).values_list("user__username", "rank"))
+        self.assertEqual(stored, 4)
+        self.assertEqual(ranks, {"alice": 1, "bob": 2, "carol": 2, "dave": 4})
+
+    def test_snapshot_rerun_replaces_day(self):
+        """Test that running the job twice on one day does not duplicate rows"""
+        snapshot_ranks(self.today, batch_size=3)
+        snapshot_ranks(self.today, batch_size=3)
+
+        self.assertEqual(RankHistory.objects.filter(date=self.today).count(), 4)
+
+    def test_rank_changes_since_yesterday(self):
+        """Test rank movement between two daily snapshots"""
+        snapshot_ranks(self.today - timedelta(days=1))
+        self.set_reputation("dave", 500)
+        snapshot_ranks(self.today)
+
+        changes = rank_changes([user.pk for user in self.users.values()])
+        self.assertEqual(changes[self.users["dave"].pk], 3)
+        self.assertEqual(changes[self.users["alice"].pk], -1)
+        self.assertEqual(changes[self.users["bob"].pk], -1)
+
+    def test_rank_changes_since_last_week(self):
+        """Test that weekly movement compares against the snapshot a week back"""
+        snapshot_ranks(self.today - timedelta(days=7))
+        self.set_reputation("dave", 500)
+        snapshot_ranks(self.today - timedelta(days=1))
+        snapshot_ranks(self.today)
+
+        dave = self.users["dave"].pk
+        self.assertEqual(rank_changes([dave], days=1), {dave: 0})
+        self.assertEqual(rank_changes([dave], days=7), {dave: 3})
+
+    def test_rank_changes_without_history(self):
+        """Test that no movement is reported before two snapshots exist"""
+        self.assertEqual(rank_changes([self.users["alice"].pk]), {})
+        snapshot_ranks(self.today)
+        self.assertEqual(rank_changes([self.users["alice"].pk]), {})
+
+    def test_leaderboard_shows_movement(self):
+        """Test that the leaderboard view annotates entries with rank movement"""
+        snapshot_ranks(self.today - timedelta(days=7))
+        self.set_reputation("dave", 500)
+        snapshot_ranks(self.today)
+
+        response = self.client.get(reverse("leaderboards:leaderboard"), {"movement": "week"})
+        changes = {entry.user.username: entry.rank_change for entry in response.context["all_time_leaders"]}
+
+        self.assertEqual(response.context["movement"], "week")
+        self.assertEqual(changes["dave"], 3)
+        self.assertContains(response, "▲3")
+
+    def test_snapshot_command(self):
+        """Test snapshot_ranks management command"""
+        out = StringIO()
+        call_command("snapshot_ranks", date="2024-01-31", stdout=out)
+
+        self.assertEqual(RankHistory.objects.filter(date="2024-01-31").count(), 4)
+        self.assertIn("Stored 4 ranks", out.getvalue())
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Test that the leaderboard runs a bounded number of queries regardless of data size"""
+
+    def add_users(self, count):
+        for i in range(User.objects.count(), User.objects.count() + count):
+            user = User.objects.create_user(
+                username=f"budget{i}", email=f"budget{i}@example.com", password="testpass123"
+            )
+            user.profile.reputation_points = 10 + i
+            user.profile.save()
+            Question.objects.create(title=f"Question {i}", content="Content", author=user)
+        rebuild_leaderboards()
+        snapshot_ranks()
+
+    def test_leaderboard(self):
+        """Test leaderboard budget as the number of ranked users grows"""
+        self.add_users(3)
+        self.client.login(username="budget0", password="testpass123")
+        self.assertQueryBudget(reverse("leaderboards:leaderboard"), 24, grow=lambda: self.add_users(25))
+
+
+class QueryPlanTest(QueryPlanMixin, TestCase):
+    """Test that leaderboard reads are served by indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        rebuild_leaderboards()
+        snapshot_ranks()
+
+    def test_snapshot_entries(self):
+        """Test that snapshot entries are read in rank order from the (snapshot, rank) index"""
+        snapshot = LeaderboardSnapshot.objects.get(window=LeaderboardSnapshot.Window.WEEK)
+        entries = snapshot.entries.select_related("user")
+
+        self.assertUsesIndex(entries, "leaderboards_snapshot_rank")
+        self.assertNoSeqScan(entries, "leaderboards_leaderboardentry", "users_user")
+
+    def test_top_reputation(self):
+        """Test that the all-time leaders come off the reputation index"""
+        leaders = UserProfile.objects.filter(reputation_points__gt=0).order_by("-reputation_points")[:5]
+
+        self.assertNoSeqScan(leaders, "users_userprofile")
+
+    def test_rank_history(self):
+        """Test that rank movement lookups use the (date, user) index"""
+        latest = RankHistory.objects.order_by("-date").values_list("date", flat=True)[:1]
+        ranks = RankHistory.objects.filter(date=timezone.localdate(), user_id__in=[1, 2, 3]).values_list(
+            "user_id", "rank"
+        )
+
+        self.assertUsesIndex(latest, "leaderboards_unique_rank_history_day")
+        self.assertUsesIndex(ranks, "leaderboards_unique_rank_history_day")
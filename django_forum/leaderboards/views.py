@@ -1,29 +1,45 @@
-from django.db.models import Q
 from django.shortcuts import render
-from django.utils import timezone
-from users.models import User, UserProfile
+from users.ranks import get_user_rank
 
+from leaderboards.history import rank_changes
+from leaderboards.models import LeaderboardSnapshot
+from leaderboards.snapshots import get_leaderboards
 
-def leaderboard_view(request):
-    all_time_leaders = (
-        UserProfile.objects.select_related("user").filter(reputation_points__gt=0).order_by("-reputation_points")[:20]
-    )
+Window = LeaderboardSnapshot.Window
+
+# ?movement= value -> days to compare ranks over
+MOVEMENT_PERIODS = {"day": 1, "week": 7}
 
-    month_start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
 
-    this_month_active = User.objects.filter(
-        Q(questions__created_at__gte=month_start)
-        | Q(answers__created_at__gte=month_start)
-        | Q(reviews__created_at__gte=month_start),
-    ).distinct()
+def leaderboard_view(request):
+    snapshots = get_leaderboards()
+    all_time, month, week = (snapshots.get(window) for window in (Window.ALL_TIME, Window.MONTH, Window.WEEK))
+
+    movement = request.GET.get("movement")
+    if movement not in MOVEMENT_PERIODS:
+        movement = "day"
 
-    month_leaders = UserProfile.objects.filter(user__in=this_month_active).order_by("-reputation_points")
-    active_users = month_leaders.count()
+    all_time_leaders = _entries(all_time)
+    changes = rank_changes([entry.user_id for entry in all_time_leaders], days=MOVEMENT_PERIODS[movement])
+    for entry in all_time_leaders:
+        entry.rank_change = changes.get(entry.user_id)
 
     context = {
         "all_time_leaders": all_time_leaders,
-        "active_users": active_users,
-        "month_leaders": month_leaders[:10],
+        "month_leaders": _entries(month)[:10],
+        "week_leaders": _entries(week)[:10],
+        "active_users": month.participants if month else 0,
+        "weekly_active_users": week.participants if week else 0,
+        "updated_at": all_time.computed_at if all_time else None,
+        "movement": movement,
     }
 
+    if request.user.is_authenticated:
+        context["user_rank"] = get_user_rank(request.user)
+
     return render(request, "leaderboards/leaderboard.html", context)
+
+
+def _entries(snapshot):
+    # A window is missing while another request builds the first snapshots
+    return list(snapshot.entries.all()) if snapshot else []
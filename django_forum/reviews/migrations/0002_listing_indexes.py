@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("reviews", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="coursereview",
+            index=models.Index(fields=["-created_at"], name="reviews_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="coursereview",
+            index=models.Index(fields=["course_name"], name="reviews_course_name_idx"),
+        ),
+    ]
@@ -36,6 +36,11 @@ class CourseReview(VoteableMixin, models.Model):
     class Meta:
         ordering = ["-created_at"]
         unique_together = ["author", "course_name"]
+        indexes = [
+            models.Index(fields=["-created_at"], name="reviews_created_idx"),
+            # Course facets: reviews and ratings of one course, the number of distinct courses
+            models.Index(fields=["course_name"], name="reviews_course_name_idx"),
+        ]
 
     def __str__(self):
         return f"{self.course_name} - {self.get_rating_stars()} by {self.author.username}"
@@ -1,13 +1,19 @@
 # reviews/tests.py
 import logging
 
+from core.testing import QueryBudgetMixin, QueryPlanMixin
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
-from django.test import Client, TestCase
+from django.db.models import Avg, Count
+from django.test import Client, RequestFactory, TestCase
 from django.urls import reverse
+from votes.models import Vote
 
 from reviews.forms import CourseReviewForm
 from reviews.models import CourseReview
+from reviews.views import ReviewListView, UserReviewListView
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
@@ -556,6 +562,25 @@ class UserReviewListViewTest(TestCase):
         # Average of ratings 5 and 3 is 4.0
         self.assertEqual(response.context["average_rating"], 4.0)
 
+    def test_user_review_list_totals_cover_every_page(self):
+        """Test that the review count and average rating cover all of the user's reviews, not just the page"""
+        for number in range(11):
+            CourseReview.objects.create(
+                author=self.user,
+                title=f"Review {number}",
+                content="Content",
+                rating=1,
+                course_name=f"Course {number}",
+            )
+
+        response = self.client.get(self.user_reviews_url)
+
+        self.assertEqual(len(response.context["reviews"]), 10)
+        self.assertEqual(response.context["review_count"], 13)
+        # (5 + 3 + 11 * 1) / 13
+        self.assertEqual(response.context["average_rating"], 1.5)
+        self.assertContains(response, "(13)")
+
     def test_user_review_list_no_reviews(self):
         """Test user with no reviews"""
         user_without_reviews_url = reverse("reviews:user_reviews", kwargs={"username": "otheruser"})
@@ -677,3 +702,105 @@ class IntegrationTests(TestCase):
         self.assertRedirects(response, reverse("reviews:review_list"))
         with self.assertRaises(CourseReview.DoesNotExist):
             CourseReview.objects.get(pk=review.pk)
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Test that review views run a bounded number of queries regardless of data size"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", email="author@example.com", password="testpass123")
+        self.voters = [
+            User.objects.create_user(username=f"voter{i}", email=f"voter{i}@example.com", password="testpass123")
+            for i in range(3)
+        ]
+        self.review = self.add_reviews(1)[0]
+        self.client.login(username="voter0", password="testpass123")
+
+    def add_reviews(self, count):
+        content_type = ContentType.objects.get_for_model(CourseReview)
+        reviews = []
+        for _ in range(count):
+            review = CourseReview.objects.create(
+                author=self.author,
+                title="Budget review",
+                content="Content",
+                rating=4,
+                course_name=f"Course {CourseReview.objects.count()}",
+            )
+            for voter in self.voters:
+                Vote.objects.create(user=voter, content_type=content_type, object_id=review.pk, vote_type="up")
+            reviews.append(review)
+        return reviews
+
+    def test_review_list(self):
+        """Test review list budget"""
+        self.assertQueryBudget(reverse("reviews:review_list"), 21, grow=lambda: self.add_reviews(15))
+
+    def test_review_search(self):
+        """Test review search budget"""
+        url = reverse("reviews:review_list") + "?q=course"
+        self.assertQueryBudget(url, 21, grow=lambda: self.add_reviews(15))
+
+    def test_user_reviews(self):
+        """Test that a user's review page does not query per review"""
+        url = reverse("reviews:user_reviews", kwargs={"username": "author"})
+        self.assertQueryBudget(url, 23, grow=lambda: self.add_reviews(15))
+
+    def test_review_detail(self):
+        """Test review detail budget"""
+        url = reverse("reviews:review_detail", kwargs={"pk": self.review.pk})
+        self.assertQueryBudget(url, 19, grow=lambda: self.add_reviews(5))
+
+    def test_review_create(self):
+        """Test review create form and submission budgets"""
+        url = reverse("reviews:review_create")
+        self.assertQueryBudget(url, 18)
+        data = {"title": "New review", "content": "New content", "rating": 5, "course_name": "New course"}
+        self.assertQueryBudget(url, 5, method="post", data=data)
+
+    def test_review_update_and_delete(self):
+        """Test review edit and delete budgets"""
+        self.client.login(username="author", password="testpass123")
+        self.assertQueryBudget(reverse("reviews:review_update", kwargs={"pk": self.review.pk}), 19)
+        url = reverse("reviews:review_delete", kwargs={"pk": self.review.pk})
+        self.assertQueryBudget(url, 19)
+        self.assertQueryBudget(url, 10, method="post")
+
+
+class QueryPlanTest(QueryPlanMixin, TestCase):
+    """Test that review listings and facets are served by indexes"""
+
+    def make_view(self, view_class, params=None, **kwargs):
+        request = RequestFactory().get("/", params or {})
+        request.user = AnonymousUser()
+        view = view_class()
+        view.setup(request, **kwargs)
+        return view
+
+    def test_review_list(self):
+        """Test that the first page comes off the created_at index"""
+        queryset = self.make_view(ReviewListView).get_queryset()[:10]
+
+        self.assertUsesIndex(queryset, "reviews_created_idx")
+        self.assertNoSeqScan(queryset, "reviews_coursereview", "votes_vote")
+
+    def test_user_reviews(self):
+        """Test that one author's reviews are found through the author index"""
+        author = User.objects.annotate(num_reviews=Count("reviews")).order_by("-num_reviews").first()
+        queryset = self.make_view(UserReviewListView, username=author.username).get_queryset()[:10]
+
+        self.assertNoSeqScan(queryset, "reviews_coursereview", "users_user", "votes_vote")
+
+    def test_course_facets(self):
+        """Test that per-course rating facets use the course index and the course count avoids a table scan"""
+        course_name = CourseReview.objects.order_by("pk").values_list("course_name", flat=True).first()
+        course = (
+            CourseReview.objects.filter(course_name=course_name)
+            .values("course_name")
+            .annotate(num_reviews=Count("pk"), avg_rating=Avg("rating"))
+            .order_by()
+        )
+        courses = CourseReview.objects.values("course_name").distinct().order_by()
+
+        self.assertUsesIndex(course, "reviews_course_name_idx")
+        self.assertNoSeqScan(courses, "reviews_coursereview")
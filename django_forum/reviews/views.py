@@ -1,11 +1,15 @@
 import django.urls
+from core.mixins import with_votes
+from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q
+from django.db.models import Avg, Count, Q
 from django.views.generic import CreateView, DeleteView, DetailView, ListView, UpdateView
 
 from reviews.forms import CourseReviewForm
 from reviews.models import CourseReview
 
+User = get_user_model()
+
 
 class ReviewListView(ListView):
     model = CourseReview
@@ -28,7 +32,7 @@ class ReviewListView(ListView):
             queryset = CourseReview.objects.all().select_related("author", "author__profile")
 
         self.search_words = queryset.count()
-        return queryset.order_by("-created_at")
+        return with_votes(queryset).order_by("-created_at")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -36,12 +40,6 @@ class ReviewListView(ListView):
         context["query"] = query
         context["results_count"] = self.search_words
         context["is_search"] = bool(query)
-
-        for review in context["reviews"]:
-            review.upvotes = review.get_upvotes().count()
-            review.downvotes = review.get_downvotes().count()
-            review.vote_count = review.upvotes - review.downvotes
-
         return context
 
 
@@ -50,21 +48,8 @@ class ReviewDetailView(DetailView):
     template_name = "reviews/review_detail.html"
     context_object_name = "review"
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        review = context["review"]
-
-        # Add vote data
-        review.upvotes = review.get_upvotes().count()
-        review.downvotes = review.get_downvotes().count()
-        review.vote_count = review.upvotes - review.downvotes
-
-        if self.request.user.is_authenticated:
-            review.user_vote = review.get_user_vote(self.request.user)
-        else:
-            review.user_vote = None
-
-        return context
+    def get_queryset(self):
+        return with_votes(super().get_queryset().select_related("author__profile"), self.request.user)
 
 
 class ReviewCreateView(LoginRequiredMixin, CreateView):
@@ -115,21 +100,21 @@ class UserReviewListView(ListView):
 
     def get_queryset(self):
         username = self.kwargs["username"]
-        return CourseReview.objects.filter(author__username=username).select_related("author", "author__profile")
+        return with_votes(
+            CourseReview.objects.filter(author__username=username).select_related("author", "author__profile"),
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        reviews = self.get_queryset()
-        context["profile_user"] = reviews.first().author if reviews else None
-        print(context["profile_user"])
-
-        for review in context["reviews"]:
-            review.upvotes = review.get_upvotes().count()
-            review.downvotes = review.get_downvotes().count()
-            review.vote_count = review.upvotes - review.downvotes
-
-        if reviews:
-            total_rating = sum(review.rating for review in reviews)
-            context["average_rating"] = round(total_rating / len(reviews), 1)
+        username = self.kwargs["username"]
+        context["profile_user"] = User.objects.select_related("profile").filter(username=username).first()
+
+        totals = CourseReview.objects.filter(author__username=username).aggregate(
+            average=Avg("rating"),
+            count=Count("pk"),
+        )
+        context["review_count"] = totals["count"]
+        if totals["average"] is not None:
+            context["average_rating"] = round(totals["average"], 1)
 
         return context
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+CONTENT_MODELS = [
+    ("forum", "question", "questions_count", "question_upvotes"),
+    ("forum", "answer", "answers_count", "answer_upvotes"),
+    ("reviews", "coursereview", "reviews_count", "review_upvotes"),
+]
+
+
+def backfill_user_stats(apps, schema_editor):
+    User = apps.get_model("users", "User")
+    UserStats = apps.get_model("users", "UserStats")
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    Vote = apps.get_model("votes", "Vote")
+
+    stats = {pk: UserStats(user_id=pk) for pk in User.objects.values_list("pk", flat=True)}
+
+    for app_label, model_name, count_field, upvote_field in CONTENT_MODELS:
+        model = apps.get_model(app_label, model_name)
+
+        for row in model.objects.order_by().values("author_id").annotate(count=Count("pk")):
+            setattr(stats[row["author_id"]], count_field, row["count"])
+
+        content_type = ContentType.objects.filter(app_label=app_label, model=model_name).first()
+        if content_type is None:
+            continue
+
+        upvotes = (
+            Vote.objects.filter(content_type=content_type, vote_type="up")
+            .annotate(author=Subquery(model.objects.filter(pk=OuterRef("object_id")).values("author_id")[:1]))
+            .exclude(author=None)
+            .order_by()
+            .values("author")
+            .annotate(count=Count("pk"))
+        )
+        for row in upvotes:
+            setattr(stats[row["author"]], upvote_field, row["count"])
+
+    Answer = apps.get_model("forum", "Answer")
+    for row in Answer.objects.filter(is_accepted=True).order_by().values("author_id").annotate(count=Count("pk")):
+        stats[row["author_id"]].accepted_answers_count = row["count"]
+
+    UserStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0002_alter_userprofile_birthday"),
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("forum", "0001_initial"),
+        ("reviews", "0001_initial"),
+        ("votes", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserStats",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("questions_count", models.IntegerField(default=0)),
+                ("answers_count", models.IntegerField(default=0)),
+                ("reviews_count", models.IntegerField(default=0)),
+                ("accepted_answers_count", models.IntegerField(default=0)),
+                ("question_upvotes", models.IntegerField(default=0)),
+                ("answer_upvotes", models.IntegerField(default=0)),
+                ("review_upvotes", models.IntegerField(default=0)),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="stats", to=settings.AUTH_USER_MODEL
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "user stats",
+            },
+        ),
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
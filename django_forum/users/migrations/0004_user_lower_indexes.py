@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:23
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("users", "0003_userstats"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(django.db.models.functions.text.Lower("email"), name="users_user_email_lower_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(django.db.models.functions.text.Lower("username"), name="users_user_username_lower_idx"),
+        ),
+    ]
@@ -1,6 +1,8 @@
 import django.conf
 import django.contrib.auth.models
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Lower
 
 import users.utils.validators
 
@@ -16,6 +18,13 @@ class User(django.contrib.auth.models.AbstractUser):
 
     REQUIRED_FIELDS = ["email"]
 
+    class Meta(django.contrib.auth.models.AbstractUser.Meta):
+        indexes = [
+            # Case-insensitive login lookups in EmailAuthBackend
+            models.Index(Lower("email"), name="users_user_email_lower_idx"),
+            models.Index(Lower("username"), name="users_user_username_lower_idx"),
+        ]
+
     def __str__(self):
         return f"User {self.username}"
 
@@ -26,6 +35,7 @@ class User(django.contrib.auth.models.AbstractUser):
 
         if is_new:
             UserProfile.objects.get_or_create(user=self)
+            UserStats.objects.get_or_create(user=self)
 
 
 def avatar_upload_to(instance, filename: str) -> str:
@@ -57,3 +67,54 @@ class UserProfile(models.Model):
 
     def __str__(self):
         return f"Profile of {self.user.username}"
+
+
+class UserStats(models.Model):
+    # Keyed by the voted/authored model's ``_meta.model_name``
+    COUNT_FIELDS = {
+        "question": "questions_count",
+        "answer": "answers_count",
+        "coursereview": "reviews_count",
+    }
+    UPVOTE_FIELDS = {
+        "question": "question_upvotes",
+        "answer": "answer_upvotes",
+        "coursereview": "review_upvotes",
+    }
+
+    user = models.OneToOneField(
+        django.conf.settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="stats",
+    )
+    questions_count = models.IntegerField(default=0)
+    answers_count = models.IntegerField(default=0)
+    reviews_count = models.IntegerField(default=0)
+    accepted_answers_count = models.IntegerField(default=0)
+    question_upvotes = models.IntegerField(default=0)
+    answer_upvotes = models.IntegerField(default=0)
+    review_upvotes = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "user stats"
+
+    def __str__(self):
+        return f"Stats of {self.user.username}"
+
+    @classmethod
+    def bump(cls, user_id, **deltas):
+        """Atomically add ``deltas`` to one user's counters, e.g. ``bump(user.pk, answers_count=1)``.
+
+        ``user_id`` may also be an expression such as a ``Subquery`` resolving to the user.
+        """
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if deltas:
+            cls.objects.filter(user_id=user_id).update(**{field: F(field) + delta for field, delta in deltas.items()})
+
+    @classmethod
+    async def abump(cls, user_id, **deltas):
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if deltas:
+            await cls.objects.filter(user_id=user_id).aupdate(
+                **{field: F(field) + delta for field, delta in deltas.items()},
+            )
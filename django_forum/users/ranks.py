@@ -0,0 +1,60 @@
+import bisect
+import threading
+import time
+from array import array
+
+import django.conf
+
+from users.models import UserProfile
+
+_lock = threading.Lock()
+_index = None
+
+
+class RankIndex:
+    """Sorted snapshot of every user's reputation, answering rank queries with a binary search"""
+
+    def __init__(self, values):
+        self.values = values
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.values)
+
+    def rank(self, reputation_points):
+        """1-based position on the leaderboard; ties share a rank"""
+        return len(self.values) - bisect.bisect_right(self.values, reputation_points) + 1
+
+    def top_percent(self, reputation_points):
+        """Percentage of users ranked at or above ``reputation_points``"""
+        if not self.values:
+            return 100
+        at_or_above = len(self.values) - bisect.bisect_left(self.values, reputation_points)
+        return max(1, round(100 * at_or_above / len(self.values)))
+
+
+def get_rank_index():
+    """Return the process-wide rank index, rebuilding it once it is older than ``RANK_INDEX_TIMEOUT``.
+
+    Between rebuilds ranks are approximate: lookups use the caller's current
+    reputation against the values captured at build time.
+    """
+    global _index
+
+    index = _index
+    if index is not None and time.monotonic() - index.built_at < django.conf.settings.RANK_INDEX_TIMEOUT:
+        return index
+
+    with _lock:
+        if _index is index:
+            _index = build_rank_index()
+        return _index
+
+
+def build_rank_index():
+    values = UserProfile.objects.order_by("reputation_points").values_list("reputation_points", flat=True)
+    return RankIndex(array("q", values.iterator(chunk_size=10000)))
+
+
+def get_user_rank(user):
+    return get_rank_index().rank(user.profile.reputation_points)
@@ -0,0 +1,140 @@
+from collections import Counter, defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Count, Q, QuerySet, Subquery
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from forum.models import Answer, Question
+from reviews.models import CourseReview
+from votes.models import Vote
+
+from users.models import User, UserProfile, UserStats
+from users.utils.backends import user_cache_key
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    cache.delete(user_cache_key(instance.pk))
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    cache.delete(user_cache_key(instance.user_id))
+
+
+# Keep UserStats in step with writes. Deletions go through pre_delete so that
+# cascades (a question taking its answers and votes with it) are counted too.
+# Django sends pre_delete once per deleted row, cascaded ones included, so the
+# object a delete starts from counts everything it takes along, grouped by
+# author, and the receivers skip the rows it already covered.
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=Answer)
+@receiver(post_save, sender=CourseReview)
+def count_created_content(sender, instance, created, **kwargs):
+    if created:
+        UserStats.bump(instance.author_id, **{UserStats.COUNT_FIELDS[sender._meta.model_name]: 1})
+
+
+@receiver(pre_delete, sender=Question)
+@receiver(pre_delete, sender=Answer)
+@receiver(pre_delete, sender=CourseReview)
+def count_deleted_content(sender, instance, origin=None, **kwargs):
+    if _counted_by_origin(sender, origin):
+        return
+    deltas = defaultdict(Counter)
+    _count_content(deltas, sender, sender.objects.filter(pk=instance.pk))
+    if sender is Question:
+        _count_content(deltas, Answer, Answer.objects.filter(question=instance))
+    _bump_all(deltas)
+
+
+@receiver(pre_delete, sender=User)
+def count_deleted_user(sender, instance, origin=None, **kwargs):
+    """Discount the content a user takes along and the upvotes they gave to content that stays"""
+    if isinstance(origin, QuerySet):
+        # Sent once per user; count the whole queryset on the first, so overlaps are counted once
+        if getattr(origin, "_stats_counted", False):
+            return
+        origin._stats_counted = True
+        user_ids = list(origin.values_list("pk", flat=True))
+    else:
+        user_ids = [instance.pk]
+
+    deltas = defaultdict(Counter)
+    deleted = {
+        Question: Question.objects.filter(author__in=user_ids),
+        Answer: Answer.objects.filter(Q(author__in=user_ids) | Q(question__author__in=user_ids)),
+        CourseReview: CourseReview.objects.filter(author__in=user_ids),
+    }
+    for model, queryset in deleted.items():
+        _count_content(deltas, model, queryset)
+        kept = model.objects.exclude(pk__in=queryset.values("pk")).filter(
+            votes__user__in=user_ids, votes__vote_type="up"
+        )
+        field = UserStats.UPVOTE_FIELDS[model._meta.model_name]
+        for author_id, count in kept.order_by().values_list("author_id").annotate(count=Count("votes")):
+            deltas[author_id][field] -= count
+
+    # Their own stats are deleted with them
+    for user_id in user_ids:
+        deltas.pop(user_id, None)
+    _bump_all(deltas)
+
+
+@receiver(pre_save, sender=Vote)
+def remember_previous_vote_type(sender, instance, **kwargs):
+    instance._previous_vote_type = None
+    if not instance._state.adding:
+        instance._previous_vote_type = Vote.objects.filter(pk=instance.pk).values_list("vote_type", flat=True).first()
+
+
+@receiver(post_save, sender=Vote)
+def count_saved_vote(sender, instance, **kwargs):
+    delta = (instance.vote_type == "up") - (instance._previous_vote_type == "up")
+    _bump_upvotes(instance, delta)
+
+
+@receiver(pre_delete, sender=Vote)
+def count_deleted_vote(sender, instance, origin=None, **kwargs):
+    if instance.vote_type == "up" and not _counted_by_origin(sender, origin):
+        _bump_upvotes(instance, -1)
+
+
+def _counted_by_origin(sender, origin):
+    """Whether the receiver for the object the delete started from already counted this cascaded row"""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is not sender and model in (User, Question, Answer, CourseReview)
+
+
+def _count_content(deltas, model, queryset):
+    """Add to ``deltas`` what deleting ``queryset`` takes off each author's counters, votes on it included"""
+    model_name = model._meta.model_name
+    extra = {"accepted": Count("pk", filter=Q(is_accepted=True), distinct=True)} if model is Answer else {}
+    rows = (
+        queryset.order_by()
+        .values("author_id")
+        .annotate(count=Count("pk", distinct=True), upvotes=Count("votes", filter=Q(votes__vote_type="up")), **extra)
+    )
+    for row in rows:
+        author = deltas[row["author_id"]]
+        author[UserStats.COUNT_FIELDS[model_name]] -= row["count"]
+        author[UserStats.UPVOTE_FIELDS[model_name]] -= row["upvotes"]
+        author["accepted_answers_count"] -= row.get("accepted", 0)
+
+
+def _bump_all(deltas):
+    for user_id, fields in deltas.items():
+        UserStats.bump(user_id, **fields)
+
+
+def _bump_upvotes(vote, delta):
+    model = ContentType.objects.get_for_id(vote.content_type_id).model_class()
+    field = UserStats.UPVOTE_FIELDS.get(model._meta.model_name) if model else None
+    if field and delta:
+        author_id = Subquery(model.objects.filter(pk=vote.object_id).values("author_id")[:1])
+        UserStats.bump(author_id, **{field: delta})
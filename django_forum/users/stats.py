@@ -0,0 +1,97 @@
+from core.rep_rules import REPUTATION_RULES
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, OuterRef, Subquery
+from forum.models import Answer, Question
+from reviews.models import CourseReview
+from votes.models import Vote
+
+from users.models import User, UserProfile, UserStats
+
+STATS_FIELDS = [
+    "questions_count",
+    "answers_count",
+    "reviews_count",
+    "accepted_answers_count",
+    "question_upvotes",
+    "answer_upvotes",
+    "review_upvotes",
+]
+
+# Voteable model -> prefix of its REPUTATION_RULES keys
+REPUTATION_PREFIXES = {
+    Question: "question",
+    Answer: "answer",
+    CourseReview: "review",
+}
+
+
+def get_user_stats(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return rebuild_user_stats(User.objects.filter(pk=user.pk))[0]
+
+
+def rebuild_user_stats(users=None):
+    """Recompute ``UserStats`` from scratch with a handful of GROUP BY queries and upsert them"""
+    users = User.objects.all() if users is None else users
+    user_ids = users.values("pk")
+    stats = {pk: UserStats(user_id=pk) for pk in users.values_list("pk", flat=True)}
+
+    for model in (Question, Answer, CourseReview):
+        model_name = model._meta.model_name
+        count_field = UserStats.COUNT_FIELDS[model_name]
+        upvote_field = UserStats.UPVOTE_FIELDS[model_name]
+
+        for author_id, count in _count_by_author(model.objects.filter(author__in=user_ids)):
+            setattr(stats[author_id], count_field, count)
+
+        upvotes = Vote.objects.filter(content_type=ContentType.objects.get_for_model(model), vote_type="up").annotate(
+            author=Subquery(model.objects.filter(pk=OuterRef("object_id")).values("author_id")[:1]),
+        )
+        for author_id, count in _count_by_author(upvotes.filter(author__in=user_ids), field="author"):
+            setattr(stats[author_id], upvote_field, count)
+
+    for author_id, count in _count_by_author(Answer.objects.filter(author__in=user_ids, is_accepted=True)):
+        stats[author_id].accepted_answers_count = count
+
+    return UserStats.objects.bulk_create(
+        stats.values(),
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=STATS_FIELDS,
+    )
+
+
+def rebuild_reputation(users=None):
+    """Recompute ``UserProfile.reputation_points`` from received votes and accepted answers and upsert them"""
+    users = User.objects.all() if users is None else users
+    user_ids = users.values("pk")
+    points = dict.fromkeys(users.values_list("pk", flat=True), 0)
+
+    for model, prefix in REPUTATION_PREFIXES.items():
+        votes = (
+            model.objects.filter(author__in=user_ids, votes__isnull=False)
+            .order_by()
+            .values_list("author_id", "votes__vote_type")
+            .annotate(count=Count("votes"))
+        )
+        for author_id, vote_type, count in votes:
+            suffix = "upvote" if vote_type == "up" else "downvote"
+            points[author_id] += REPUTATION_RULES[f"{prefix}_{suffix}"] * count
+
+    for author_id, count in _count_by_author(Answer.objects.filter(author__in=user_ids, is_accepted=True)):
+        points[author_id] += REPUTATION_RULES["answer_accepted"] * count
+
+    return UserProfile.objects.bulk_create(
+        [UserProfile(user_id=pk, reputation_points=value) for pk, value in points.items()],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["reputation_points"],
+    )
+
+
+def _count_by_author(queryset, field="author_id"):
+    return queryset.order_by().values_list(field).annotate(count=Count("pk"))
@@ -1,12 +1,27 @@
 # users/tests.py
 import logging
+from unittest import mock
 
+from core.rep_rules import REPUTATION_RULES
+from core.testing import QueryBudgetMixin
+from django.contrib.auth.tokens import default_token_generator
+from django.contrib.contenttypes.models import ContentType
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from forum.models import Answer, Question
+from reviews.models import CourseReview
+from votes.models import Vote
 
 from users.forms import SignUpForm, UserProfileUpdateForm, UserUpdateForm
-from users.models import User, UserProfile
+from users.models import User, UserProfile, UserStats
+from users.ranks import RankIndex, get_rank_index
+from users.stats import get_user_stats, rebuild_user_stats
+from users.utils.backends import EmailAuthBackend
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
@@ -451,7 +466,7 @@ class EdgeCaseTests(TestCase):
         self.assertIn("email", form.errors)
 
     def test_case_insensitive_username_login(self):
-        """Test that username login is case-sensitive"""
+        """Test that username login is case-insensitive"""
         User.objects.create_user(
             username="TestUser",
             email="test@example.com",
@@ -468,8 +483,8 @@ class EdgeCaseTests(TestCase):
             },
         )
 
-        # Should fail because usernames are case-sensitive
-        self.assertFalse(response.context["user"].is_authenticated)
+        # Should succeed because usernames are matched case-insensitively
+        self.assertRedirects(response, reverse("users:profile", kwargs={"username": "TestUser"}))
 
 
 class URLTests(TestCase):
@@ -505,3 +520,411 @@ class URLTests(TestCase):
             response = self.client.get(url)
             self.assertEqual(response.status_code, 302)
             self.assertTrue("/login" in response.url)
+
+
+class UserStatsTest(TestCase):
+    """Test incremental UserStats bookkeeping"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", email="author@example.com", password="testpass123")
+        self.voter = User.objects.create_user(username="voter", email="voter@example.com", password="testpass123")
+        self.question = Question.objects.create(title="Question", content="Content", author=self.author)
+
+    def get_stats(self):
+        return UserStats.objects.get(user=self.author)
+
+    def assertMatchesRebuild(self, user=None):
+        user = user or self.author
+        incremental = UserStats.objects.get(user=user)
+        rebuilt = rebuild_user_stats(User.objects.filter(pk=user.pk))[0]
+        for field in ["questions_count", "answers_count", "reviews_count", "accepted_answers_count"]:
+            self.assertEqual(getattr(incremental, field), getattr(rebuilt, field), field)
+        for field in ["question_upvotes", "answer_upvotes", "review_upvotes"]:
+            self.assertEqual(getattr(incremental, field), getattr(rebuilt, field), field)
+
+    def test_stats_created_with_user(self):
+        """Test that a stats row is created together with the user"""
+        self.assertTrue(UserStats.objects.filter(user=self.voter).exists())
+
+    def test_content_counts(self):
+        """Test that creating and deleting content updates counts"""
+        Answer.objects.create(question=self.question, content="Answer", author=self.author)
+        review = CourseReview.objects.create(
+            author=self.author,
+            title="Review",
+            content="Content",
+            rating=5,
+            course_name="Course",
+        )
+
+        stats = self.get_stats()
+        self.assertEqual(stats.questions_count, 1)
+        self.assertEqual(stats.answers_count, 1)
+        self.assertEqual(stats.reviews_count, 1)
+
+        review.delete()
+        self.assertEqual(self.get_stats().reviews_count, 0)
+        self.assertMatchesRebuild()
+
+    def test_upvote_lifecycle(self):
+        """Test that adding, changing and removing votes updates upvotes"""
+        self.question.vote(self.voter, "up")
+        self.assertEqual(self.get_stats().question_upvotes, 1)
+
+        self.question.vote(self.voter, "down")
+        self.assertEqual(self.get_stats().question_upvotes, 0)
+
+        self.question.vote(self.voter, "up")
+        self.question.vote(self.voter, "up")  # toggle off
+        self.assertEqual(self.get_stats().question_upvotes, 0)
+        self.assertMatchesRebuild()
+
+    def test_cascade_delete(self):
+        """Test that deleting a question discounts its answers and their votes"""
+        answer = Answer.objects.create(question=self.question, content="Answer", author=self.author)
+        answer.vote(self.voter, "up")
+        self.question.vote(self.voter, "up")
+        answer.mark_accepted()
+
+        self.question.delete()
+
+        stats = self.get_stats()
+        self.assertEqual(stats.questions_count, 0)
+        self.assertEqual(stats.answers_count, 0)
+        self.assertEqual(stats.accepted_answers_count, 0)
+        self.assertEqual(stats.question_upvotes, 0)
+        self.assertEqual(stats.answer_upvotes, 0)
+
+    def test_cascade_delete_queries_independent_of_rows(self):
+        """Test that deleting a question costs the same queries with many answers and votes as with one"""
+
+        def question_with_answers(count):
+            question = Question.objects.create(title="Busy", content="Content", author=self.author)
+            for number in range(count):
+                answer = Answer.objects.create(question=question, content=f"Answer {number}", author=self.voter)
+                answer.vote(self.author, "up")
+            question.vote(self.voter, "up")
+            return question
+
+        quiet, busy = question_with_answers(1), question_with_answers(10)
+        with CaptureQueriesContext(connection) as few:
+            quiet.delete()
+        with CaptureQueriesContext(connection) as many:
+            busy.delete()
+
+        self.assertEqual(len(many), len(few))
+        self.assertMatchesRebuild()
+        self.assertMatchesRebuild(self.voter)
+
+    def test_author_deleted(self):
+        """Test that deleting a user discounts answers others posted under their questions and upvotes they gave"""
+        other = User.objects.create_user(username="other", email="other@example.com", password="testpass123")
+        answer = Answer.objects.create(question=self.question, content="Answer", author=self.voter)
+        answer.vote(self.author, "up")
+        answer.mark_accepted()
+        kept = Question.objects.create(title="Kept", content="Content", author=other)
+        kept.vote(self.author, "up")
+        kept_answer = Answer.objects.create(question=kept, content="Kept answer", author=self.voter)
+        kept_answer.vote(self.author, "up")
+
+        self.author.delete()
+
+        self.assertMatchesRebuild(self.voter)
+        self.assertMatchesRebuild(other)
+        self.assertEqual(UserStats.objects.get(user=self.voter).answers_count, 1)
+        self.assertEqual(UserStats.objects.get(user=other).question_upvotes, 0)
+
+    def test_users_deleted_together(self):
+        """Test that a queryset delete of several users counts shared content once"""
+        other = User.objects.create_user(username="other", email="other@example.com", password="testpass123")
+        answer = Answer.objects.create(question=self.question, content="Answer", author=other)
+        answer.vote(self.voter, "up")
+        self.question.vote(self.voter, "up")
+
+        User.objects.filter(pk__in=[self.author.pk, self.voter.pk]).delete()
+
+        self.assertMatchesRebuild(other)
+
+    def test_voter_deleted(self):
+        """Test that votes of a deleted user no longer count"""
+        self.question.vote(self.voter, "up")
+        self.voter.delete()
+
+        self.assertEqual(self.get_stats().question_upvotes, 0)
+
+    def test_accepting_another_answer(self):
+        """Test that accepting a different answer moves the accepted count"""
+        other = User.objects.create_user(username="other", email="other@example.com", password="testpass123")
+        first = Answer.objects.create(question=self.question, content="First", author=other)
+        second = Answer.objects.create(question=self.question, content="Second", author=self.voter)
+
+        self.client.login(username="author", password="testpass123")
+        self.client.post(reverse("forum:answer_accept", kwargs={"pk": first.pk}))
+        self.client.post(reverse("forum:answer_accept", kwargs={"pk": second.pk}))
+
+        self.assertEqual(UserStats.objects.get(user=other).accepted_answers_count, 0)
+        self.assertEqual(UserStats.objects.get(user=self.voter).accepted_answers_count, 1)
+
+    def test_missing_stats_rebuilt(self):
+        """Test that stats are rebuilt on demand for users without a row"""
+        self.question.vote(self.voter, "up")
+        UserStats.objects.filter(user=self.author).delete()
+        self.author.refresh_from_db()
+
+        stats = get_user_stats(self.author)
+        self.assertEqual(stats.questions_count, 1)
+        self.assertEqual(stats.question_upvotes, 1)
+
+    def test_profile_reputation_breakdown(self):
+        """Test that the profile page reads the breakdown from stats"""
+        answer = Answer.objects.create(question=self.question, content="Answer", author=self.author)
+        answer.vote(self.voter, "up")
+        self.question.vote(self.voter, "up")
+
+        response = self.client.get(reverse("users:profile", kwargs={"username": "author"}))
+
+        self.assertEqual(response.context["questions_count"], 1)
+        self.assertEqual(response.context["answers_count"], 1)
+        self.assertEqual(response.context["question_upvotes"], REPUTATION_RULES["question_upvote"])
+        self.assertEqual(response.context["answer_upvotes"], REPUTATION_RULES["answer_upvote"])
+
+    def test_profile_queries_independent_of_activity(self):
+        """Test that the profile page cost does not grow with the user's whole history"""
+        url = reverse("users:profile", kwargs={"username": "author"})
+
+        for i in range(10):  # fill the "recent questions" tab
+            Question.objects.create(title=f"Question {i}", content="Content", author=self.author).vote(self.voter, "up")
+
+        with CaptureQueriesContext(connection) as baseline:
+            self.client.get(url)
+
+        for i in range(20):
+            Question.objects.create(title=f"More {i}", content="Content", author=self.author).vote(self.voter, "up")
+
+        with self.assertNumQueries(len(baseline)):
+            self.client.get(url)
+
+
+class EmailAuthBackendGetUserTest(TestCase):
+    """Test EmailAuthBackend.get_user query cost and caching"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpass123")
+        self.backend = EmailAuthBackend()
+
+    def test_profile_loaded_with_user(self):
+        """Test that the user and the profile come from a single query"""
+        with self.assertNumQueries(1):
+            user = self.backend.get_user(self.user.pk)
+            self.assertEqual(user.profile.reputation_points, 0)
+
+    def test_nonexistent_user(self):
+        """Test that an unknown id returns None"""
+        self.assertIsNone(self.backend.get_user(999999))
+
+    @override_settings(
+        AUTH_USER_CACHE_TIMEOUT=60,
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "auth-tests"}},
+    )
+    def test_cached_user_invalidated_on_profile_save(self):
+        """Test that cached users are served without queries until the profile changes"""
+        self.backend.get_user(self.user.pk)
+
+        with self.assertNumQueries(0):
+            user = self.backend.get_user(self.user.pk)
+            self.assertEqual(user.profile.reputation_points, 0)
+
+        self.user.profile.reputation_points = 42
+        self.user.profile.save()
+
+        with self.assertNumQueries(1):
+            user = self.backend.get_user(self.user.pk)
+        self.assertEqual(user.profile.reputation_points, 42)
+
+
+class EmailAuthBackendAuthenticateTest(TestCase):
+    """Test EmailAuthBackend.authenticate lookups"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="TestUser", email="Test@Example.com", password="testpass123")
+        self.backend = EmailAuthBackend()
+
+    def test_email_case_insensitive(self):
+        """Test login by email in any case"""
+        self.assertEqual(self.backend.authenticate(None, "test@example.COM", "testpass123"), self.user)
+
+    def test_username_case_insensitive(self):
+        """Test login by username in any case"""
+        self.assertEqual(self.backend.authenticate(None, "testuser", "testpass123"), self.user)
+
+    def test_wrong_password(self):
+        """Test that a wrong password is rejected"""
+        self.assertIsNone(self.backend.authenticate(None, "testuser", "wrong"))
+
+    def test_single_lookup_query(self):
+        """Test that a failed login costs a single query"""
+        with self.assertNumQueries(1):
+            self.backend.authenticate(None, "nobody@example.com", "testpass123")
+
+    def test_unknown_user_runs_hasher(self):
+        """Test that unknown users pay the same password hashing cost"""
+        with mock.patch.object(User, "set_password") as set_password:
+            self.assertIsNone(self.backend.authenticate(None, "nobody", "testpass123"))
+        set_password.assert_called_once_with("testpass123")
+
+    def test_exact_username_preferred(self):
+        """Test that the exact-case username wins over other case variants"""
+        other = User.objects.create_user(username="testuser", email="other@example.com", password="otherpass123")
+        self.assertEqual(self.backend.authenticate(None, "testuser", "otherpass123"), other)
+        self.assertEqual(self.backend.authenticate(None, "TestUser", "testpass123"), self.user)
+
+
+class RankIndexTest(TestCase):
+    """Test in-memory reputation rank index"""
+
+    def setUp(self):
+        for username, points in [("first", 300), ("second", 200), ("tied", 200), ("last", 10)]:
+            user = User.objects.create_user(username=username, email=f"{username}@example.com", password="testpass123")
+            user.profile.reputation_points = points
+            user.profile.save()
+
+    def test_rank(self):
+        """Test rank lookups, with ties sharing a rank"""
+        index = get_rank_index()
+
+        self.assertEqual(index.rank(300), 1)
+        self.assertEqual(index.rank(200), 2)
+        self.assertEqual(index.rank(10), 4)
+        self.assertEqual(index.rank(1000), 1)
+
+    def test_top_percent(self):
+        """Test percentile of users ranked at or above a score"""
+        index = get_rank_index()
+
+        self.assertEqual(index.top_percent(300), 25)
+        self.assertEqual(index.top_percent(10), 100)
+
+    def test_empty_index(self):
+        """Test lookups before anyone has registered"""
+        index = RankIndex([])
+
+        self.assertEqual(index.rank(0), 1)
+        self.assertEqual(index.top_percent(0), 100)
+
+    @override_settings(RANK_INDEX_TIMEOUT=3600)
+    def test_index_reused_until_timeout(self):
+        """Test that the index is not rebuilt on every lookup"""
+        with mock.patch("users.ranks._index", None):
+            index = get_rank_index()
+
+            with self.assertNumQueries(0):
+                self.assertIs(get_rank_index(), index)
+
+    def test_profile_exposes_rank(self):
+        """Test that the public profile shows the user's rank"""
+        response = self.client.get(reverse("users:profile", kwargs={"username": "second"}))
+
+        self.assertEqual(response.context["rank"], 2)
+        self.assertEqual(response.context["rank_top_percent"], 75)
+        self.assertContains(response, "#2")
+
+    def test_leaderboard_exposes_rank(self):
+        """Test that the leaderboard shows the signed-in user's rank"""
+        self.client.login(username="last", password="testpass123")
+        response = self.client.get(reverse("leaderboards:leaderboard"))
+
+        self.assertEqual(response.context["user_rank"], 4)
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Test that users views run a bounded number of queries regardless of data size"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@example.com", password="testpass123")
+        self.voter = User.objects.create_user(username="voter", email="voter@example.com", password="testpass123")
+
+    def add_content(self, count):
+        for i in range(count):
+            question = Question.objects.create(title=f"Question {i}", content="Content", author=self.user)
+            answer = Answer.objects.create(question=question, content="Answer", author=self.user)
+            review = CourseReview.objects.create(
+                author=self.user,
+                title="Review",
+                content="Content",
+                rating=5,
+                course_name=f"Course {CourseReview.objects.count()}",
+            )
+            for obj in (question, answer, review):
+                Vote.objects.create(
+                    user=self.voter,
+                    content_type=ContentType.objects.get_for_model(obj),
+                    object_id=obj.pk,
+                    vote_type="up",
+                )
+
+    def test_public_profile(self):
+        """Test that the profile does not query per listed question, answer or review"""
+        self.add_content(2)
+        url = reverse("users:profile", kwargs={"username": "testuser"})
+        self.assertQueryBudget(url, 22, grow=lambda: self.add_content(12))
+
+    def test_anonymous_pages(self):
+        """Test login, signup and password reset page budgets"""
+        for name, budget in [
+            ("users:login", 14),
+            ("users:signup", 14),
+            ("users:password_reset", 14),
+            ("users:password_reset_done", 14),
+            ("users:password_reset_complete", 14),
+        ]:
+            with self.subTest(name):
+                self.assertQueryBudget(reverse(name), budget)
+
+    def test_password_reset_confirm(self):
+        """Test password reset confirm budget"""
+        url = reverse(
+            "users:password_reset_confirm",
+            kwargs={
+                "uidb64": urlsafe_base64_encode(force_bytes(self.user.pk)),
+                "token": default_token_generator.make_token(self.user),
+            },
+        )
+        self.assertQueryBudget(url, 5)
+
+    def test_signed_in_pages(self):
+        """Test edit profile and password change page budgets"""
+        self.client.login(username="testuser", password="testpass123")
+        for name, budget in [
+            ("users:edit-profile", 19),
+            ("users:password_change", 16),
+            ("users:password_change_done", 16),
+        ]:
+            with self.subTest(name):
+                self.assertQueryBudget(reverse(name), budget)
+
+    def test_form_submissions(self):
+        """Test login, signup, profile update and logout submission budgets"""
+        self.assertQueryBudget(
+            reverse("users:login"),
+            9,
+            method="post",
+            data={"username": "testuser", "password": "testpass123"},
+        )
+        self.assertQueryBudget(
+            reverse("users:edit-profile"),
+            5,
+            method="post",
+            data={"username": "testuser", "email": "test@example.com", "bio": "Updated"},
+        )
+        self.assertQueryBudget(reverse("users:logout"), 4, method="post")
+        self.assertQueryBudget(
+            reverse("users:signup"),
+            12,
+            method="post",
+            data={
+                "username": "newuser",
+                "email": "new@example.com",
+                "password1": "complexpass123",
+                "password2": "complexpass123",
+            },
+        )
@@ -1,18 +1,46 @@
+import django.conf
+from asgiref.sync import sync_to_async
+from core.instrumentation import record_cache
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.functions import Lower
+from django.db.models.lookups import Exact
 
 User = get_user_model()
 
 
+def user_cache_key(user_id):
+    return f"users:auth-user:{user_id}"
+
+
 class EmailAuthBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None):
-        try:
-            user = User.objects.get(email=username)
-        except User.DoesNotExist:
-            try:
-                user = User.objects.get(username=username)
-            except User.DoesNotExist:
-                return None
+        if username is None or password is None:
+            return None
+
+        # Compare Lower() expressions rather than using __iexact (UPPER() on PostgreSQL)
+        # so the lookup can use the functional indexes on User.
+        normalized = username.lower()
+        email_matches = Exact(Lower("email"), normalized)
+        username_matches = Exact(Lower("username"), normalized)
+
+        user = (
+            User.objects.filter(email_matches | username_matches)
+            .order_by(
+                # Prefer an email match, then the exact username over other case variants
+                Case(When(email_matches, then=Value(0)), default=Value(1), output_field=IntegerField()),
+                Case(When(username=username, then=Value(0)), default=Value(1), output_field=IntegerField()),
+                "pk",
+            )
+            .first()
+        )
+
+        if user is None:
+            # Run the password hasher anyway so unknown users take as long as wrong passwords
+            User().set_password(password)
+            return None
 
         if user.check_password(password):
             return user
@@ -20,7 +48,25 @@ class EmailAuthBackend(ModelBackend):
         return None
 
     def get_user(self, user_id):
+        # The session only stores the user id, and django.contrib.auth still checks the
+        # session auth hash against the (possibly cached) password, so keying by id is safe.
+        timeout = django.conf.settings.AUTH_USER_CACHE_TIMEOUT
+        if timeout:
+            user = cache.get(user_cache_key(user_id))
+            record_cache(user is not None)
+            if user is not None:
+                return user
+
         try:
-            return User.objects.get(id=user_id)
+            user = User.objects.select_related("profile").get(id=user_id)
         except User.DoesNotExist:
             return None
+
+        if timeout:
+            cache.set(user_cache_key(user_id), user, timeout)
+
+        return user
+
+    async def aget_user(self, user_id):
+        # request.auser() in async views would otherwise skip the cache and the profile join
+        return await sync_to_async(self.get_user)(user_id)
@@ -1,4 +1,5 @@
 import django.urls
+from core.mixins import with_votes
 from core.rep_rules import REPUTATION_RULES
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -8,6 +9,8 @@ from django.urls import reverse
 from django.views.generic import DetailView, FormView, TemplateView
 
 from users.forms import SignUpForm, UserProfileUpdateForm, UserUpdateForm
+from users.ranks import get_rank_index
+from users.stats import get_user_stats
 
 User = get_user_model()
 
@@ -36,34 +39,34 @@ class PublicProfileView(DetailView):
     slug_url_kwarg = "username"
     context_object_name = "profile_user"
 
+    def get_queryset(self):
+        return super().get_queryset().select_related("profile", "stats")
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.object
 
-        context["questions_count"] = user.questions.count()
-        context["answers_count"] = user.answers.count()
-        context["reviews_count"] = user.reviews.count()
-        context["accepted_answers"] = user.answers.filter(is_accepted=True).count()
+        stats = get_user_stats(user)
 
-        context["user_questions"] = (
-            user.questions.select_related("author__profile").prefetch_related("answers").order_by("-created_at")[:10]
-        )
-        context["user_answers"] = user.answers.select_related(
-            "question",
-            "question__author",
-            "author__profile",
-        ).order_by("-created_at")[:10]
-        context["user_reviews"] = user.reviews.select_related("author__profile").order_by("-created_at")[:10]
+        context["questions_count"] = stats.questions_count
+        context["answers_count"] = stats.answers_count
+        context["reviews_count"] = stats.reviews_count
+        context["accepted_answers"] = stats.accepted_answers_count
 
-        question_upvotes = sum(question.get_upvotes().count() for question in user.questions.all())
-        answer_upvotes = sum(answer.get_upvotes().count() for answer in user.answers.all())
-        review_upvotes = sum(review.get_upvotes().count() for review in user.reviews.all())
-        accepted_answers = user.answers.filter(is_accepted=True).count()
+        context["user_questions"] = with_votes(
+            user.questions.select_related("author__profile").prefetch_related("answers"),
+        ).order_by("-created_at")[:10]
+        context["user_answers"] = with_votes(
+            user.answers.select_related("question", "question__author", "author__profile"),
+        ).order_by("-created_at")[:10]
+        context["user_reviews"] = with_votes(user.reviews.select_related("author__profile")).order_by("-created_at")[
+            :10
+        ]
 
-        context["question_upvotes"] = question_upvotes * REPUTATION_RULES["question_upvote"]
-        context["answer_upvotes"] = answer_upvotes * REPUTATION_RULES["answer_upvote"]
-        context["review_upvotes"] = review_upvotes * REPUTATION_RULES["review_upvote"]
-        context["accepted_points"] = accepted_answers * REPUTATION_RULES["answer_accepted"]
+        context["question_upvotes"] = stats.question_upvotes * REPUTATION_RULES["question_upvote"]
+        context["answer_upvotes"] = stats.answer_upvotes * REPUTATION_RULES["answer_upvote"]
+        context["review_upvotes"] = stats.review_upvotes * REPUTATION_RULES["review_upvote"]
+        context["accepted_points"] = stats.accepted_answers_count * REPUTATION_RULES["answer_accepted"]
 
         context["total_earned"] = (
             context["question_upvotes"]
@@ -72,6 +75,10 @@ class PublicProfileView(DetailView):
             + context["accepted_points"]
         )
 
+        rank_index = get_rank_index()
+        context["rank"] = rank_index.rank(user.profile.reputation_points)
+        context["rank_top_percent"] = rank_index.top_percent(user.profile.reputation_points)
+
         context["is_owner"] = self.request.user == user
         return context
 
@@ -1,7 +1,10 @@
 # core/tests/test_votes.py
+import json
 import logging
 
+from asgiref.sync import sync_to_async
 from core.rep_rules import REPUTATION_RULES
+from core.testing import QueryPlanMixin, async_request
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.db import IntegrityError
@@ -9,8 +12,10 @@ from django.test import Client, TestCase
 from django.urls import reverse
 from forum.models import Answer, Question
 from reviews.models import CourseReview
+from users.models import UserProfile
 
 from votes.models import Vote
+from votes.views import avote
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
@@ -293,6 +298,21 @@ class VoteableMixinTest(TestCase):
         self.user.profile.refresh_from_db()
         self.assertEqual(self.user.profile.reputation_points, self.initial_reputation)
 
+    async def test_avote(self):
+        """Test that the async vote adds, changes and removes a vote like the sync one"""
+        question = await Question.objects.select_related("author__profile").aget(pk=self.question.pk)
+
+        self.assertEqual(await question.avote(self.voter, "up"), "added")
+        self.assertEqual(await question.aget_user_vote(self.voter), "up")
+        self.assertEqual(await question.avote(self.voter, "down"), "updated")
+        self.assertEqual(await question.aget_vote_totals(), (0, 1))
+        self.assertEqual(await question.avote(self.voter, "down"), "removed")
+        self.assertEqual(await question.aget_vote_totals(), (0, 0))
+        self.assertFalse(await question.avote(self.user, "up"))
+
+        profile = await UserProfile.objects.aget(user=self.user)
+        self.assertEqual(profile.reputation_points, self.initial_reputation)
+
 
 class VoteViewTest(TestCase):
     """Test vote view functionality"""
@@ -429,6 +449,46 @@ class VoteViewTest(TestCase):
         self.assertEqual(data["user_vote"], "down")
         self.assertEqual(data["vote_count"], -1)
 
+    async def test_vote_under_asgi(self):
+        """Test voting through the ASGI handler, where the view runs on the event loop"""
+        await self.async_client.aforce_login(self.voter)
+
+        response = await self.async_client.post(self.vote_url)
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["result"], "added")
+        self.assertEqual((data["upvotes"], data["downvotes"], data["vote_count"]), (1, 0, 1))
+        profile = await UserProfile.objects.aget(user=self.user)
+        self.assertEqual(profile.reputation_points, REPUTATION_RULES["question_upvote"])
+
+    async def test_async_variant(self):
+        """Test the view ASGI workers serve, with the same response as the WSGI one"""
+        await sync_to_async(self.client.force_login)(self.voter)
+        expected = (await sync_to_async(self.client.post)(self.vote_url)).json()
+        await Vote.objects.all().adelete()
+        await UserProfile.objects.filter(user=self.user).aupdate(reputation_points=0)
+
+        response = await avote(async_request(self.vote_url, self.voter), self.content_type.pk, self.question.pk, "up")
+
+        self.assertEqual(json.loads(response.content), expected)
+        profile = await UserProfile.objects.aget(user=self.user)
+        self.assertEqual(profile.reputation_points, REPUTATION_RULES["question_upvote"])
+
+    def test_vote_on_unvoteable_model(self):
+        """Test that content types without votes are not found"""
+        self.client.login(username="voter", password="testpass123")
+        url = reverse(
+            "votes:vote",
+            kwargs={
+                "content_type_id": ContentType.objects.get_for_model(User).pk,
+                "object_id": self.user.pk,
+                "vote_type": "up",
+            },
+        )
+
+        self.assertEqual(self.client.post(url).status_code, 404)
+
 
 # votes/tests.py - Fix the reputation tests
 
@@ -611,3 +671,25 @@ class VoteIntegrationTest(TestCase):
             initial_reputation + (REPUTATION_RULES["question_upvote"] * 2) + REPUTATION_RULES["question_downvote"]
         )
         self.assertEqual(self.author.profile.reputation_points, expected_reputation)
+
+
+class QueryPlanTest(QueryPlanMixin, TestCase):
+    """Test that vote lookups by (content_type, object_id) are served by indexes"""
+
+    def setUp(self):
+        self.question = Question.objects.order_by("pk").first()
+        self.answer = Answer.objects.order_by("pk").first()
+        self.user = User.objects.order_by("pk").first()
+
+    def test_votes_for_object(self):
+        """Test that the votes of one object come off the (content_type, object_id) index"""
+        for obj in (self.question, self.answer):
+            self.assertUsesIndex(obj.get_upvotes(), Vote._meta.indexes[0].name)
+            self.assertNoSeqScan(obj.get_votes(), "votes_vote")
+
+    def test_user_vote(self):
+        """Test that a user's vote on an object is a unique-index lookup"""
+        content_type = ContentType.objects.get_for_model(Question)
+        queryset = Vote.objects.filter(user=self.user, content_type=content_type, object_id=self.question.pk)
+
+        self.assertNoSeqScan(queryset, "votes_vote")
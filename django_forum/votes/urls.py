@@ -1,3 +1,4 @@
+import django.conf
 from django.urls import path
 
 from votes import views
@@ -5,5 +6,9 @@ from votes import views
 app_name = "votes"
 
 urlpatterns = [
-    path("<int:content_type_id>/<int:object_id>/<str:vote_type>/", views.vote, name="vote"),
+    path(
+        "<int:content_type_id>/<int:object_id>/<str:vote_type>/",
+        views.avote if django.conf.settings.ASGI else views.vote,
+        name="vote",
+    ),
 ]
@@ -1,33 +1,76 @@
+from core.metrics import VOTES
+from core.mixins import VoteableMixin
 from django.contrib.auth.decorators import login_required
 from django.contrib.contenttypes.models import ContentType
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404
+from django.http import Http404, JsonResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404
 from django.utils.translation import gettext_lazy as _
 from django.views.decorators.http import require_POST
+from forum import events
 
 
 @login_required
 @require_POST
 def vote(request, content_type_id, object_id, vote_type):
+    """Served under WSGI; ``avote`` is the same view for ASGI"""
     if vote_type not in ["up", "down"]:
         return JsonResponse({"error": _("Invalid vote type")}, status=400)
 
     content_type = get_object_or_404(ContentType, id=content_type_id)
-    model_class = content_type.model_class()
-    obj = get_object_or_404(model_class, id=object_id)
+    obj = get_object_or_404(_voteable_objects(content_type), id=object_id)
 
-    if hasattr(obj, "author") and obj.author == request.user:
+    if obj.author_id == request.user.pk:
         return JsonResponse({"error": _("Cannot vote on your own content")}, status=400)
 
     result = obj.vote(request.user, vote_type)
+    if result:
+        VOTES.inc(content_type.model, result)
+
+    upvotes, downvotes = obj.get_vote_totals()
+    if result:
+        events.score_changed(obj, upvotes, downvotes)
+    return _vote_response(result, upvotes, downvotes, obj.get_user_vote(request.user))
+
+
+@login_required
+@require_POST
+async def avote(request, content_type_id, object_id, vote_type):
+    if vote_type not in ["up", "down"]:
+        return JsonResponse({"error": _("Invalid vote type")}, status=400)
+
+    content_type = await aget_object_or_404(ContentType, id=content_type_id)
+    obj = await aget_object_or_404(_voteable_objects(content_type), id=object_id)
+
+    user = await request.auser()
+    if obj.author_id == user.pk:
+        return JsonResponse({"error": _("Cannot vote on your own content")}, status=400)
+
+    result = await obj.avote(user, vote_type)
+    if result:
+        VOTES.inc(content_type.model, result)
+
+    upvotes, downvotes = await obj.aget_vote_totals()
+    if result:
+        await events.ascore_changed(obj, upvotes, downvotes)
+    return _vote_response(result, upvotes, downvotes, await obj.aget_user_vote(user))
+
+
+def _voteable_objects(content_type):
+    model_class = content_type.model_class()
+    if model_class is None or not issubclass(model_class, VoteableMixin):
+        raise Http404
+    # Loaded up front: the vote changes the author's reputation, and the event loop cannot lazy-load it
+    return model_class._default_manager.select_related("author__profile")
+
 
+def _vote_response(result, upvotes, downvotes, user_vote):
     return JsonResponse(
         {
             "success": True,
             "result": result,
-            "vote_count": obj.get_vote_count(),
-            "user_vote": obj.get_user_vote(request.user),
-            "upvotes": obj.get_upvotes().count(),
-            "downvotes": obj.get_downvotes().count(),
+            "vote_count": upvotes - downvotes,
+            "user_vote": user_vote,
+            "upvotes": upvotes,
+            "downvotes": downvotes,
         },
     )
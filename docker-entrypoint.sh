@@ -3,6 +3,10 @@
 echo "Running database migrations..."
 python django_forum/manage.py migrate
 
+echo "Creating cache tables (for CACHE_*_BACKEND=db) and warming the shared cache..."
+python django_forum/manage.py createcachetable
+python django_forum/manage.py warm_cache
+
 echo "Creating superuser if needed..."
 echo "from django.contrib.auth import get_user_model; User = get_user_model(); User.objects.filter(username='admin').exists() or User.objects.create_superuser('admin', 'admin@example.com', 'admin')" | python django_forum/manage.py shell
 
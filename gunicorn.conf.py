@@ -0,0 +1,128 @@
+"""Gunicorn configuration, read with ``gunicorn -c gunicorn.conf.py``.
+
+Every setting can be overridden from the environment (or ``.env``):
+
+* ``GUNICORN_WORKER_CLASS`` - ``gthread`` (default), ``sync``, or
+  ``uvicorn_worker.UvicornWorker`` from the ``asgi`` extra. Uvicorn workers
+  serve ``django_forum.asgi:application``, with the async variants of views
+  and live question updates, the others ``django_forum.wsgi:application``;
+* ``GUNICORN_WORKERS`` / ``GUNICORN_THREADS`` - default to the CPUs the
+  container may use: ``2 * cpus + 1`` sync workers, or ``cpus + 1`` gthread
+  workers with 4 threads each. Each thread may hold a database connection;
+* ``GUNICORN_PRELOAD`` - load Django, the URLconf and the templates once in
+  the master and fork workers from it (default on);
+* ``GUNICORN_MAX_REQUESTS`` / ``GUNICORN_MAX_REQUESTS_JITTER`` - recycle
+  workers to cap slow memory growth, staggered so they do not all restart
+  at once;
+* ``DB_POOL_MAX_SIZE`` - defaults to the threads per worker of ``sync`` and
+  ``gthread`` workers when ``DB_POOL`` is on. ASGI workers reuse connections
+  only through ``DB_POOL``, see ``django_forum/asgi.py``;
+* ``GUNICORN_BIND`` (or ``PORT``), ``GUNICORN_TIMEOUT``, ``GUNICORN_KEEPALIVE``
+  and ``GUNICORN_ACCESS_LOG``.
+
+Worker metrics are aggregated through ``METRICS_DIR``, which defaults to a
+temporary directory here because there is more than one worker.
+
+The README compares the sync, gthread and uvicorn workers under ``load_test``.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+import decouple
+
+
+def _cpu_count():
+    # os.cpu_count() sees the host's CPUs; a container's cgroup quota is what it can actually use
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            return max(1, -(-int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return os.cpu_count() or 1
+
+
+CPUS = _cpu_count()
+
+bind = decouple.config("GUNICORN_BIND", default=f"0.0.0.0:{decouple.config('PORT', default=8000, cast=int)}")
+
+worker_class = decouple.config("GUNICORN_WORKER_CLASS", default="gthread")
+workers = decouple.config("GUNICORN_WORKERS", default=2 * CPUS + 1 if worker_class == "sync" else CPUS + 1, cast=int)
+threads = decouple.config("GUNICORN_THREADS", default=4 if worker_class == "gthread" else 1, cast=int)
+ASGI = "uvicorn" in worker_class.lower()
+wsgi_app = "django_forum.asgi:application" if ASGI else "django_forum.wsgi:application"
+
+preload_app = decouple.config("GUNICORN_PRELOAD", default=True, cast=bool)
+max_requests = decouple.config("GUNICORN_MAX_REQUESTS", default=1000, cast=int)
+max_requests_jitter = decouple.config("GUNICORN_MAX_REQUESTS_JITTER", default=100, cast=int)
+
+timeout = decouple.config("GUNICORN_TIMEOUT", default=30, cast=int)
+graceful_timeout = timeout
+keepalive = decouple.config("GUNICORN_KEEPALIVE", default=5, cast=int)
+
+# The app logs its own line per request (core.requests), so gunicorn's access log is off unless asked for
+accesslog = decouple.config("GUNICORN_ACCESS_LOG", default=None)
+errorlog = "-"
+
+# Heartbeat files on tmpfs; on a disk-backed /tmp a slow fsync can get workers killed as unresponsive
+if Path("/dev/shm").is_dir():
+    worker_tmp_dir = "/dev/shm"
+
+# Set before the app is loaded, so the settings of the master and of every worker pick it up
+METRICS_DIR = decouple.config("METRICS_DIR", default="") or str(Path(tempfile.gettempdir(), "django_forum_metrics"))
+os.environ["METRICS_DIR"] = METRICS_DIR
+# With DB_POOL on, a worker's threads share its pool; one connection per thread is all they can use at once.
+# ASGI workers are not bounded by threads and keep the settings' default
+if worker_class in ("sync", "gthread"):
+    os.environ["DB_POOL_MAX_SIZE"] = str(decouple.config("DB_POOL_MAX_SIZE", default=threads, cast=int))
+
+
+def on_starting(server):
+    # Files left by a previous run belong to dead processes
+    directory = Path(METRICS_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    for path in directory.glob("*.db"):
+        path.unlink(missing_ok=True)
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        _warm_up(server.log)
+
+
+def post_fork(server, worker):
+    from django.db import connections
+
+    # A connection inherited from the master would share its socket with the master and every sibling
+    if server.cfg.preload_app:
+        connections.close_all()
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app:
+        _warm_up(worker.log)
+
+
+def child_exit(server, worker):
+    from core.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid, METRICS_DIR)
+
+
+def _warm_up(log):
+    from core.warmup import warm_up
+    from django.db import connections
+
+    timings = warm_up()
+    log.info(
+        "Warmed up in %.0fms: %s",
+        1000 * sum(timings.values()),
+        ", ".join(f"{k}={v * 1000:.0f}ms" for k, v in timings.items()),
+    )
+    # Warming queried the database; workers must open their own connections, and pools their own threads
+    connections.close_all()
+    for connection in connections.all():
+        if connection.settings_dict.get("OPTIONS", {}).get("pool"):
+            connection.close_pool()
@@ -0,0 +1,19 @@
+#!/bin/bash
+# Runs the periodic management commands: the leaderboard rebuild every SCHEDULER_INTERVAL seconds
+# (15 minutes by default), and the daily rank snapshot on the first run of each day
+
+interval=${SCHEDULER_INTERVAL:-900}
+snapshot_day=""
+
+while true; do
+    echo "Rebuilding leaderboards..."
+    python django_forum/manage.py rebuild_leaderboards
+
+    today=$(date +%F)
+    if [ "$today" != "$snapshot_day" ]; then
+        echo "Recording today's ranks..."
+        python django_forum/manage.py snapshot_ranks && snapshot_day=$today
+    fi
+
+    sleep "$interval"
+done